@@ -6,24 +6,16 @@ from typing import Dict, Any, List
 from strike_price_websocket import start_strike_ltp_stream
 import threading
 
-# Configure logging for Main.py
+# Logging for Main.py goes to main.log through the queue listener (log_setup.setup_logging)
 import logging
-from logging.handlers import RotatingFileHandler
+from log_setup import setup_logging, RateLimitedLogger
 
 # Create a named logger for main
 logger = logging.getLogger('main')
-logger.setLevel(logging.INFO)
-
-# Create rotating file handler for main.log (1MB max, keep 1 backup file)
-file_handler = RotatingFileHandler('main.log', maxBytes=1*1024*1024, backupCount=1)
-file_handler.setLevel(logging.INFO)
-
-# Create formatter and add it to the handler
-formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s')
-file_handler.setFormatter(formatter)
-
-# Add the handler to the logger
-logger.addHandler(file_handler)
+# Per-loop-iteration errors: at most one per token every 30 s
+throttled = RateLimitedLogger(logger, interval=30)
+# Console output of the trading threads, written by the listener thread
+console = logging.getLogger('console')
 
 import pandas as pd
 import pytz
@@ -34,19 +26,68 @@ import base64
 
 # --- Local Imports ---
 from algo import HeikinAshiATRStrategy
+from candle_cache import CandleCache
+from strike_index import StrikeIndex
+from request_coalescer import RequestCoalescer
+from candle_feed import ClosedCandleFeed
+from tick_candles import TickCandleFeed, dhan_context_from_env
+from ltp_board import LtpBoard
+from position_sync import StopLossTargetSync
+from control_plane import ControlPlaneWatcher
+from http_transport import ResilientSession
+from async_api_client import AsyncApiDatabaseClient, BlockingApiClient
+from candle_scheduler import CandleSchedule, CandlePoller
 
 
 # --- Constants ---
 IST = pytz.timezone("Asia/Kolkata")
 
+# Entry signal -> (option type, exit signal of the opened position)
+ENTRY_POSITIONS = {"BUY_ENTRY": ("CE", "BUY_EXIT"), "SELL_ENTRY": ("PE", "SELL_EXIT")}
+
+# Pushed-candle poll interval of drivers that must not block in trade_step
+FEED_POLL_INTERVAL = 0.25
+
 load_dotenv()
 
 # --- API Database Client ---
 class ApiDatabaseClient:
     def __init__(self):
         self.base_url = os.getenv("API_BASE_URL", "http://localhost:8000/db")
-        self.session = requests.Session()
+        # Per-endpoint timeouts, GET retries, circuit breaking, latency histograms
+        self.session = ResilientSession()
         self.session.headers.update({"Content-Type": "application/json"})
+        self.ltp_coalescer = None
+        self.ohlc_coalescer = None
+        self._bulk_supported = {}
+
+    def enable_request_coalescing(self, window=0.05):
+        """Routes fetch_latest_ltp / fetch_ohlc from all threads through one bulk call per window."""
+        self.ltp_coalescer = RequestCoalescer(self.fetch_latest_ltp_bulk, window, name="ltp")
+        self.ohlc_coalescer = RequestCoalescer(self.fetch_ohlc_bulk, window, name="ohlc")
+        logger.info(f"Request coalescing enabled (window={window}s)")
+
+    def log_stats(self):
+        self.session.log_stats()
+
+    def _fetch_bulk(self, path, param, keys, fetch_one):
+        """GET a bulk endpoint; falls back to one request per key if it is not deployed."""
+        if self._bulk_supported.get(path, True):
+            resp = self.session.get(f"{self.base_url}{path}", params={param: ",".join(map(str, keys))})
+            if resp.status_code != 404:
+                resp.raise_for_status()
+                return resp.json()
+            logger.info(f"{path} not available, falling back to per-token requests")
+            self._bulk_supported[path] = False
+
+        # Fan-in shim: same result shape, one request per key
+        data = {}
+        for key in keys:
+            try:
+                data[str(key)] = fetch_one(key)
+            except Exception as e:
+                logger.error(f"{path} fallback failed for {key}: {e}")
+        return {"status": "success", "data": data, "shim": True}
 
     def kill_trade_signal(self, token: str) -> bool:
         url = f"{self.base_url}/admin/kill-trade-signal"
@@ -60,6 +101,42 @@ class ApiDatabaseClient:
             logger.error(f"Failed to fetch kill trade signal for token {token}: {e}")
             return False
 
+    def fetch_control_flags(self, tokens, unique_ids, since=None, wait=0):
+        """Kill-switch flags of `tokens` and strike-close flags of `unique_ids` in one call.
+
+        Returns {"kill": {token: bool}, "strike_close": {unique_id: bool}, "version": v}.
+        With `since` (the last version) the server may hold the request up to
+        `wait` seconds until a flag changes. If the endpoint is not deployed the
+        flags are fetched one request per key and "version" is None.
+        """
+        path = "/admin/control-flags"
+        if self._bulk_supported.get(path, True):
+            payload = {"tokens": list(tokens), "unique_ids": list(unique_ids), "since": since, "wait": wait}
+            resp = self.session.post(f"{self.base_url}{path}", json=payload, timeout=wait + 10)
+            if resp.status_code != 404:
+                resp.raise_for_status()
+                data = resp.json()
+                return {
+                    "kill": data.get("kill", {}),
+                    "strike_close": data.get("strike_close", {}),
+                    "version": data.get("version")
+                }
+            logger.info(f"{path} not available, falling back to per-key requests")
+            self._bulk_supported[path] = False
+
+        # Fan-in shim: same result shape, one request per key
+        strike_close = {}
+        for unique_id in unique_ids:
+            try:
+                strike_close[unique_id] = bool(self.get_strike_pice_close_signal(unique_id))
+            except Exception as e:
+                logger.error(f"get_strike_pice_close_signal failed for {unique_id}: {e}")
+        return {
+            "kill": {token: self.kill_trade_signal(token) for token in tokens},
+            "strike_close": strike_close,
+            "version": None
+        }
+
     def get_nifties_token(self) -> list[str]:
         url = f"{self.base_url}/indices/nifty-tokens"
         try:
@@ -72,6 +149,11 @@ class ApiDatabaseClient:
             return []
 
     def fetch_ohlc(self, token, limit=1):
+        if self.ohlc_coalescer is not None:
+            return self.ohlc_coalescer.get(str(token))
+        return self._fetch_ohlc(token, limit)
+
+    def _fetch_ohlc(self, token, limit=1):
         url = f"{self.base_url}/current/ohlc"
         params = {"token": token}
         resp = self.session.get(url, params=params)
@@ -84,9 +166,11 @@ class ApiDatabaseClient:
             return None
         return data["start_time"], data["open"], data["high"], data["low"], data["close"]
 
-    def fetch_historical_ohlc(self, token, limit=500):
+    def fetch_historical_ohlc(self, token, limit=500, since=None):
         url = f"{self.base_url}/historical/ohlc/load"
         params = {"token": token}
+        if since is not None:
+            params["since"] = pd.Timestamp(since).isoformat()
         resp = self.session.get(url, params=params)
         resp.raise_for_status()
         response_data = resp.json()
@@ -98,6 +182,11 @@ class ApiDatabaseClient:
         return df
 
     def fetch_latest_ltp(self, stock_token: str = '99926009'):
+        if self.ltp_coalescer is not None:
+            return self.ltp_coalescer.get(str(stock_token))
+        return self._fetch_latest_ltp(stock_token)
+
+    def _fetch_latest_ltp(self, stock_token: str = '99926009'):
         url = f"{self.base_url}/indices/ltp"
         params = {"stock_token": stock_token}
         resp = self.session.get(url, params=params)
@@ -105,6 +194,33 @@ class ApiDatabaseClient:
         data = resp.json()["data"]
         return data["last_update"], data["ltp"]
 
+    def fetch_latest_ltp_bulk(self, stock_tokens):
+        """{stock_token: (last_update, ltp)} for every token with a price."""
+        response_data = self._fetch_bulk(
+            "/indices/ltp/bulk", "stock_tokens", stock_tokens,
+            lambda token: dict(zip(("last_update", "ltp"), self._fetch_latest_ltp(token)))
+        )
+        return {
+            token: (data["last_update"], data["ltp"])
+            for token, data in response_data.get("data", {}).items()
+            if data
+        }
+
+    def fetch_ohlc_bulk(self, tokens):
+        """{token: (start_time, open, high, low, close) or None}, like fetch_ohlc."""
+        response_data = self._fetch_bulk(
+            "/current/ohlc/bulk", "tokens", tokens,
+            lambda token: _ohlc_dict(self._fetch_ohlc(token))
+        )
+        if response_data.get("status") != "success":
+            return {str(token): None for token in tokens}
+        data = response_data.get("data", {})
+        return {
+            str(token): _ohlc_tuple(data[str(token)])
+            for token in tokens
+            if str(token) in data
+        }
+
     def send_entry_signal(self, token, signal, strike_price_token, strategy_code,
                           unique_id, strike_data, stop_loss, target, description) -> bool:
         url = f"{self.base_url}/signals/entry/v3"
@@ -148,6 +264,17 @@ class ApiDatabaseClient:
         data = resp.json()
         return data['stop_loss'], data['target']
 
+    def fetch_stop_loss_target(self, unique_id: str, etag: str = None):
+        """Conditional SL/TP read: ((stop_loss, target), etag), or (None, etag) on 304 Not Modified."""
+        url = f"{self.base_url}/signals/get-stop-loss-target/v1/{unique_id}"
+        headers = {"If-None-Match": etag} if etag else None
+        resp = self.session.get(url, headers=headers)
+        if resp.status_code == 304:
+            return None, etag
+        resp.raise_for_status()
+        data = resp.json()
+        return (data['stop_loss'], data['target']), resp.headers.get("ETag")
+
     def update_stop_loss_target(self, unique_id: str, stop_loss: float = None, target: float = None):
         url = f"{self.base_url}/signals/update-stop-loss-target/v1"
         params = {"unique_id": unique_id}
@@ -173,17 +300,28 @@ class ApiDatabaseClient:
         data = resp.json()
         base64_file = data.get("file")
         file_path = data.get("file_path")
-        print('file_path :: ', file_path)
         if base64_file:
             os.makedirs(os.path.dirname(file_path), exist_ok=True)
             with open(file_path, "wb") as f:
                 f.write(base64.b64decode(base64_file))
-            print("✅ File saved at:", file_path)
+            console.info("✅ File saved at: %s", file_path)
         else:
-            print("❌ No file found for this token")
+            console.info("❌ No file found for token %s", token)
         return data.get("file"), data.get("file_path")
 
 
+def _ohlc_tuple(data):
+    if not data:
+        return None
+    return data["start_time"], data["open"], data["high"], data["low"], data["close"]
+
+
+def _ohlc_dict(ohlc):
+    if ohlc is None:
+        return None
+    return dict(zip(("start_time", "open", "high", "low", "close"), ohlc))
+
+
 tokens_utils = {
     '25': {"file_name": r"Bank-Nifty.xlsx", "strike_roundup_value": 200, "lot_qty": 30, 'exchange': 'NSE_FNO'},
     "13": {"file_name": r"Nifty.xlsx",      "strike_roundup_value": 100, "lot_qty": 65, 'exchange': 'NSE_FNO'},
@@ -210,11 +348,36 @@ def _reset_position_state():
     }
 
 
+def run_step(step):
+    """Result of a trade_step coroutine run without an event loop.
+
+    StrategyTrader's I/O hooks are blocking calls that never suspend, so the
+    coroutine finishes on its first send().
+    """
+    try:
+        step.send(None)
+    except StopIteration as done:
+        return done.value
+    step.close()
+    raise RuntimeError("trade_step suspended: threaded drivers need blocking I/O hooks")
+
+
 # --- Strategy Orchestration Class ---
 class StrategyTrader:
     def __init__(self, api_client):
         self.api = api_client
         self.strategy_code = os.getenv("STRATEGY_CODE", "UNKNOWN")
+        self.candle_cache = CandleCache()
+        self.strike_indexes = {}
+        self.candle_feed = None
+        self.ltp_board = None
+        self.ltp_board_name = None
+        self.ltp_board_retry_at = 0.0
+        self.ltp_board_lock = threading.Lock()
+        self.ltp_max_age = float(os.getenv("LTP_BOARD_MAX_AGE", "5"))
+        self.sl_tp = StopLossTargetSync(api_client, ttl=float(os.getenv("SL_TP_TTL", "3")))
+        self.control = None
+        self.ltp_check_interval = float(os.getenv("LTP_CHECK_INTERVAL", "2"))
 
     def is_market_open(self) -> bool:
         current_time = datetime.now(IST).time()
@@ -227,398 +390,494 @@ class StrategyTrader:
         current_time = datetime.now(IST).time()
         return time_c(9, 27) <= current_time <= time_c(13, 30)
 
-    def admin_trade_exit_signal(self, token: str) -> bool:
-        return self.api.kill_trade_signal(token=token)
+    # -------------------------------------------------------
+    # I/O hooks of trade_step. Here they are plain blocking
+    # calls, so the step never suspends (see run_step);
+    # async_trader overrides them to await the async client.
+    # -------------------------------------------------------
+
+    async def call_api(self, name: str, *args, **kwargs):
+        """`self.api.<name>(...)`: fetch_ohlc, fetch_latest_ltp, send_*_signal, ..."""
+        return getattr(self.api, name)(*args, **kwargs)
+
+    async def run_blocking(self, fn, *args):
+        """CPU work and SL/TP cache calls (strategy update, sl_tp get/set)."""
+        return fn(*args)
+
+    async def admin_trade_exit_signal(self, token: str) -> bool:
+        if self.control is not None:
+            return self.control.killed(token)
+        return await self.call_api("kill_trade_signal", token=token)
+
+    async def strike_close_signal(self, unique_id: str) -> bool:
+        if self.control is not None:
+            return self.control.strike_closed(unique_id)
+        return bool(await self.call_api("get_strike_pice_close_signal", unique_id))
+
+    def attach_ltp_board(self, name: str) -> None:
+        """Reads LTPs from the streamer's shared-memory board (falls back to the API when stale).
+
+        If the board does not exist yet, latest_ltp retries attaching every 10 s.
+        """
+        self.ltp_board_name = name
+        with self.ltp_board_lock:
+            if self.ltp_board is not None:
+                return
+            self.ltp_board_retry_at = time.monotonic() + 10
+            try:
+                self.ltp_board = LtpBoard.attach(name)
+                logger.info(f"Attached LTP board {name}")
+            except FileNotFoundError:
+                throttled.error("LTP board %s not found, reading LTPs from the API", name, key=name)
+
+    async def latest_ltp(self, token: str):
+        """(last_update, ltp) from the LTP board if it has a fresh price, else from the API."""
+        if self.ltp_board is None and self.ltp_board_name and time.monotonic() >= self.ltp_board_retry_at:
+            self.attach_ltp_board(self.ltp_board_name)
+        if self.ltp_board is not None:
+            quote = self.ltp_board.read(token, max_age=self.ltp_max_age)
+            if quote is not None:
+                return quote
+        return await self.call_api("fetch_latest_ltp", stock_token=token)
+
+    def loop_sleep(self, pos: dict, candle_poller: CandlePoller) -> float:
+        """Seconds until the next LTP exit check (open position) or OHLC poll, capped so the gates rerun."""
+        wait = candle_poller.wait_time(datetime.now(IST))
+        if pos["unique_id"] is not None:
+            wait = min(wait, self.ltp_check_interval)
+        return min(wait, 60.0)
+
+    def load_strike_index(self, token: str, file_name: str, lot_qty: int, exchange: str) -> StrikeIndex:
+        """Builds the strike index of `token` (call after get_symbol_token_file)."""
+        index = StrikeIndex(rf'strike_data/{file_name}', lot_qty=lot_qty, exchange=exchange)
+        self.strike_indexes[str(token)] = index
+        return index
+
+    # -------------------------------------------------------
+    # Per-token loop: start_token once, then trade_step until
+    # the process stops. trade_function drives it on a thread
+    # (run_step); async_trader awaits the same coroutine on
+    # one event loop.
+    # -------------------------------------------------------
+
+    def start_token(self, token: str, strike_roundup_value: int,
+                    file_name: str, lot_qty: int, exchange: str):
+        """Loads history, strategy and strike index of `token`; returns its loop state (None without history)."""
+        logger.info(f"Starting trade loop for token: {token}")
+        stock_token = token
+
+        # Warm start: only candles after the last cached one are fetched
+        historical = self.candle_cache.sync(
+            stock_token,
+            lambda since: self.api.fetch_historical_ohlc(token=stock_token, limit=500, since=since)
+        )
+        if historical is None or len(historical["timestamp"]) == 0:
+            logger.error(f"No historical data found for token {stock_token}, aborting trade loop.")
+            return None
+
+        strategy = HeikinAshiATRStrategy(token=stock_token, strike_roundup_value=strike_roundup_value)
+        strategy.load_historical_candles(historical)
+        if self.candle_feed is not None:
+            # Backfill after a feed drop starts from the end of the loaded history
+            self.candle_feed.mark_seen(stock_token, historical["timestamp"][-1])
+
+        strike_index = self.strike_indexes.get(str(stock_token))
+        if strike_index is None:
+            strike_index = self.load_strike_index(stock_token, file_name, lot_qty, exchange)
+
+        return {
+            "token": stock_token,
+            "strategy": strategy,
+            "strike_index": strike_index,
+            # OHLC is polled just after each expected candle close
+            "candle_poller": CandlePoller(CandleSchedule(strategy.etf)),
+            "pos": _reset_position_state(),
+            "previous_candle_time": None,
+            "cache_candle": None,
+        }
+
+    def close_position(self, state: dict) -> None:
+        """Drops the SL/TP and control-plane tracking of the open position and resets it."""
+        pos = state["pos"]
+        self.sl_tp.forget(pos["unique_id"])
+        if self.control is not None:
+            self.control.unwatch(pos["unique_id"], token=state["token"])
+        state["strategy"].reset_state()
+        state["pos"] = _reset_position_state()
+
+    async def send_exit(self, state: dict, signal: str, description: str) -> None:
+        pos = state["pos"]
+        if pos["strike_price_token"] is None:
+            logger.error(f"Cannot send {signal}: strike_price_token is None for token={state['token']}")
+            return
+        await self.call_api(
+            "send_exit_signal",
+            token=state["token"],
+            signal=signal,
+            strike_price_token=pos["strike_price_token"],
+            strategy_code=self.strategy_code,
+            unique_id=pos["unique_id"],
+            strike_data=pos["strike_data"],
+            stop_loss=pos["stop_loss"],
+            target=pos["target"],
+            description=description
+        )
+
+    async def send_entry(self, state: dict, signal: str, strike_price) -> float:
+        """Sends BUY_ENTRY / SELL_ENTRY and opens the position; returns the seconds to wait."""
+        option_type, exit_key = ENTRY_POSITIONS[signal]
+        strategy = state["strategy"]
+        strike_index = state["strike_index"]
+        pos = state["pos"]
+
+        temp_strike_data = strike_index.lookup(strike_price, option_type)
+        console.info("%s | strikes=%d strike=%s", signal, len(strike_index), strike_price)
+
+        if temp_strike_data is None:
+            logger.error(f"No {option_type} option found for strike_price {strike_price}")
+            strategy.reset_state()
+            return 2
+
+        temp_unique_id = str(uuid4())
+        temp_spt = temp_strike_data["token"]
+
+        if await self.call_api(
+            "send_entry_signal",
+            token=state["token"], signal=signal,
+            strike_price_token=temp_spt,
+            strategy_code=self.strategy_code,
+            unique_id=temp_unique_id,
+            strike_data=temp_strike_data,
+            stop_loss=pos["stop_loss"],
+            target=pos["target"],
+            description='natural entry signal from 3mins strategy'
+        ):
+            pos["previous_entry_exit_key"] = exit_key
+            pos["unique_id"]               = temp_unique_id
+            pos["strike_price_token"]      = temp_spt
+            pos["strike_data"]             = temp_strike_data
+            pos["open_order"]              = True
+            self.sl_tp.track(temp_unique_id, pos["stop_loss"], pos["target"])
+            if self.control is not None:
+                # Kill switch and strike close are watched only while the position is open
+                self.control.watch(token=state["token"], unique_id=temp_unique_id)
+            logger.info(f"{signal} confirmed | spt={temp_spt}")
+        else:
+            logger.error(f"Failed to send {signal} signal, resetting strategy state")
+            strategy.reset_state()
+        return self.loop_sleep(pos, state["candle_poller"])
+
+    @staticmethod
+    def update_strategy(strategy, live_data):
+        """Feeds one closed candle to the strategy; returns generate_signal()'s result."""
+        strategy.add_live_data(live_data)
+        return strategy.generate_signal()
+
+    async def trade_step(self, state: dict, candle_wait: float) -> float:
+        """One pass of the trading loop; returns the seconds to wait before the next.
+
+        `candle_wait` is how long to block for a pushed candle (0 when the
+        caller must not block, e.g. the asyncio driver).
+        """
+        stock_token = state["token"]
+        strategy = state["strategy"]
+        candle_poller = state["candle_poller"]
+        pos = state["pos"]
+
+        # Persist the last candle to the warm-start cache, off the signal path
+        if state["cache_candle"] is not None:
+            try:
+                self.candle_cache.append(stock_token, state["cache_candle"])
+            except Exception as e:
+                logger.error(f"Candle cache append failed for token {stock_token}: {e}")
+            state["cache_candle"] = None
+
+        # --------------------------------------------------
+        # 1. Market hours gate
+        #    - Loop runs until 1:30 PM to allow force close
+        #    - After 1:30 PM and no open trade, sleep
+        # --------------------------------------------------
+        current_time = datetime.now(IST).time()
+        if current_time < time_c(9, 27) or \
+                (current_time > time_c(13, 30) and pos["unique_id"] is None):
+            return 60
+
+        # --------------------------------------------------
+        # 2. Fetch LTP (only needed for the exit checks of an
+        #    open position)
+        # --------------------------------------------------
+        ltp_price = None
+        if pos["unique_id"] is not None:
+            try:
+                ltp_price = (await self.latest_ltp(stock_token))[1]
+            except Exception as e:
+                throttled.error("Failed to fetch latest LTP for token %s: %s", stock_token, e, key=stock_token)
+                return 10
+
+        # --------------------------------------------------
+        # 3. Force close at 1:30 PM if trade is open
+        # --------------------------------------------------
+        if datetime.now(IST).time() >= time_c(13, 30) \
+                and pos["unique_id"] is not None:
+            exit_signal = pos["previous_entry_exit_key"]  # 'BUY_EXIT' or 'SELL_EXIT'
+            logger.info(f"Force close at 1:30 PM | signal={exit_signal} token={stock_token}")
+            console.info("Force close at 1:30 PM: sending %s for token=%s", exit_signal, stock_token)
+            await self.send_exit(state, exit_signal, 'force close at 1:30 PM')
+            self.close_position(state)
+            return 2
+
+        # --------------------------------------------------
+        # 4. LTP-based exit check (runs every tick)
+        # --------------------------------------------------
+        exit_flag = False
+
+        if pos["previous_entry_exit_key"] is not None \
+                and pos["stop_loss"] is not None \
+                and pos["target"] is not None \
+                and pos["unique_id"] is not None:
+
+            # SL/target from the sync cache (revalidated against the API once per TTL)
+            try:
+                temp_sl, temp_tp = await self.run_blocking(self.sl_tp.get, pos["unique_id"])
+                if temp_sl is not None:
+                    pos["stop_loss"] = temp_sl
+                if temp_tp is not None:
+                    pos["target"] = temp_tp
+            except Exception as e:
+                logger.error(f"get_stop_loss_target failed: {e}")
+
+            if pos["previous_entry_exit_key"] == 'BUY_EXIT':
+                if ltp_price <= pos["stop_loss"] or ltp_price >= pos["target"]:
+                    exit_flag = True
+                    logger.info(
+                        f"BUY LTP exit triggered | ltp={ltp_price} "
+                        f"sl={pos['stop_loss']} tp={pos['target']}"
+                    )
+                elif await self.admin_trade_exit_signal(token=stock_token):
+                    exit_flag = True
+                    logger.info(f"Admin BUY exit for token={stock_token}")
+
+            elif pos["previous_entry_exit_key"] == 'SELL_EXIT':
+                if ltp_price >= pos["stop_loss"] or ltp_price <= pos["target"]:
+                    exit_flag = True
+                    logger.info(
+                        f"SELL LTP exit triggered | ltp={ltp_price} "
+                        f"sl={pos['stop_loss']} tp={pos['target']}"
+                    )
+                elif await self.admin_trade_exit_signal(token=stock_token):
+                    exit_flag = True
+                    logger.info(f"Admin SELL exit for token={stock_token}")
+
+            # Admin strike-price close
+            if not exit_flag:
+                try:
+                    if await self.strike_close_signal(pos["unique_id"]):
+                        exit_flag = True
+                        logger.info(f"Strike price close signal for token={stock_token}")
+                except Exception as e:
+                    logger.error(f"get_strike_pice_close_signal failed: {e}")
+
+        # --------------------------------------------------
+        # 4. If LTP exit triggered — send exit NOW without
+        #    waiting for a new candle
+        # --------------------------------------------------
+        if exit_flag and pos["unique_id"] is not None:
+            exit_signal = pos["previous_entry_exit_key"]   # 'BUY_EXIT' or 'SELL_EXIT'
+            logger.info(f"{exit_signal} via exit_flag for token={stock_token}")
+            console.info("%s: closing position via LTP/admin trigger", exit_signal)
+            await self.send_exit(state, exit_signal, 'LTP/admin exit from 3mins strategy')
+            self.close_position(state)
+            return 2
+
+        # --------------------------------------------------
+        # 5. Next candle: pushed by the candle feed when it is
+        #    live, otherwise polled from /current/ohlc
+        # --------------------------------------------------
+        if self.candle_feed is not None and self.candle_feed.live:
+            # Waiting for the push replaces the loop sleep
+            candle = self.candle_feed.get(stock_token, timeout=candle_wait)
+            if candle is None:
+                return 0 if candle_wait else FEED_POLL_INTERVAL
+            start_time, open_, high, low, close, volume = (
+                candle['start_time'], candle['open'], candle['high'], candle['low'],
+                candle['close'], candle['volume']
+            )
+            console.info("pushed ohlc = %s", candle)
+        else:
+            poll_time = datetime.now(IST)
+            if not candle_poller.due(poll_time):
+                return self.loop_sleep(pos, candle_poller)
+            try:
+                ohlc_result = await self.call_api("fetch_ohlc", token=stock_token, limit=1)
+                if ohlc_result is None:
+                    throttled.error("OHLC fetch returned None for token %s", stock_token, key=stock_token)
+                    return 5
+                start_time, open_, high, low, close = ohlc_result
+                volume = 0  # /current/ohlc carries no volume
+                console.info("ohlc = %s", ohlc_result)
+            except Exception as e:
+                throttled.error("Failed to fetch OHLC for token %s: %s", stock_token, e, key=stock_token)
+                return 10
+
+            # Skip duplicate candle (retried in a short burst after the expected close)
+            new_candle = start_time != state["previous_candle_time"]
+            candle_poller.fetched(poll_time, new_candle)
+            if not new_candle:
+                return self.loop_sleep(pos, candle_poller)
+            if self.candle_feed is not None:
+                self.candle_feed.mark_seen(stock_token, start_time)
+        state["previous_candle_time"] = start_time
+        console.info("New candle: open=%s high=%s low=%s close=%s ts=%s", open_, high, low, close, start_time)
+
+        # --------------------------------------------------
+        # 6. Feed candle to strategy and generate signal
+        # --------------------------------------------------
+        live_data = {
+            'open': open_, 'close': close,
+            'high': high,  'low': low,
+            'volume': volume, 'timestamp': start_time
+        }
+        signal_result = await self.run_blocking(self.update_strategy, strategy, live_data)
+        state["cache_candle"] = live_data
+        console.info("signal result = %s", signal_result)
+
+        if isinstance(signal_result, tuple):
+            signal, stop_loss_, target_, strike_price = signal_result
+        else:
+            signal, stop_loss_, target_, strike_price = signal_result, None, None, None
+
+        # Update SL/target if new values came in
+        if stop_loss_ is not None:
+            pos["stop_loss"] = stop_loss_
+        if target_ is not None:
+            pos["target"] = target_
+
+        # Push updated SL/target to API if trade is open
+        if pos["stop_loss"] is not None and pos["target"] is not None \
+                and pos["unique_id"] is not None:
+            try:
+                # Only written when the values differ from the server's
+                await self.run_blocking(self.sl_tp.set, pos["unique_id"], pos["stop_loss"], pos["target"])
+            except Exception as e:
+                logger.error(f"update_stop_loss_target failed: {e}")
+
+        logger.info(f"Signal: {signal} | strike_price: {strike_price}")
+
+        # --------------------------------------------------
+        # 7. Strategy-generated EXIT signals (candle close)
+        # --------------------------------------------------
+        if signal in ('BUY_EXIT', 'SELL_EXIT'):
+            if pos["unique_id"] is not None:
+                console.info("%s: closing position via strategy candle signal", signal)
+                logger.info(f"{signal} via strategy for token={stock_token}")
+                await self.send_exit(state, signal, 'strategy candle exit from 3mins strategy')
+                self.close_position(state)
+            else:
+                logger.info(f"Ignoring {signal} — no active position.")
+                strategy.reset_state()
+            return 2
+
+        # --------------------------------------------------
+        # 8. ENTRY signals
+        # --------------------------------------------------
+        if signal in ENTRY_POSITIONS:
+            if self.is_new_entry_allowed():
+                return await self.send_entry(state, signal, strike_price)
+            logger.info(f"{signal} ignored — past time limit. Resetting strategy state.")
+            strategy.reset_state()
+
+        return self.loop_sleep(pos, candle_poller)
 
     def trade_function(self, token: str, strike_roundup_value: int,
                        file_name: str, lot_qty: int, exchange: str) -> None:
-        import traceback
+        """Thread driver of the per-token loop."""
         try:
-            logger.info(f"Starting trade_function for token: {token}")
-            stock_token = token
-
-            historical_df = self.api.fetch_historical_ohlc(token=stock_token, limit=500)
-            if historical_df is None or historical_df.empty:
-                logger.error("No historical data found, aborting trade_function.")
+            state = self.start_token(token, strike_roundup_value, file_name, lot_qty, exchange)
+            if state is None:
                 return
-
-            strategy = HeikinAshiATRStrategy(token=stock_token, strike_roundup_value=strike_roundup_value)
-            temp_csv = f"_temp_{stock_token}_ohlc.csv"
-            historical_df.to_csv(temp_csv, index=False)
-            strategy.load_historical_data(temp_csv)
-
-            # --- Position state ---
-            pos = _reset_position_state()
-            previous_candle_time = None
-
             while True:
-                # --------------------------------------------------
-                # 1. Market hours gate
-                #    - Loop runs until 1:30 PM to allow force close
-                #    - After 1:30 PM and no open trade, sleep
-                # --------------------------------------------------
-                current_time = datetime.now(IST).time()
-                if current_time < time_c(9, 27) or \
-                        (current_time > time_c(13, 30) and pos["unique_id"] is None):
-                    time.sleep(60)
-                    continue
-
-                # --------------------------------------------------
-                # 2. Fetch LTP
-                # --------------------------------------------------
-                try:
-                    ltp_price = self.api.fetch_latest_ltp(stock_token=stock_token)[1]
-                except Exception as e:
-                    logger.error(f"Failed to fetch latest LTP: {e}")
-                    traceback.print_exc()
-                    time.sleep(10)
-                    continue
-
-                # --------------------------------------------------
-                # 3. Force close at 1:30 PM if trade is open
-                # --------------------------------------------------
-                if datetime.now(IST).time() >= time_c(13, 30) \
-                        and pos["unique_id"] is not None:
-                    exit_signal = pos["previous_entry_exit_key"]  # 'BUY_EXIT' or 'SELL_EXIT'
-                    logger.info(f"Force close at 1:30 PM | signal={exit_signal} token={stock_token}")
-                    print(f"Force close at 1:30 PM: sending {exit_signal} for token={stock_token}")
-
-                    if pos["strike_price_token"] is not None:
-                        self.api.send_exit_signal(
-                            token=token,
-                            signal=exit_signal,
-                            strike_price_token=pos["strike_price_token"],
-                            strategy_code=self.strategy_code,
-                            unique_id=pos["unique_id"],
-                            strike_data=pos["strike_data"],
-                            stop_loss=pos["stop_loss"],
-                            target=pos["target"],
-                            description='force close at 1:30 PM'
-                        )
-                    else:
-                        logger.error(f"Force close: strike_price_token is None for token={stock_token}")
-
-                    strategy.reset_state()
-                    pos = _reset_position_state()
-                    time.sleep(2)
-                    continue
-
-                # --------------------------------------------------
-                # 4. LTP-based exit check (runs every tick)
-                # --------------------------------------------------
-                exit_flag = False
-
-                if pos["previous_entry_exit_key"] is not None \
-                        and pos["stop_loss"] is not None \
-                        and pos["target"] is not None \
-                        and pos["unique_id"] is not None:
-
-                    # Refresh SL/target from API
-                    try:
-                        temp_sl, temp_tp = self.api.get_stop_loss_target(pos["unique_id"])
-                        if temp_sl is not None:
-                            pos["stop_loss"] = temp_sl
-                        if temp_tp is not None:
-                            pos["target"] = temp_tp
-                    except Exception as e:
-                        logger.error(f"get_stop_loss_target failed: {e}")
-
-                    if pos["previous_entry_exit_key"] == 'BUY_EXIT':
-                        if ltp_price <= pos["stop_loss"] or ltp_price >= pos["target"]:
-                            exit_flag = True
-                            logger.info(
-                                f"BUY LTP exit triggered | ltp={ltp_price} "
-                                f"sl={pos['stop_loss']} tp={pos['target']}"
-                            )
-                        elif self.admin_trade_exit_signal(token=stock_token):
-                            exit_flag = True
-                            logger.info(f"Admin BUY exit for token={stock_token}")
-
-                    elif pos["previous_entry_exit_key"] == 'SELL_EXIT':
-                        if ltp_price >= pos["stop_loss"] or ltp_price <= pos["target"]:
-                            exit_flag = True
-                            logger.info(
-                                f"SELL LTP exit triggered | ltp={ltp_price} "
-                                f"sl={pos['stop_loss']} tp={pos['target']}"
-                            )
-                        elif self.admin_trade_exit_signal(token=stock_token):
-                            exit_flag = True
-                            logger.info(f"Admin SELL exit for token={stock_token}")
-
-                    # Admin strike-price close
-                    if not exit_flag:
-                        try:
-                            if self.api.get_strike_pice_close_signal(pos["unique_id"]):
-                                exit_flag = True
-                                logger.info(f"Strike price close signal for token={stock_token}")
-                        except Exception as e:
-                            logger.error(f"get_strike_pice_close_signal failed: {e}")
-
-                # --------------------------------------------------
-                # 4. If LTP exit triggered — send exit NOW without
-                #    waiting for a new candle
-                # --------------------------------------------------
-                if exit_flag and pos["unique_id"] is not None:
-                    exit_signal = pos["previous_entry_exit_key"]   # 'BUY_EXIT' or 'SELL_EXIT'
-                    logger.info(f"{exit_signal} via exit_flag for token={stock_token}")
-                    print(f"{exit_signal}: closing position via LTP/admin trigger")
-
-                    if pos["strike_price_token"] is not None:
-                        self.api.send_exit_signal(
-                            token=token,
-                            signal=exit_signal,
-                            strike_price_token=pos["strike_price_token"],
-                            strategy_code=self.strategy_code,
-                            unique_id=pos["unique_id"],
-                            strike_data=pos["strike_data"],
-                            stop_loss=pos["stop_loss"],
-                            target=pos["target"],
-                            description='LTP/admin exit from 3mins strategy'
-                        )
-                    else:
-                        logger.error(f"Cannot send {exit_signal}: strike_price_token is None")
-
-                    # Reset everything
-                    strategy.reset_state()
-                    pos = _reset_position_state()
-                    time.sleep(2)
-                    continue
-
-                # --------------------------------------------------
-                # 5. Fetch latest OHLC candle
-                # --------------------------------------------------
-                try:
-                    ohlc_result = self.api.fetch_ohlc(token=stock_token, limit=1)
-                    if ohlc_result is None:
-                        logger.error(f"OHLC fetch returned None for token {stock_token}")
-                        time.sleep(5)
-                        continue
-                    start_time, open_, high, low, close = ohlc_result
-                    print('ohlc =', ohlc_result)
-                except Exception as e:
-                    logger.error(f"Failed to fetch OHLC for token {stock_token}: {e}")
-                    traceback.print_exc()
-                    time.sleep(10)
-                    continue
-
-                # Skip duplicate candle
-                if start_time == previous_candle_time:
-                    time.sleep(2)
-                    continue
-                previous_candle_time = start_time
-                print(f"New candle: open={open_} high={high} low={low} close={close} ts={start_time}")
-
-                # --------------------------------------------------
-                # 6. Feed candle to strategy and generate signal
-                # --------------------------------------------------
-                live_data = {
-                    'open': open_, 'close': close,
-                    'high': high,  'low': low,
-                    'volume': 0,   'timestamp': start_time
-                }
-                strategy.add_live_data(live_data)
-                signal_result = strategy.generate_signal()
-                print('signal result =', signal_result)
-
-                if isinstance(signal_result, tuple):
-                    signal, stop_loss_, target_, strike_price = signal_result
-                else:
-                    signal, stop_loss_, target_, strike_price = signal_result, None, None, None
-
-                # Update SL/target if new values came in
-                if stop_loss_ is not None:
-                    pos["stop_loss"] = stop_loss_
-                if target_ is not None:
-                    pos["target"] = target_
-
-                # Push updated SL/target to API if trade is open
-                if pos["stop_loss"] is not None and pos["target"] is not None \
-                        and pos["unique_id"] is not None:
-                    try:
-                        self.api.update_stop_loss_target(
-                            pos["unique_id"], pos["stop_loss"], pos["target"]
-                        )
-                    except Exception as e:
-                        logger.error(f"update_stop_loss_target failed: {e}")
-
-                logger.info(f"Signal: {signal} | strike_price: {strike_price}")
-
-                # --------------------------------------------------
-                # 7. Strategy-generated EXIT signals (candle close)
-                # --------------------------------------------------
-                if signal in ('BUY_EXIT', 'SELL_EXIT'):
-                    if pos["unique_id"] is not None:
-                        print(f"{signal}: closing position via strategy candle signal")
-                        logger.info(f"{signal} via strategy for token={stock_token}")
-
-                        if pos["strike_price_token"] is not None:
-                            self.api.send_exit_signal(
-                                token=token,
-                                signal=signal,
-                                strike_price_token=pos["strike_price_token"],
-                                strategy_code=self.strategy_code,
-                                unique_id=pos["unique_id"],
-                                strike_data=pos["strike_data"],
-                                stop_loss=pos["stop_loss"],
-                                target=pos["target"],
-                                description='strategy candle exit from 3mins strategy'
-                            )
-                        else:
-                            logger.error(f"Cannot send {signal}: strike_price_token is None")
-
-                        strategy.reset_state()
-                        pos = _reset_position_state()
-                    else:
-                        logger.info(f"Ignoring {signal} — no active position.")
-                        strategy.reset_state()
-
-                    time.sleep(2)
-                    continue
-
-                # --------------------------------------------------
-                # 8. ENTRY signals
-                # --------------------------------------------------
-                if signal == 'BUY_ENTRY' and self.is_new_entry_allowed():
-                    tokens_data_frame = pd.read_excel(rf'strike_data/{file_name}')
-                    option_token_row = tokens_data_frame[
-                        (tokens_data_frame['strike_price'] == int(strike_price)) &
-                        (tokens_data_frame['position'] == 'CE')
-                    ]
-                    print(f"BUY_ENTRY | df_len={len(tokens_data_frame)} strike={strike_price}")
-
-                    if option_token_row.empty:
-                        logger.error(f"No CE option found for strike_price {strike_price}")
-                        strategy.reset_state()
-                        time.sleep(2)
-                        continue
-
-                    temp_unique_id = str(uuid4())
-                    temp_spt = str(option_token_row['token'].iloc[0])
-                    temp_strike_data = {
-                        "token":        str(option_token_row['token'].iloc[0]),
-                        "exchange":     str(option_token_row['exchange'].iloc[0]),
-                        "index_name":   str(option_token_row['index_name'].iloc[0]),
-                        "DOE":          str(option_token_row['DOE'].iloc[0]),
-                        "strike_price": int(option_token_row['strike_price'].iloc[0]),
-                        "position":     str(option_token_row['position'].iloc[0]),
-                        "symbol":       str(option_token_row['symbol'].iloc[0]),
-                        "lot_qty":      lot_qty,
-                        "exchange":     exchange
-                    }
-
-                    if self.api.send_entry_signal(
-                        token=token, signal="BUY_ENTRY",
-                        strike_price_token=temp_spt,
-                        strategy_code=self.strategy_code,
-                        unique_id=temp_unique_id,
-                        strike_data=temp_strike_data,
-                        stop_loss=pos["stop_loss"],
-                        target=pos["target"],
-                        description='natural entry signal from 3mins strategy'
-                    ):
-                        pos["previous_entry_exit_key"] = 'BUY_EXIT'
-                        pos["unique_id"]               = temp_unique_id
-                        pos["strike_price_token"]      = temp_spt
-                        pos["strike_data"]             = temp_strike_data
-                        pos["open_order"]              = True
-                        logger.info(f"BUY_ENTRY confirmed | spt={temp_spt}")
-                    else:
-                        logger.error("Failed to send BUY_ENTRY signal, resetting strategy state")
-                        strategy.reset_state()
-
-                elif signal == 'BUY_ENTRY':
-                    logger.info("BUY_ENTRY ignored — past time limit. Resetting strategy state.")
-                    strategy.reset_state()
-
-                elif signal == 'SELL_ENTRY' and self.is_new_entry_allowed():
-                    tokens_data_frame = pd.read_excel(rf'strike_data/{file_name}')
-                    option_token_row = tokens_data_frame[
-                        (tokens_data_frame['strike_price'] == int(strike_price)) &
-                        (tokens_data_frame['position'] == 'PE')
-                    ]
-                    print(f"SELL_ENTRY | df_len={len(tokens_data_frame)} strike={strike_price}")
-
-                    if option_token_row.empty:
-                        logger.error(f"No PE option found for strike_price {strike_price}")
-                        strategy.reset_state()
-                        time.sleep(2)
-                        continue
-
-                    temp_unique_id = str(uuid4())
-                    temp_spt = str(option_token_row['token'].iloc[0])
-                    temp_strike_data = {
-                        "token":        str(option_token_row['token'].iloc[0]),
-                        "exchange":     str(option_token_row['exchange'].iloc[0]),
-                        "index_name":   str(option_token_row['index_name'].iloc[0]),
-                        "DOE":          str(option_token_row['DOE'].iloc[0]),
-                        "strike_price": int(option_token_row['strike_price'].iloc[0]),
-                        "position":     str(option_token_row['position'].iloc[0]),
-                        "symbol":       str(option_token_row['symbol'].iloc[0]),
-                        "lot_qty":      lot_qty,
-                        "exchange":     exchange
-                    }
-
-                    if self.api.send_entry_signal(
-                        token=token, signal="SELL_ENTRY",
-                        strike_price_token=temp_spt,
-                        strategy_code=self.strategy_code,
-                        unique_id=temp_unique_id,
-                        strike_data=temp_strike_data,
-                        stop_loss=pos["stop_loss"],
-                        target=pos["target"],
-                        description='natural entry signal from 3mins strategy'
-                    ):
-                        pos["previous_entry_exit_key"] = 'SELL_EXIT'
-                        pos["unique_id"]               = temp_unique_id
-                        pos["strike_price_token"]      = temp_spt
-                        pos["strike_data"]             = temp_strike_data
-                        pos["open_order"]              = True
-                        logger.info(f"SELL_ENTRY confirmed | spt={temp_spt}")
-                    else:
-                        logger.error("Failed to send SELL_ENTRY signal, resetting strategy state")
-                        strategy.reset_state()
-
-                elif signal == 'SELL_ENTRY':
-                    logger.info("SELL_ENTRY ignored — past time limit. Resetting strategy state.")
-                    strategy.reset_state()
-
-                time.sleep(2)
+                time.sleep(run_step(self.trade_step(state, candle_wait=self.ltp_check_interval)))
 
         except Exception as e:
-            print('error is ::', e)
-            logger.error(f"Error processing trade: {str(e)}", exc_info=True)
-            import traceback
-            traceback.print_exc()
+            logger.error(f"Error processing trade for token {token}: {e}", exc_info=True)
+
+    def log_http_stats(self, interval: float) -> None:
+        """Logs the per-endpoint latency histograms of the API session every `interval` seconds."""
+        while True:
+            time.sleep(interval)
+            self.api.log_stats()
+
+    def setup(self) -> list:
+        """Starts the shared services (stats, LTP board, control plane, candle feed) and
+        loads every token's strike index; returns the (token, trade loop args) to run."""
+        stats_interval = float(os.getenv("HTTP_STATS_INTERVAL", "300"))
+        if stats_interval > 0:
+            threading.Thread(
+                target=self.log_http_stats, args=(stats_interval,), name="http-stats", daemon=True
+            ).start()
+
+        coalesce_window = float(os.getenv("REQUEST_COALESCE_WINDOW", "0"))
+        if coalesce_window > 0 and hasattr(self.api, "enable_request_coalescing"):
+            self.api.enable_request_coalescing(coalesce_window)
+
+        if os.getenv("LTP_BOARD"):
+            self.attach_ltp_board(os.getenv("LTP_BOARD"))
+
+        tokens = ApiDatabaseClient().get_nifties_token()
+
+        if os.getenv("CONTROL_PLANE", "").lower() in ("1", "true", "yes"):
+            # Own client: its long-polls must not hold the trading threads' connections
+            self.control = ControlPlaneWatcher(
+                ApiDatabaseClient(),
+                interval=float(os.getenv("CONTROL_PLANE_INTERVAL", "1")),
+                long_poll=float(os.getenv("CONTROL_PLANE_LONG_POLL", "10"))
+            ).start()
+        console.info("tokens are :: %s", tokens)
+
+        candle_feed = os.getenv("CANDLE_FEED", "").lower()
+        backfill = lambda token, since: self.api.fetch_historical_ohlc(token=token, since=since)
+        if candle_feed == "sse":
+            self.candle_feed = ClosedCandleFeed(
+                f"{self.api.base_url}/stream/candles", tokens, backfill=backfill
+            ).start()
+        elif candle_feed == "ticks":
+            # Candles built locally from the Dhan index tick stream
+            self.candle_feed = TickCandleFeed(tokens, dhan_context_from_env(), backfill=backfill).start()
+
+        jobs = []
+        for token in tokens:
+            self.api.get_symbol_token_file(token)
+            util_dict = tokens_utils[str(token)]
+            self.load_strike_index(token, util_dict['file_name'],
+                                   util_dict['lot_qty'], util_dict['exchange'])
+            jobs.append((token, (token, util_dict['strike_roundup_value'],
+                                 util_dict['file_name'], util_dict['lot_qty'], util_dict['exchange'])))
+        return jobs
 
     def run(self):
-        import traceback
         try:
-            tokens = ApiDatabaseClient().get_nifties_token()
-            print('tokens are ::', tokens)
             threads = []
-            for token in tokens:
-                self.api.get_symbol_token_file(token)
-                util_dict = tokens_utils[str(token)]
-                t = threading.Thread(
-                    target=self.trade_function,
-                    args=(token, util_dict['strike_roundup_value'],
-                          util_dict['file_name'], util_dict['lot_qty'], util_dict['exchange'])
-                )
+            for token, args in self.setup():
+                t = threading.Thread(target=self.trade_function, args=args)
                 t.start()
-                print(f"Started thread for token={token}")
+                console.info("Started thread for token=%s", token)
                 threads.append(t)
         except Exception as e:
             logger.error("Error in run method", exc_info=True)
-            traceback.print_exc()
 
 
 # --- Entry Point ---
 if __name__ == "__main__":
-    print('main function started')
-    api_client = ApiDatabaseClient()
+    setup_logging()
+    console.info("main function started")
+    if os.getenv("API_CLIENT", "").lower() == "async":
+        # All token threads share one pooled async client (optionally HTTP/2)
+        api_client = BlockingApiClient(AsyncApiDatabaseClient())
+    else:
+        api_client = ApiDatabaseClient()
     api_client.fetch_latest_ltp(stock_token='25')
-    print('api client created')
+    console.info("api client created")
     trader = StrategyTrader(api_client)
-    print('trader created')
+    console.info("trader created")
     trader.run()
-    print('trader run')
\ No newline at end of file
+    console.info("trader run")
\ No newline at end of file
@@ -8,6 +8,17 @@ Fixes Applied
 3. Zero/negative range guard added in expansion_body_signal
 4. ffill + bfill applied to rsi_htf reindex to eliminate NaN on edge rows
 5. Diagnostic logging added per candle to aid debugging
+
+Indicator Modes
+---------------
+"streaming" (default) updates HA / ATR / RSI / HTF RSI incrementally in O(1)
+per candle via indicator_engine.StreamingIndicatorEngine.
+"reference" re-runs pandas_ta over the full DataFrame on every candle; it is
+kept to cross-check the streaming values.
+
+In streaming mode candles and indicators live in a bounded
+candle_store.CandleStore holding the last `history_window` rows; `df` builds
+a DataFrame from it only when accessed.
 """
 
 import math
@@ -15,22 +26,17 @@ import pandas as pd
 import pandas_ta as ta
 import logging
 
+from candle_cache import ist_index
+from candle_store import CandleStore
+from indicator_engine import StreamingIndicatorEngine
+
 
 # -----------------------------------------------------------
 # Logging Configuration
 # -----------------------------------------------------------
 
-logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
-
-file_handler = logging.FileHandler("heikin_ashi_strategy.log")
-file_handler.setLevel(logging.INFO)
-
-formatter = logging.Formatter("%(asctime)s %(levelname)s %(message)s")
-file_handler.setFormatter(formatter)
-
-if not logger.handlers:
-    logger.addHandler(file_handler)
+# Written to heikin_ashi_strategy.log by log_setup.setup_logging()
+logger = logging.getLogger("algo")
 
 
 # -----------------------------------------------------------
@@ -50,8 +56,17 @@ class HeikinAshiATRStrategy:
         etf="3min",
         htf="15min",
         body_expansion_factor=0.68,
-        token=None
+        token=None,
+        indicator_mode="streaming",
+        history_window=500
     ):
+        if indicator_mode not in ("streaming", "reference"):
+            raise ValueError(
+                f"indicator_mode must be 'streaming' or 'reference', got {indicator_mode!r}"
+            )
+        if history_window < 3:
+            raise ValueError(f"history_window must be >= 3, got {history_window}")
+
         self.atr_len = atr_len
         self.atr_mult = atr_mult
         self.rsi_len = rsi_len
@@ -65,7 +80,12 @@ class HeikinAshiATRStrategy:
 
         self.body_expansion_factor = body_expansion_factor
 
-        self.df = pd.DataFrame()
+        self.indicator_mode = indicator_mode
+        self.history_window = history_window
+        self.indicators = None
+        self.candles = CandleStore(history_window)
+
+        self._df = pd.DataFrame()
 
         self.last_position = None
         self.entry_price = None
@@ -77,6 +97,45 @@ class HeikinAshiATRStrategy:
         self.lowest_since_entry = None
 
 
+    # -------------------------------------------------------
+    # Candle access (same interface for both indicator modes)
+    # -------------------------------------------------------
+
+    @property
+    def df(self):
+        """All candles + indicators as a DataFrame.
+
+        In streaming mode this is built from the candle store on every access,
+        so use it for debugging / export only, not per candle.
+        """
+        if self.indicator_mode == "streaming":
+            return self.candles.to_frame()
+        return self._df
+
+    @df.setter
+    def df(self, value):
+        if self.indicator_mode == "streaming":
+            raise AttributeError("df is read-only in streaming mode")
+        self._df = value
+
+    def _candle_count(self):
+        """Number of candles seen, including ones rolled out of the store."""
+        if self.indicator_mode == "streaming":
+            return self.candles.total
+        return len(self._df)
+
+    def _value(self, column, i=-1):
+        if self.indicator_mode == "streaming":
+            return self.candles.value(column, i)
+        return self._df[column].iloc[i]
+
+    def latest_row(self, i=-1):
+        """Row `i` from the end (-1 = newest) with candle and indicator values."""
+        if self.indicator_mode == "streaming":
+            return self.candles.row(i)
+        return self._df.iloc[i]
+
+
     # -------------------------------------------------------
     # Internal: Recalculate all indicators on self.df
     # -------------------------------------------------------
@@ -125,25 +184,76 @@ class HeikinAshiATRStrategy:
         self.df["rsi_htf"] = rsi_htf_reindexed.values
 
 
+    # -------------------------------------------------------
+    # Internal: Streaming indicators (O(1) per candle)
+    # -------------------------------------------------------
+
+    def _new_indicator_engine(self):
+        return StreamingIndicatorEngine(
+            atr_len=self.atr_len,
+            rsi_len=self.rsi_len,
+            htf=self.htf
+        )
+
+    def _append_streaming(self, timestamp, open_, high, low, close, volume):
+        values = self.indicators.update(timestamp, open_, high, low, close)
+        values.update(open=open_, high=high, low=low, close=close, volume=volume)
+        self.candles.append(timestamp, values)
+
+    def _seed_streaming_indicators(self, df):
+        """Feeds the loaded history through a fresh engine, one candle at a time.
+
+        The engine sees every row so its recursive state is fully warmed up;
+        the store keeps only the last `history_window` of them. Each row holds
+        the values the engine produced when that row was the newest candle,
+        i.e. what the live path would have seen.
+        """
+        self.indicators = self._new_indicator_engine()
+        self.candles = CandleStore(self.history_window)
+
+        volume = df["volume"].to_numpy() if "volume" in df.columns else [0] * len(df)
+
+        for ts, o, h, l, c, v in zip(
+            df["timestamp"],
+            df["open"].to_numpy(),
+            df["high"].to_numpy(),
+            df["low"].to_numpy(),
+            df["close"].to_numpy(),
+            volume
+        ):
+            self._append_streaming(ts, o, h, l, c, v)
+
+
     # -------------------------------------------------------
     # Load historical OHLC data
     # -------------------------------------------------------
 
     def load_historical_data(self, csv_file):
 
-        self.df = pd.read_csv(csv_file)
+        self.load_historical_candles(pd.read_csv(csv_file))
+
+    def load_historical_candles(self, candles):
+        """Loads history from memory: an OHLC DataFrame or a dict of columns
+        (e.g. candle_cache.CandleCache.sync()) instead of a CSV path."""
+
+        df = candles.copy() if isinstance(candles, pd.DataFrame) else pd.DataFrame(dict(candles))
 
         # Support both column name conventions
-        if "start_time" in self.df.columns:
-            self.df.rename(columns={"start_time": "timestamp"}, inplace=True)
+        if "start_time" in df.columns:
+            df.rename(columns={"start_time": "timestamp"}, inplace=True)
 
-        self.df["timestamp"] = pd.to_datetime(self.df["timestamp"])
-        self.df.sort_values("timestamp", inplace=True)
-        self.df.reset_index(drop=True, inplace=True)
+        # IST like the live candles, whatever timezone the history came in
+        df["timestamp"] = ist_index(df["timestamp"])
+        df.sort_values("timestamp", inplace=True)
+        df.reset_index(drop=True, inplace=True)
 
-        self._recalculate_indicators()
+        if self.indicator_mode == "streaming":
+            self._seed_streaming_indicators(df)
+        else:
+            self.df = df
+            self._recalculate_indicators()
 
-        logger.info(f"Loaded {len(self.df)} historical candles.")
+        logger.info(f"Loaded {len(df)} historical candles.")
 
 
     # -------------------------------------------------------
@@ -152,8 +262,13 @@ class HeikinAshiATRStrategy:
 
     def add_live_data(self, new_data):
 
+        if self.indicator_mode == "streaming":
+            self._add_live_data_streaming(new_data)
+            return
+
         # FIX: ensure timestamp is always a Timestamp object before concat
-        new_data["timestamp"] = pd.to_datetime(new_data["timestamp"])
+        # (in IST, so it concatenates with the history as one datetime column)
+        new_data["timestamp"] = ist_index([new_data["timestamp"]])[0]
 
         new_row = pd.DataFrame([new_data])
         self.df = pd.concat([self.df, new_row], ignore_index=True)
@@ -163,6 +278,36 @@ class HeikinAshiATRStrategy:
 
         self._recalculate_indicators()
 
+    def _add_live_data_streaming(self, new_data):
+
+        if self.indicators is None:
+            self.indicators = self._new_indicator_engine()
+
+        self._append_streaming(
+            ist_index([new_data["timestamp"]])[0],
+            new_data["open"],
+            new_data["high"],
+            new_data["low"],
+            new_data["close"],
+            new_data.get("volume", 0)
+        )
+
+
+    # -------------------------------------------------------
+    # Position state
+    # -------------------------------------------------------
+
+    def reset_state(self):
+        """Clears the open position (called by the trader after an exit or a rejected entry)."""
+        self.last_position = None
+        self.entry_price = None
+        self.stop_loss = None
+        self.take_profit = None
+        self.trailing_sl = None
+        self.highest_since_entry = None
+        self.lowest_since_entry = None
+        logger.info("Strategy state reset.")
+
 
     # -------------------------------------------------------
     # Expansion Body Rule
@@ -170,17 +315,17 @@ class HeikinAshiATRStrategy:
 
     def expansion_body_signal(self):
 
-        if len(self.df) < 4:
+        if self._candle_count() < 4:
             return False, False
 
-        last = self.df.iloc[-1]
+        last = self.latest_row()
 
         # FIX: use ha_open/ha_close/ha_high/ha_low instead of raw OHLC
         bullish_body = max(last["ha_close"] - last["ha_open"], 0)
         bearish_body = max(last["ha_open"] - last["ha_close"], 0)
 
-        bullish_range = self.df["ha_high"].iloc[-3] - self.df["ha_low"].iloc[-1]
-        bearish_range = self.df["ha_high"].iloc[-1] - self.df["ha_low"].iloc[-3]
+        bullish_range = self._value("ha_high", -3) - self._value("ha_low", -1)
+        bearish_range = self._value("ha_high", -1) - self._value("ha_low", -3)
 
         # FIX: guard against zero or negative range to avoid false signals
         bullish_signal = (
@@ -201,16 +346,16 @@ class HeikinAshiATRStrategy:
 
     def generate_signal(self):
 
-        if len(self.df) < self.atr_len + 2:
+        if self._candle_count() < self.atr_len + 2:
             return None
 
-        last = self.df.iloc[-1]
+        last = self.latest_row()
 
         # Skip if any key indicator is NaN
         if pd.isna(last["atr"]) or pd.isna(last["rsi_ltf"]) or pd.isna(last["rsi_htf"]):
             logger.debug(
-                f"NaN indicators at {last['timestamp']} — "
-                f"atr={last['atr']} rsi_ltf={last['rsi_ltf']} rsi_htf={last['rsi_htf']}"
+                "NaN indicators at %s — atr=%s rsi_ltf=%s rsi_htf=%s",
+                last['timestamp'], last['atr'], last['rsi_ltf'], last['rsi_htf']
             )
             return None
 
@@ -220,13 +365,9 @@ class HeikinAshiATRStrategy:
         # Diagnostic log per candle
         # ---------------------------------------------------
         logger.debug(
-            f"ts={last['timestamp']} | "
-            f"ha_close={last['ha_close']:.2f} | "
-            f"rsi_ltf={last['rsi_ltf']:.2f} | "
-            f"rsi_htf={last['rsi_htf']:.2f} | "
-            f"bull_exp={bullish_expansion} | "
-            f"bear_exp={bearish_expansion} | "
-            f"position={self.last_position}"
+            "ts=%s | ha_close=%.2f | rsi_ltf=%.2f | rsi_htf=%.2f | bull_exp=%s | bear_exp=%s | position=%s",
+            last['timestamp'], last['ha_close'], last['rsi_ltf'], last['rsi_htf'],
+            bullish_expansion, bearish_expansion, self.last_position
         )
 
         # ---------------------------------------------------
@@ -358,58 +499,22 @@ class HeikinAshiATRStrategy:
 
 if __name__ == "__main__":
 
-    strategy = HeikinAshiATRStrategy()
-
-    df = pd.read_csv("nifty50_202603262028.csv")
-
-    # Split into historical and live simulation
-    mid = len(df) // 2
-    df.iloc[:mid].to_csv("historical_data_1.csv", index=False)
-    df.iloc[mid:].to_csv("historical_data_2.csv", index=False)
-
-    # Load historical data
-    strategy.load_historical_data("historical_data_1.csv")
-
-    # Simulate live candles
-    live_data = pd.read_csv("historical_data_2.csv")
-
-    signals = []
-
-    for _, row in live_data.iterrows():
-
-        new_data = {
-            "timestamp": row["timestamp"],
-            "open":      row["open"],
-            "high":      row["high"],
-            "low":       row["low"],
-            "close":     row["close"],
-            "volume":    row.get("volume", 0)
-        }
-
-        strategy.add_live_data(new_data)
-
-        # ---- Diagnostic print per candle ----
-        last = strategy.df.iloc[-1]
-        bull_exp, bear_exp = strategy.expansion_body_signal()
-        print(
-            f"ts={last['timestamp']} | "
-            f"rsi_ltf={last['rsi_ltf']:.1f} | "
-            f"rsi_htf={last['rsi_htf']:.1f} | "
-            f"bull_exp={bull_exp} | "
-            f"bear_exp={bear_exp}"
-        )
+    from log_setup import setup_logging
+    setup_logging()
 
-        signal = strategy.generate_signal()
+    # Vectorized equivalent of feeding every candle through
+    # add_live_data() + generate_signal(); see backtest.py
+    from backtest import run_backtest
 
-        if signal:
-            print(">>> Signal:", signal)
+    df = pd.read_csv("nifty50_202603262028.csv")
 
-            row_dict = strategy.df.iloc[-1].to_dict()
-            row_dict["signal"] = signal
-            signals.append(row_dict)
+    # First half warms up the indicators, second half is traded
+    signals, trades = run_backtest(df, strategy=HeikinAshiATRStrategy(), start=len(df) // 2)
 
-    if signals:
-        pd.DataFrame(signals).to_csv("sensex_signals.csv", index=False)
+    if not signals.empty:
+        signals.to_csv("sensex_signals.csv", index=False)
+        trades.to_csv("sensex_trades.csv", index=False)
+        print(signals.to_string(index=False))
         print(f"\nTotal signals generated: {len(signals)}")
     else:
-        print("\nNo signals generated. Check the diagnostic output above.")
\ No newline at end of file
+        print("\nNo signals generated.")
@@ -0,0 +1,495 @@
+"""
+Async API database client
+
+Same methods and return values as Main.ApiDatabaseClient, as coroutines on
+one pooled keep-alive connection pool, so a single event loop can keep
+requests for every token in flight at once instead of one blocking socket
+per thread.
+
+    async with AsyncApiDatabaseClient() as api:
+        last_update, ltp = await api.fetch_latest_ltp("13")
+
+- Pool size, keep-alive and timeouts are tunable (API_POOL_SIZE,
+  API_POOL_PER_HOST, API_KEEPALIVE, API_CONNECT_TIMEOUT, API_READ_TIMEOUT).
+- API_HTTP2=1 multiplexes all requests over HTTP/2 through httpx (optional
+  dependency: `pip install httpx[http2]`); without it the client stays on
+  aiohttp HTTP/1.1 keep-alive.
+- Per-endpoint read timeouts, deadlines and retries of idempotent requests
+  follow http_transport.ENDPOINT_POLICIES, and latency histograms are kept
+  for every method, like http_transport.ResilientSession (`stats()`,
+  `log_stats()`).
+
+Threaded code (Main.StrategyTrader) shares one instance through
+BlockingApiClient, which runs the client on a background event loop; async
+code on that loop (e.g. spws.HighPerformanceStreamer) uses the same client
+directly:
+
+    api = BlockingApiClient(AsyncApiDatabaseClient())
+    api.fetch_latest_ltp("13")                          # from any thread
+    api.submit(HighPerformanceStreamer(api.client).run())
+"""
+
+import asyncio
+import base64
+import json
+import logging
+import os
+import threading
+import time
+
+import aiohttp
+import pandas as pd
+from dotenv import load_dotenv
+
+from http_transport import (IDEMPOTENT_METHODS, RETRY_STATUSES, LatencyHistogram,
+                            endpoint_key, policy_for, retry_delay)
+
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+
+class ApiResponseError(Exception):
+    """Non-2xx response (the backend-neutral counterpart of raise_for_status())."""
+
+    def __init__(self, status, url, text=""):
+        super().__init__(f"HTTP {status} for {url}: {text[:200]}")
+        self.status = status
+
+
+def _env_flag(name):
+    return os.getenv(name, "").lower() in ("1", "true", "yes")
+
+
+class AsyncApiDatabaseClient:
+
+    def __init__(self, base_url=None, session=None, http2=None, pool_size=None,
+                 pool_per_host=None, keepalive=None, connect_timeout=None, read_timeout=None):
+        self.base_url = base_url or os.getenv("API_BASE_URL", "http://localhost:8000/db")
+        self.session = session
+        self._owns_session = session is None
+
+        self.http2 = _env_flag("API_HTTP2") if http2 is None else http2
+        self.pool_size = pool_size or int(os.getenv("API_POOL_SIZE", "100"))
+        self.pool_per_host = pool_per_host or int(os.getenv("API_POOL_PER_HOST", "50"))
+        self.keepalive = keepalive or float(os.getenv("API_KEEPALIVE", "30"))
+        self.connect_timeout = connect_timeout or float(os.getenv("API_CONNECT_TIMEOUT", "2"))
+        self.read_timeout = read_timeout or float(os.getenv("API_READ_TIMEOUT", "10"))
+
+        self._bulk_supported = {}
+        self._histograms = {}
+        # Failures worth a retry of an idempotent request (httpx's are added with HTTP/2)
+        self._retry_errors = (aiohttp.ClientError, asyncio.TimeoutError, OSError)
+
+    async def __aenter__(self):
+        await self.init_session()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def init_session(self):
+        """Creates the pooled session (must run inside the event loop)."""
+        if self.session is not None:
+            return
+        headers = {"Content-Type": "application/json"}
+
+        if self.http2:
+            try:
+                import httpx
+                self.session = httpx.AsyncClient(
+                    http2=True,
+                    headers=headers,
+                    limits=httpx.Limits(
+                        max_connections=self.pool_size,
+                        max_keepalive_connections=self.pool_per_host,
+                        keepalive_expiry=self.keepalive
+                    ),
+                    timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout)
+                )
+                self._retry_errors += (httpx.TransportError,)
+                return
+            except ImportError:
+                logger.error("API_HTTP2 needs `pip install httpx[http2]`, using HTTP/1.1 keep-alive")
+                self.http2 = False
+
+        connector = aiohttp.TCPConnector(
+            limit=self.pool_size,
+            limit_per_host=self.pool_per_host,
+            keepalive_timeout=self.keepalive,
+            ttl_dns_cache=300,
+            enable_cleanup_closed=True
+        )
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            headers=headers,
+            timeout=aiohttp.ClientTimeout(sock_connect=self.connect_timeout, sock_read=self.read_timeout)
+        )
+
+    async def close(self):
+        if self.session is not None and self._owns_session:
+            if self.http2:
+                await self.session.aclose()
+            else:
+                await self.session.close()
+            self.session = None
+
+    # -------------------------------------------------------
+    # Transport
+    # -------------------------------------------------------
+
+    async def _request(self, method, path, params=None, json=None, headers=None, timeout=None):
+        """(status, headers, body bytes) of a request under its endpoint policy.
+
+        Idempotent requests are retried on connection errors, timeouts and
+        502/503/504 while the endpoint's deadline allows; POSTs are sent once.
+        An explicit `timeout` (e.g. a long-poll) replaces the policy's read timeout.
+        """
+        if self.session is None:
+            await self.init_session()
+        url = f"{self.base_url}{path}"
+        key = f"{method} {endpoint_key(url)}"
+        policy = policy_for(url)
+        retries = policy.retries if method in IDEMPOTENT_METHODS else 0
+        deadline = time.monotonic() + policy.deadline
+
+        attempt = 0
+        while True:
+            request_timeout = timeout or max(0.1, min(policy.read, deadline - time.monotonic()))
+            try:
+                result = await self._send(method, url, key, params, json, headers, request_timeout)
+            except self._retry_errors as e:
+                error, result = e, None
+            else:
+                if result[0] not in RETRY_STATUSES:
+                    return result
+                error = None
+
+            delay = retry_delay(attempt)
+            if attempt >= retries or time.monotonic() + delay >= deadline:
+                if error is not None:
+                    raise error
+                return result
+            attempt += 1
+            logger.info(f"Retrying {key} (attempt {attempt + 1}) in {delay * 1000:.0f} ms: "
+                        f"{error if error is not None else result[0]}")
+            await asyncio.sleep(delay)
+
+    async def _send(self, method, url, key, params, json, headers, timeout):
+        """One attempt; its latency goes to the endpoint's histogram."""
+        started = time.perf_counter()
+        ok = False
+        try:
+            if self.http2:
+                resp = await self.session.request(method, url, params=params, json=json,
+                                                  headers=headers, timeout=timeout)
+                status, resp_headers, body = resp.status_code, resp.headers, resp.content
+            else:
+                request_timeout = aiohttp.ClientTimeout(sock_connect=self.connect_timeout, sock_read=timeout)
+                async with self.session.request(method, url, params=params, json=json,
+                                                headers=headers, timeout=request_timeout) as resp:
+                    status, resp_headers, body = resp.status, resp.headers, await resp.read()
+            ok = status < 500
+            return status, resp_headers, body
+        finally:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = LatencyHistogram()
+            histogram.add((time.perf_counter() - started) * 1000, error=not ok)
+
+    async def _json(self, method, path, params=None, json=None, headers=None, timeout=None):
+        status, _, body = await self._request(method, path, params, json, headers, timeout)
+        if status >= 400:
+            raise ApiResponseError(status, f"{self.base_url}{path}", body.decode(errors="replace"))
+        return _loads(body)
+
+    async def _get_json(self, path, params=None):
+        return await self._json("GET", path, params=params)
+
+    async def _post_json(self, path, payload):
+        return await self._json("POST", path, json=payload)
+
+    def stats(self):
+        """{endpoint: {count, errors, p50_ms, p90_ms, p99_ms, max_ms}}."""
+        return {
+            key: {
+                "count": h.total,
+                "errors": h.errors,
+                "p50_ms": h.percentile(50),
+                "p90_ms": h.percentile(90),
+                "p99_ms": h.percentile(99),
+                "max_ms": round(h.max_ms, 1),
+            }
+            for key, h in list(self._histograms.items())
+        }
+
+    def log_stats(self):
+        protocol = "HTTP/2" if self.http2 else "HTTP/1.1"
+        for key, s in sorted(self.stats().items()):
+            logger.info(
+                f"{protocol} {key}: n={s['count']} err={s['errors']} p50<={s['p50_ms']}ms "
+                f"p90<={s['p90_ms']}ms p99<={s['p99_ms']}ms max={s['max_ms']}ms"
+            )
+
+    async def _fetch_bulk(self, path, param, keys, fetch_one):
+        """GET a bulk endpoint; falls back to concurrent per-key requests if it is not deployed."""
+        if self._bulk_supported.get(path, True):
+            status, _, body = await self._request("GET", path, params={param: ",".join(map(str, keys))})
+            if status != 404:
+                if status >= 400:
+                    raise ApiResponseError(status, f"{self.base_url}{path}", body.decode(errors="replace"))
+                return _loads(body)
+            logger.info(f"{path} not available, falling back to per-token requests")
+            self._bulk_supported[path] = False
+
+        # Fan-in shim: same result shape, all keys in flight at once
+        results = await asyncio.gather(*(fetch_one(key) for key in keys), return_exceptions=True)
+        data = {}
+        for key, result in zip(keys, results):
+            if isinstance(result, Exception):
+                logger.error(f"{path} fallback failed for {key}: {result}")
+            else:
+                data[str(key)] = result
+        return {"status": "success", "data": data, "shim": True}
+
+    # -------------------------------------------------------
+    # Market data
+    # -------------------------------------------------------
+
+    async def get_nifties_token(self) -> list[str]:
+        try:
+            data = await self._get_json("/indices/nifty-tokens")
+            return data.get("tokens", [])
+        except Exception as e:
+            logger.error(f"Failed to fetch Nifty tokens: {e}")
+            return []
+
+    async def fetch_ohlc(self, token, limit=1):
+        response_data = await self._get_json("/current/ohlc", {"token": token})
+        if response_data.get("status") != "success":
+            return None
+        data = response_data.get("data")
+        if not data:
+            return None
+        return data["start_time"], data["open"], data["high"], data["low"], data["close"]
+
+    async def fetch_ohlc_bulk(self, tokens):
+        """{token: (start_time, open, high, low, close)} for every token with a candle."""
+        async def fetch_one(token):
+            ohlc = await self.fetch_ohlc(token)
+            return dict(zip(("start_time", "open", "high", "low", "close"), ohlc)) if ohlc else None
+
+        response_data = await self._fetch_bulk("/current/ohlc/bulk", "tokens", tokens, fetch_one)
+        return {
+            token: (data["start_time"], data["open"], data["high"], data["low"], data["close"])
+            for token, data in response_data.get("data", {}).items() if data
+        }
+
+    async def fetch_historical_ohlc(self, token, limit=500, since=None):
+        params = {"token": token}
+        if since is not None:
+            params["since"] = pd.Timestamp(since).isoformat()
+        response_data = await self._get_json("/historical/ohlc/load", params)
+        data = response_data.get("data", [])
+        if not data:
+            return pd.DataFrame(columns=["timestamp", "open", "high", "low", "close", "volume"])
+        df = pd.DataFrame(data)
+        df.rename(columns={"timestamp": "start_time"}, inplace=True)
+        return df
+
+    async def fetch_latest_ltp(self, stock_token: str = '99926009'):
+        data = (await self._get_json("/indices/ltp", {"stock_token": stock_token}))["data"]
+        return data["last_update"], data["ltp"]
+
+    async def fetch_latest_ltp_bulk(self, stock_tokens):
+        """{stock_token: (last_update, ltp)} for every token with a price."""
+        async def fetch_one(token):
+            return dict(zip(("last_update", "ltp"), await self.fetch_latest_ltp(token)))
+
+        response_data = await self._fetch_bulk("/indices/ltp/bulk", "stock_tokens", stock_tokens, fetch_one)
+        return {
+            token: (data["last_update"], data["ltp"])
+            for token, data in response_data.get("data", {}).items() if data
+        }
+
+    async def post_strike_ltp(self, token, ltp, symbol):
+        """Publishes one strike LTP (spws); returns (status, response text)."""
+        status, _, body = await self._request(
+            "POST", "/signals/strike-ltp", json={"token": token, "ltp": ltp, "symbol": symbol}
+        )
+        return status, body.decode(errors="replace")
+
+    # -------------------------------------------------------
+    # Signals
+    # -------------------------------------------------------
+
+    async def send_entry_signal(self, token, signal, strike_price_token, strategy_code,
+                                unique_id, strike_data, stop_loss, target, description) -> bool:
+        payload = {
+            "token": token, "signal": signal, "unique_id": unique_id,
+            "strike_price_token": strike_price_token, "strategy_code": strategy_code,
+            "stop_loss": stop_loss, "target": target, "description": description,
+            "strike_data": strike_data
+        }
+        try:
+            await self._post_json("/signals/entry/v3", payload)
+            logger.info(f"Entry signal sent successfully: {payload}")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to send entry signal for token {token}: {e}")
+            return True
+
+    async def send_exit_signal(self, token, signal, strike_price_token, strategy_code,
+                               unique_id, strike_data, stop_loss, target, description) -> bool:
+        payload = {
+            "token": token, "signal": signal, "unique_id": unique_id,
+            "strike_price_token": strike_price_token, "strategy_code": strategy_code,
+            "strike_data": strike_data, "stop_loss": stop_loss,
+            "target": target, "description": description
+        }
+        try:
+            await self._post_json("/signals/exit/v3", payload)
+            logger.info(f"Exit signal sent successfully: {payload}")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to send exit signal for token {token}: {e}")
+            return True
+
+    async def get_stop_loss_target(self, unique_id: str):
+        data = await self._get_json(f"/signals/get-stop-loss-target/v1/{unique_id}")
+        return data['stop_loss'], data['target']
+
+    async def fetch_stop_loss_target(self, unique_id: str, etag: str = None):
+        headers = {"If-None-Match": etag} if etag else None
+        status, resp_headers, body = await self._request(
+            "GET", f"/signals/get-stop-loss-target/v1/{unique_id}", headers=headers
+        )
+        if status == 304:
+            return None, etag
+        if status >= 400:
+            raise ApiResponseError(status, unique_id, body.decode(errors="replace"))
+        data = _loads(body)
+        return (data['stop_loss'], data['target']), resp_headers.get("ETag")
+
+    async def update_stop_loss_target(self, unique_id: str, stop_loss: float = None, target: float = None):
+        params = {"unique_id": unique_id}
+        if stop_loss is not None:
+            params["stop_loss"] = stop_loss
+        if target is not None:
+            params["target"] = target
+        status, _, body = await self._request("PUT", "/signals/update-stop-loss-target/v1", params=params)
+        if status != 200:
+            raise Exception(f"API Error: {status} - {body.decode(errors='replace')}")
+        return _loads(body)
+
+    # -------------------------------------------------------
+    # Admin / control plane
+    # -------------------------------------------------------
+
+    async def kill_trade_signal(self, token: str) -> bool:
+        try:
+            data = await self._post_json("/admin/kill-trade-signal", {"token": token})
+            return data.get("kill", False)
+        except Exception as e:
+            logger.error(f"Failed to fetch kill trade signal for token {token}: {e}")
+            return False
+
+    async def get_strike_pice_close_signal(self, unique_id: str):
+        data = await self._get_json(f"/signals/get-strike-price-close-trade-signal/{unique_id}")
+        return data['data']
+
+    async def fetch_control_flags(self, tokens, unique_ids, since=None, wait=0):
+        """Same contract as Main.ApiDatabaseClient.fetch_control_flags."""
+        path = "/admin/control-flags"
+        if self._bulk_supported.get(path, True):
+            payload = {"tokens": list(tokens), "unique_ids": list(unique_ids), "since": since, "wait": wait}
+            status, _, body = await self._request("POST", path, json=payload, timeout=wait + 10)
+            if status != 404:
+                if status >= 400:
+                    raise ApiResponseError(status, f"{self.base_url}{path}", body.decode(errors="replace"))
+                data = _loads(body)
+                return {
+                    "kill": data.get("kill", {}),
+                    "strike_close": data.get("strike_close", {}),
+                    "version": data.get("version")
+                }
+            logger.info(f"{path} not available, falling back to per-key requests")
+            self._bulk_supported[path] = False
+
+        kills = await asyncio.gather(*(self.kill_trade_signal(token) for token in tokens))
+        closes = await asyncio.gather(
+            *(self.get_strike_pice_close_signal(uid) for uid in unique_ids), return_exceptions=True
+        )
+        strike_close = {}
+        for unique_id, result in zip(unique_ids, closes):
+            if isinstance(result, Exception):
+                logger.error(f"get_strike_pice_close_signal failed for {unique_id}: {result}")
+            else:
+                strike_close[unique_id] = bool(result)
+        return {"kill": dict(zip(tokens, kills)), "strike_close": strike_close, "version": None}
+
+    async def get_symbol_token_file(self, token: str):
+        data = await self._get_json(f"/signals/get-symbol-token-file/{token}")
+        base64_file = data.get("file")
+        file_path = data.get("file_path")
+        if base64_file:
+            await asyncio.to_thread(_write_base64_file, file_path, base64_file)
+            logger.info("Symbol token file of %s saved at %s", token, file_path)
+        else:
+            logger.warning("No symbol token file for token %s", token)
+        return data.get("file"), data.get("file_path")
+
+
+def _loads(body):
+    return json.loads(body) if body else {}
+
+
+def _write_base64_file(file_path, base64_file):
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    with open(file_path, "wb") as f:
+        f.write(base64.b64decode(base64_file))
+
+
+# -----------------------------------------------------------
+# Blocking facade for threaded callers
+# -----------------------------------------------------------
+
+class BlockingApiClient:
+    """Sync view of an AsyncApiDatabaseClient running on its own event-loop thread.
+
+    Every coroutine method of the client becomes a blocking method callable
+    from any thread; all threads share the client's one connection pool, and
+    their requests are in flight concurrently on the loop.
+    """
+
+    def __init__(self, client=None, call_timeout=60.0):
+        self.client = client or AsyncApiDatabaseClient()
+        self.call_timeout = call_timeout
+
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, name="api-loop", daemon=True)
+        self._thread.start()
+        self.run(self.client.init_session())
+
+    def submit(self, coro):
+        """Schedules a coroutine on the client's loop; returns a concurrent.futures.Future."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout=None):
+        return self.submit(coro).result(timeout or self.call_timeout)
+
+    def __getattr__(self, name):
+        attr = getattr(self.client, name)
+        if not asyncio.iscoroutinefunction(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            return self.run(attr(*args, **kwargs))
+        call.__name__ = name
+        return call
+
+    def close(self):
+        self.run(self.client.close())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
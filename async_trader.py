@@ -0,0 +1,100 @@
+"""
+Asyncio trader mode
+
+Runs every token of StrategyTrader from one event loop instead of one OS
+thread per token. The trading logic is StrategyTrader's own per-token loop
+(`start_token` + the `trade_step` coroutine), so the candle feed, LTP board,
+SL/TP cache, control plane and candle scheduler behave exactly as in Main.py:
+
+- each token is a coroutine on the event loop of the shared
+  AsyncApiDatabaseClient; OHLC, LTP, kill-switch and signal requests are
+  awaited on the client directly, so every token's requests are in flight
+  at once on one connection pool and a waiting token holds no thread
+- only blocking work goes to a small thread pool: the strategy update
+  (`add_live_data` + `generate_signal`), the TTL-cached SL/TP sync and the
+  one-off start-up (history sync, strike files)
+- pushed candles are polled without blocking (FEED_POLL_INTERVAL) instead of
+  parking a thread in the feed queue
+
+Adding an underlying adds a coroutine, not a thread and a socket.
+
+Usage:
+    python async_trader.py
+"""
+
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from async_api_client import AsyncApiDatabaseClient, BlockingApiClient
+from log_setup import setup_logging
+from Main import StrategyTrader, logger
+
+
+class AsyncStrategyTrader(StrategyTrader):
+    """StrategyTrader whose I/O hooks await the client behind `api_client` (a BlockingApiClient).
+
+    run_async() must run on that client's event loop (`api_client.submit`).
+    """
+
+    def __init__(self, api_client, workers=None):
+        super().__init__(api_client)
+        self.client = api_client.client
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers or min(16, (os.cpu_count() or 1) + 4),
+            thread_name_prefix="strategy"
+        )
+
+    async def call_api(self, name, *args, **kwargs):
+        return await getattr(self.client, name)(*args, **kwargs)
+
+    async def run_blocking(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+
+    async def trade_token(self, token: str, strike_roundup_value: int,
+                          file_name: str, lot_qty: int, exchange: str) -> None:
+        """Coroutine driver of the per-token loop."""
+        try:
+            state = await self.run_blocking(self.start_token, token, strike_roundup_value,
+                                            file_name, lot_qty, exchange)
+            if state is None:
+                return
+            while True:
+                await asyncio.sleep(await self.trade_step(state, candle_wait=0))
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error processing trade for token {token}: {e}", exc_info=True)
+
+    async def run_async(self):
+        tasks = [
+            asyncio.create_task(self.trade_token(*args), name=f"trade-{token}")
+            for token, args in await self.run_blocking(self.setup)
+        ]
+        logger.info(f"Started {len(tasks)} trade tasks")
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def main():
+    api_client = BlockingApiClient(AsyncApiDatabaseClient())
+    # The trade coroutines run on the client's own loop so they can await it directly
+    future = api_client.submit(AsyncStrategyTrader(api_client).run_async())
+    try:
+        future.result()
+    finally:
+        future.cancel()
+        api_client.close()
+
+
+if __name__ == "__main__":
+    setup_logging()
+    started = time.time()
+    try:
+        main()
+    except KeyboardInterrupt:
+        print(f"\n🛑 Async trader stopped after {time.time() - started:.0f}s")
@@ -0,0 +1,444 @@
+"""
+Vectorized backtest for algo.HeikinAshiATRStrategy
+
+Replaces the add_live_data() + generate_signal() loop over iterrows() (which
+re-ran every indicator on every candle, O(n^2)) with:
+
+1. One vectorized pass that computes every indicator column for the whole
+   history. Each row gets the value the live path sees when that row is the
+   newest candle (same warm-up NaNs, HTF RSI of the still-open bucket).
+2. The entry / trailing-stop / exit state machine of generate_signal() run
+   over plain NumPy arrays.
+
+Signals are identical to calling generate_signal() candle by candle.
+
+Usage:
+    python backtest.py nifty50.csv --start 0.5 --signals signals.csv --trades trades.csv
+"""
+
+import argparse
+import math
+
+import numpy as np
+import pandas as pd
+import pandas_ta as ta
+
+from algo import HeikinAshiATRStrategy
+from indicator_engine import StreamingRSI
+from timeframes import DAY_NS, timeframe_ns
+
+
+SIGNAL_COLUMNS = [
+    "row", "timestamp", "signal", "reason", "price", "close", "ha_close", "atr",
+    "stop_loss", "take_profit", "strike", "trailing_sl",
+]
+
+TRADE_COLUMNS = [
+    "side", "entry_time", "exit_time", "entry_price", "exit_price", "exit_reason",
+    "strike", "stop_loss", "take_profit", "points", "candles",
+]
+
+
+# -----------------------------------------------------------
+# Input
+# -----------------------------------------------------------
+
+def prepare_candles(candles):
+    """Sorted copy of `candles` with a parsed `timestamp` column.
+
+    Accepts a DataFrame or CSV path using either `timestamp` or `start_time`.
+    """
+    if not isinstance(candles, pd.DataFrame):
+        candles = pd.read_csv(candles)
+
+    df = candles.rename(columns={"start_time": "timestamp"})
+    df["timestamp"] = pd.to_datetime(df["timestamp"])
+    df = df.sort_values("timestamp").reset_index(drop=True)
+    return df
+
+
+def wall_clock_ns(timestamps):
+    """int64 local wall-clock nanoseconds for a datetime Series."""
+    if timestamps.dt.tz is not None:
+        timestamps = timestamps.dt.tz_localize(None)
+    return timestamps.to_numpy(dtype="datetime64[ns]").astype(np.int64)
+
+
+# -----------------------------------------------------------
+# Indicator columns (one vectorized pass each)
+# -----------------------------------------------------------
+
+def _warmed_up(values, length):
+    """NaN-out rows the live path could not compute yet.
+
+    pandas_ta returns None while the series has <= length values, so the row
+    at position i only gets a value once i >= length.
+    """
+    values = np.full(len(values), np.nan) if values is None else np.array(values, dtype=float)
+    values[:length] = np.nan
+    return values
+
+
+def heikin_ashi_columns(open_, high, low, close):
+    ha = ta.ha(pd.Series(open_), pd.Series(high), pd.Series(low), pd.Series(close))
+    return {
+        "ha_open":  ha["HA_open"].to_numpy(),
+        "ha_high":  ha["HA_high"].to_numpy(),
+        "ha_low":   ha["HA_low"].to_numpy(),
+        "ha_close": ha["HA_close"].to_numpy(),
+    }
+
+
+def atr_column(ha_high, ha_low, ha_close, atr_len):
+    atr = ta.atr(pd.Series(ha_high), pd.Series(ha_low), pd.Series(ha_close), length=atr_len)
+    return _warmed_up(atr, atr_len)
+
+
+def rsi_column(ha_close, rsi_len):
+    rsi = ta.rsi(pd.Series(ha_close), length=rsi_len)
+    return _warmed_up(rsi, rsi_len)
+
+
+def _rma_peek(value, old_wt, x, alpha, factor):
+    """Vectorized indicator_engine.WilderRMA.peek for one committed state."""
+    if value != value:
+        return x
+    weight = old_wt * factor
+    blended = (weight * value + alpha * x) / (weight + alpha)
+    return np.where(np.isnan(x), value, np.where(x == value, value, blended))
+
+
+def htf_rsi_column(wall_ns, ha_close, htf, rsi_len, fill_forward=True):
+    """As-of RSI of resample(htf).last(), the value each row sees live.
+
+    Closed buckets are folded into a WilderRMA recursion once each; rows are
+    then evaluated against the state of their bucket in one NumPy expression.
+    """
+    n = len(ha_close)
+    out = np.full(n, np.nan)
+    if n == 0:
+        return out
+
+    freq_ns = timeframe_ns(htf)
+    origin = wall_ns[0] - wall_ns[0] % DAY_NS
+    buckets = (wall_ns - origin) // freq_ns
+
+    # row ranges per bucket (rows are sorted, so each bucket is contiguous)
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], n]
+
+    rsi = StreamingRSI(rsi_len)
+    last_valid = np.nan
+    first_bucket = buckets[0]
+    previous_bucket = None
+
+    for start, end in zip(starts, ends):
+        bucket = buckets[start]
+
+        if previous_bucket is not None:
+            rsi.update(ha_close[start - 1])
+            if rsi.raw == rsi.raw:
+                last_valid = rsi.raw
+            for _ in range(bucket - previous_bucket - 1):
+                rsi.update(np.nan)
+        previous_bucket = bucket
+
+        if bucket - first_bucket + 1 < rsi_len + 1:
+            continue
+
+        x = ha_close[start:end]
+        diff = x - rsi.prev
+        gain = np.where(diff < 0, 0.0, diff)
+        loss = np.where(diff > 0, 0.0, diff)
+
+        gain_avg = _rma_peek(rsi.gain.value, rsi.gain._old_wt, gain, rsi.gain.alpha, rsi.gain.factor)
+        loss_avg = _rma_peek(rsi.loss.value, rsi.loss._old_wt, loss, rsi.loss.alpha, rsi.loss.factor)
+
+        denominator = gain_avg + np.abs(loss_avg)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            values = np.where(denominator == 0, np.nan, rsi.scalar * gain_avg / denominator)
+
+        if fill_forward:
+            values = np.where(np.isnan(values), last_valid, values)
+
+        out[start:end] = values
+
+    return out
+
+
+def candle_arrays(candles):
+    """Raw candle columns as NumPy arrays (plus the parsed timestamps)."""
+    df = prepare_candles(candles)
+    return {
+        "timestamp": df["timestamp"],
+        "wall_ns": wall_clock_ns(df["timestamp"]),
+        "open":  df["open"].to_numpy(dtype=float),
+        "high":  df["high"].to_numpy(dtype=float),
+        "low":   df["low"].to_numpy(dtype=float),
+        "close": df["close"].to_numpy(dtype=float),
+    }
+
+
+def compute_indicators(candles, atr_len=14, rsi_len=14, htf="15min"):
+    """All indicator columns of algo.HeikinAshiATRStrategy as NumPy arrays.
+
+    `candles` is a DataFrame / CSV path, or the dict from candle_arrays().
+    """
+    columns = dict(candles) if isinstance(candles, dict) else candle_arrays(candles)
+
+    columns.update(heikin_ashi_columns(
+        columns["open"], columns["high"], columns["low"], columns["close"]
+    ))
+    columns["atr"] = atr_column(columns["ha_high"], columns["ha_low"], columns["ha_close"], atr_len)
+    columns["rsi_ltf"] = rsi_column(columns["ha_close"], rsi_len)
+    columns["rsi_htf"] = htf_rsi_column(columns["wall_ns"], columns["ha_close"], htf, rsi_len)
+    return columns
+
+
+# -----------------------------------------------------------
+# Signal state machine
+# -----------------------------------------------------------
+
+def simulate(
+    columns,
+    start=0,
+    atr_len=14,
+    atr_mult=2.5,
+    risk_reward=2.0,
+    body_expansion_factor=0.68,
+    strike_roundup_value=100,
+    round_off_diff=100,
+    bracket_exits=False
+):
+    """generate_signal() over precomputed columns, one pass.
+
+    Rows before `start` only serve as history (no position is opened there),
+    matching load_historical_data() followed by add_live_data() per candle.
+
+    With bracket_exits=True an open position is also closed when a candle's
+    raw high / low touches its stop_loss or take_profit, the way
+    Main.StrategyTrader exits on LTP before the candle closes (stop first if
+    both are touched; fills at the open when the candle gaps through). The
+    strategy is then flat for that candle's own signal, as after reset_state().
+    Default False reproduces generate_signal() alone.
+
+    Returns a list of
+    (row, signal, reason, price, stop_loss, take_profit, strike, trailing_sl).
+    """
+    open_ = columns["open"].tolist()
+    high = columns["high"].tolist()
+    low = columns["low"].tolist()
+    close = columns["close"].tolist()
+    ha_open = columns["ha_open"].tolist()
+    ha_high = columns["ha_high"].tolist()
+    ha_low = columns["ha_low"].tolist()
+    ha_close = columns["ha_close"].tolist()
+    atr = columns["atr"].tolist()
+    rsi_ltf = columns["rsi_ltf"].tolist()
+    rsi_htf = columns["rsi_htf"].tolist()
+
+    signals = []
+    position = None
+    highest = lowest = None
+    stop_loss = take_profit = None
+
+    for i in range(max(start, atr_len + 1), len(ha_close)):
+
+        # ---- LTP-style stop / target exits inside the candle ----
+        if bracket_exits and position == "long":
+            if low[i] <= stop_loss:
+                position = None
+                signals.append((i, "BUY_EXIT", "stop_loss", min(open_[i], stop_loss),
+                                math.nan, math.nan, math.nan, math.nan))
+            elif high[i] >= take_profit:
+                position = None
+                signals.append((i, "BUY_EXIT", "target", max(open_[i], take_profit),
+                                math.nan, math.nan, math.nan, math.nan))
+
+        elif bracket_exits and position == "short":
+            if high[i] >= stop_loss:
+                position = None
+                signals.append((i, "SELL_EXIT", "stop_loss", max(open_[i], stop_loss),
+                                math.nan, math.nan, math.nan, math.nan))
+            elif low[i] <= take_profit:
+                position = None
+                signals.append((i, "SELL_EXIT", "target", min(open_[i], take_profit),
+                                math.nan, math.nan, math.nan, math.nan))
+
+        if math.isnan(atr[i]) or math.isnan(rsi_ltf[i]) or math.isnan(rsi_htf[i]):
+            continue
+
+        # ---- Exit: trailing stop on HA close ----
+        if position == "long":
+            highest = max(highest, ha_high[i])
+            trailing_sl = highest - atr_mult * atr[i]
+            if ha_close[i] <= trailing_sl:
+                position = None
+                signals.append((i, "BUY_EXIT", "signal", close[i],
+                                math.nan, math.nan, math.nan, trailing_sl))
+                continue
+
+        if position == "short":
+            lowest = min(lowest, ha_low[i])
+            trailing_sl = lowest + atr_mult * atr[i]
+            if ha_close[i] >= trailing_sl:
+                position = None
+                signals.append((i, "SELL_EXIT", "signal", close[i],
+                                math.nan, math.nan, math.nan, trailing_sl))
+                continue
+
+        if position is not None:
+            continue
+
+        # ---- Expansion body rule (needs 4 candles) ----
+        bullish = bearish = False
+        if i >= 3:
+            bullish_body = max(ha_close[i] - ha_open[i], 0)
+            bearish_body = max(ha_open[i] - ha_close[i], 0)
+            bullish_range = ha_high[i - 2] - ha_low[i]
+            bearish_range = ha_high[i] - ha_low[i - 2]
+            bullish = bullish_range > 0 and bullish_body > body_expansion_factor * bullish_range
+            bearish = bearish_range > 0 and bearish_body > body_expansion_factor * bearish_range
+
+        # ---- Entries ----
+        if bullish and rsi_ltf[i] > 50 and rsi_htf[i] > 50:
+            position = "long"
+            highest = ha_high[i]
+            stop_loss = ha_close[i] - atr_mult * atr[i]
+            take_profit = ha_close[i] + risk_reward * (ha_close[i] - stop_loss)
+            strike = ((ha_close[i] - round_off_diff) // strike_roundup_value) * strike_roundup_value
+            signals.append((i, "BUY_ENTRY", "signal", close[i],
+                            stop_loss, take_profit, strike, math.nan))
+
+        elif bearish and rsi_ltf[i] < 50 and rsi_htf[i] < 50:
+            position = "short"
+            lowest = ha_low[i]
+            stop_loss = ha_close[i] + atr_mult * atr[i]
+            take_profit = ha_close[i] - risk_reward * (stop_loss - ha_close[i])
+            strike = math.ceil((ha_close[i] + round_off_diff) / strike_roundup_value) * strike_roundup_value
+            signals.append((i, "SELL_ENTRY", "signal", close[i],
+                            stop_loss, take_profit, strike, math.nan))
+
+    return signals
+
+
+# -----------------------------------------------------------
+# Output tables
+# -----------------------------------------------------------
+
+def signals_table(columns, signals):
+    if not signals:
+        return pd.DataFrame(columns=SIGNAL_COLUMNS)
+
+    rows, names, reasons, prices, stop_loss, take_profit, strike, trailing_sl = map(list, zip(*signals))
+    rows = np.array(rows)
+
+    return pd.DataFrame({
+        "row":         rows,
+        "timestamp":   columns["timestamp"].to_numpy()[rows],
+        "signal":      names,
+        "reason":      reasons,
+        "price":       prices,
+        "close":       columns["close"][rows],
+        "ha_close":    columns["ha_close"][rows],
+        "atr":         columns["atr"][rows],
+        "stop_loss":   stop_loss,
+        "take_profit": take_profit,
+        "strike":      strike,
+        "trailing_sl": trailing_sl,
+    })
+
+
+def trades_table(signals):
+    """One row per entry, paired with its exit; P&L in underlying points.
+
+    Entries and strategy exits fill at the candle close, bracket exits at
+    their stop / target level.
+    """
+    trades = []
+    entry = None
+
+    for row in signals.itertuples(index=False):
+        if row.signal in ("BUY_ENTRY", "SELL_ENTRY"):
+            entry = row
+            continue
+        if entry is None:
+            continue
+
+        direction = 1 if entry.signal == "BUY_ENTRY" else -1
+        trades.append((
+            "long" if direction == 1 else "short",
+            entry.timestamp, row.timestamp, entry.price, row.price, row.reason,
+            entry.strike, entry.stop_loss, entry.take_profit,
+            direction * (row.price - entry.price),
+            row.row - entry.row,
+        ))
+        entry = None
+
+    if entry is not None:
+        trades.append((
+            "long" if entry.signal == "BUY_ENTRY" else "short",
+            entry.timestamp, pd.NaT, entry.price, np.nan, None,
+            entry.strike, entry.stop_loss, entry.take_profit, np.nan, np.nan,
+        ))
+
+    return pd.DataFrame(trades, columns=TRADE_COLUMNS)
+
+
+def run_backtest(candles, strategy=None, start=0, bracket_exits=False):
+    """Backtests `strategy`'s parameters over `candles`.
+
+    `start` is the first row traded (an int, or a float fraction of the rows);
+    earlier rows only warm up the indicators.
+    Returns (signals, trades) DataFrames.
+    """
+    if strategy is None:
+        strategy = HeikinAshiATRStrategy()
+
+    columns = candle_arrays(candles)
+    if isinstance(start, float):
+        start = int(len(columns["close"]) * start)
+
+    columns = compute_indicators(
+        columns, atr_len=strategy.atr_len, rsi_len=strategy.rsi_len, htf=strategy.htf
+    )
+    signals = simulate(
+        columns,
+        start=start,
+        atr_len=strategy.atr_len,
+        atr_mult=strategy.atr_mult,
+        risk_reward=strategy.risk_reward,
+        body_expansion_factor=strategy.body_expansion_factor,
+        strike_roundup_value=strategy.strike_roundup_value,
+        round_off_diff=strategy.round_off_diff,
+        bracket_exits=bracket_exits
+    )
+
+    signals = signals_table(columns, signals)
+    return signals, trades_table(signals)
+
+
+# -----------------------------------------------------------
+# CLI
+# -----------------------------------------------------------
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Vectorized backtest of algo.HeikinAshiATRStrategy")
+    parser.add_argument("csv", help="OHLC CSV with timestamp/start_time, open, high, low, close")
+    parser.add_argument("--start", type=float, default=0.5,
+                        help="first traded row: fraction (<1) or row number (default 0.5)")
+    parser.add_argument("--signals", default="signals.csv", help="signals output CSV")
+    parser.add_argument("--trades", default="trades.csv", help="trades output CSV")
+    parser.add_argument("--bracket-exits", action="store_true",
+                        help="also exit when a candle touches stop_loss / take_profit")
+    args = parser.parse_args()
+
+    start = args.start if args.start < 1 else int(args.start)
+    signals, trades = run_backtest(args.csv, start=start, bracket_exits=args.bracket_exits)
+
+    signals.to_csv(args.signals, index=False)
+    trades.to_csv(args.trades, index=False)
+
+    print(f"Signals: {len(signals)}  Trades: {len(trades)}  "
+          f"Points: {trades['points'].sum():.2f}")
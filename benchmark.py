@@ -0,0 +1,281 @@
+"""
+Latency benchmark for the strategy classes
+
+Measures `add_live_data` + `generate_signal` per candle for
+algo.HeikinAshiATRStrategy (streaming and reference indicator modes) and
+heikin_ashi_atr_strike.HeikinAshiATRStrategy on synthetic 3-min candles.
+
+For every history size the strategy loads that many candles, then replays
+one full session (09:15 - 15:27) live. Reported per strategy / history size:
+
+- p50 / p99 / max per-candle latency (µs)
+- open_p50 / close_p50: p50 of the first and last hour of the session, to
+  show how latency degrades as the session grows
+- peak_kib: peak Python memory allocated during the live session (tracemalloc,
+  measured in a separate pass so it does not distort the timings)
+- load_ms: load_historical_data time
+
+--save writes the results as a JSON baseline; --baseline compares a run
+against one and exits with status 1 when a metric regressed by more than
+--tolerance.
+
+Usage:
+    python benchmark.py --save benchmark_baseline.json
+    python benchmark.py --baseline benchmark_baseline.json --tolerance 0.25
+"""
+
+import argparse
+import contextlib
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import algo
+import heikin_ashi_atr_strike
+
+
+HISTORY_SIZES = (100, 500, 2000, 10000)
+
+SESSION_CANDLES = 125        # 09:15 - 15:27 in 3-min candles
+CANDLES_PER_HOUR = 20
+
+STRATEGIES = {
+    "algo": lambda token: algo.HeikinAshiATRStrategy(token=token),
+    "algo_reference": lambda token: algo.HeikinAshiATRStrategy(token=token, indicator_mode="reference"),
+    "strike": lambda token: heikin_ashi_atr_strike.HeikinAshiATRStrategy(token=token),
+}
+
+# Metrics compared against the baseline (lower is better for all of them)
+TRACKED_METRICS = ("p50_us", "p99_us", "close_p50_us", "peak_kib")
+
+
+# -----------------------------------------------------------
+# Synthetic candles
+# -----------------------------------------------------------
+
+def synthetic_candles(sessions, seed=0, start="2025-01-06", price=24000.0):
+    """Random-walk 3-min IST candles for `sessions` consecutive weekdays."""
+    rng = np.random.default_rng(seed)
+
+    days = pd.bdate_range(start, periods=sessions)
+    offsets = pd.timedelta_range("9h15min", periods=SESSION_CANDLES, freq="3min")
+    timestamps = pd.DatetimeIndex(
+        [day + offset for day in days for offset in offsets]
+    ).tz_localize("Asia/Kolkata")
+
+    n = len(timestamps)
+    close = np.round((price + np.cumsum(rng.normal(0, 8, n))) * 20) / 20
+    open_ = np.r_[price, close[:-1]]
+    wick_high = np.round(np.abs(rng.normal(0, 4, n)) * 20) / 20
+    wick_low = np.round(np.abs(rng.normal(0, 4, n)) * 20) / 20
+
+    return pd.DataFrame({
+        "start_time": timestamps,
+        "open": open_,
+        "high": np.maximum(open_, close) + wick_high,
+        "low": np.minimum(open_, close) - wick_low,
+        "close": close,
+        "volume": 0,
+    })
+
+
+def history_and_session(history_size, seed=0):
+    """`history_size` candles of history followed by one live session."""
+    sessions = -(-history_size // SESSION_CANDLES) + 1
+    candles = synthetic_candles(sessions, seed=seed)
+
+    live = candles.iloc[-SESSION_CANDLES:]
+    history = candles.iloc[:-SESSION_CANDLES].iloc[-history_size:]
+    return history, live
+
+
+# -----------------------------------------------------------
+# Measurement
+# -----------------------------------------------------------
+
+def _loaded_strategy(name, history, workdir):
+    """Fresh strategy with `history` loaded; returns (strategy, load seconds)."""
+    path = os.path.join(workdir, "history.csv")
+    history.to_csv(path, index=False)
+
+    # heikin_ashi_atr_strike writes "<token>.csv" next to the history file
+    strategy = STRATEGIES[name](os.path.join(workdir, name))
+
+    started = time.perf_counter()
+    strategy.load_historical_data(path)
+    return strategy, time.perf_counter() - started
+
+
+def _live_rows(live):
+    # Timestamps as ISO strings, like the candles coming from the OHLC API
+    return [
+        {
+            "timestamp": row.start_time.isoformat(),
+            "open": row.open,
+            "high": row.high,
+            "low": row.low,
+            "close": row.close,
+            "volume": row.volume,
+        }
+        for row in live.itertuples(index=False)
+    ]
+
+
+def _replay(strategy, rows, timings=None):
+    clock = time.perf_counter_ns
+    # heikin_ashi_atr_strike prints every entry signal
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for row in rows:
+            started = clock()
+            strategy.add_live_data(dict(row))
+            strategy.generate_signal()
+            if timings is not None:
+                timings.append(clock() - started)
+
+
+def measure(name, history_size, seed=0):
+    """Latency / memory metrics of one strategy at one history size."""
+    history, live = history_and_session(history_size, seed=seed)
+    rows = _live_rows(live)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # Timing pass
+        strategy, load_seconds = _loaded_strategy(name, history, workdir)
+        timings = []
+        gc.collect()
+        _replay(strategy, rows, timings)
+
+        # Memory pass on a fresh instance (tracemalloc slows allocation down)
+        strategy, _ = _loaded_strategy(name, history, workdir)
+        gc.collect()
+        tracemalloc.start()
+        try:
+            _replay(strategy, rows)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    us = np.asarray(timings, dtype=float) / 1_000
+    return {
+        "history": history_size,
+        "candles": len(us),
+        "p50_us": float(np.percentile(us, 50)),
+        "p99_us": float(np.percentile(us, 99)),
+        "max_us": float(us.max()),
+        "open_p50_us": float(np.percentile(us[:CANDLES_PER_HOUR], 50)),
+        "close_p50_us": float(np.percentile(us[-CANDLES_PER_HOUR:], 50)),
+        "peak_kib": peak / 1024,
+        "load_ms": load_seconds * 1_000,
+    }
+
+
+def run_benchmarks(strategies=None, history_sizes=HISTORY_SIZES, seed=0):
+    """{"<strategy>/<history>": metrics} for every combination."""
+    results = {}
+    for name in strategies or STRATEGIES:
+        for history_size in history_sizes:
+            results[f"{name}/{history_size}"] = measure(name, history_size, seed=seed)
+    return results
+
+
+# -----------------------------------------------------------
+# Baselines
+# -----------------------------------------------------------
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def save_baseline(path, results):
+    with open(path, "w") as f:
+        json.dump({
+            "created": pd.Timestamp.now().isoformat(timespec="seconds"),
+            "environment": environment(),
+            "results": results,
+        }, f, indent=2)
+
+
+def load_baseline(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(results, baseline, tolerance=0.25):
+    """Regressions of `results` against a baseline dict.
+
+    Returns [(key, metric, baseline value, current value, ratio)] for every
+    tracked metric that grew by more than `tolerance` (0.25 = 25 %). Keys
+    missing from the baseline are skipped.
+    """
+    regressions = []
+    for key, current in results.items():
+        previous = baseline["results"].get(key)
+        if previous is None:
+            continue
+        for metric in TRACKED_METRICS:
+            before, after = previous.get(metric), current[metric]
+            if not before:
+                continue
+            ratio = after / before
+            if ratio > 1 + tolerance:
+                regressions.append((key, metric, before, after, ratio))
+    return regressions
+
+
+def results_table(results):
+    table = pd.DataFrame.from_dict(results, orient="index")
+    table.index.name = "strategy/history"
+    return table.round(1)
+
+
+# -----------------------------------------------------------
+# CLI
+# -----------------------------------------------------------
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Per-candle latency benchmark for the strategies")
+    parser.add_argument("--strategy", nargs="+", choices=list(STRATEGIES), default=list(STRATEGIES))
+    parser.add_argument("--history", type=int, nargs="+", default=list(HISTORY_SIZES),
+                        help="history sizes in candles (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save", help="write the results as a JSON baseline")
+    parser.add_argument("--baseline", help="JSON baseline to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed relative growth before a metric is flagged (default 0.25)")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.strategy, args.history, seed=args.seed)
+    print(results_table(results).to_string())
+
+    if args.save:
+        save_baseline(args.save, results)
+        print(f"Baseline saved -> {args.save}")
+
+    if args.baseline:
+        baseline = load_baseline(args.baseline)
+        if baseline.get("environment") != environment():
+            print("WARNING: baseline was recorded on a different environment")
+
+        regressions = compare(results, baseline, args.tolerance)
+        for key, metric, before, after, ratio in regressions:
+            print(f"REGRESSION {key} {metric}: {before:.1f} -> {after:.1f} ({ratio:.2f}x)")
+
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
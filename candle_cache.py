@@ -0,0 +1,279 @@
+"""
+Warm-start candle cache
+
+Keeps the historical candles of every token in a local NumPy `.npz` file
+(candle_cache/<token>.npz) so a restart only has to fetch the candles that
+arrived after the last cached one, and the strategy can be seeded straight
+from in-memory columns instead of a temporary CSV.
+
+Every timestamp is normalised to IST on the way in (naive values are read
+as IST wall-clock time), so API history, cached files and live candles from
+any feed merge and compare on one timezone. They are stored as int64 UTC
+nanoseconds. Overlapping candles are replaced by the newer copy (the last
+cached candle may have been written while it was still forming).
+
+`append` only updates the in-memory columns; a background writer persists
+appended tokens at most once per `write_delay` seconds (and at exit), so the
+trading loop never waits on the disk.
+"""
+
+import atexit
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytz
+
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = "candle_cache"
+
+PRICE_COLUMNS = ("open", "high", "low", "close", "volume")
+
+IST = pytz.timezone("Asia/Kolkata")
+
+
+# -----------------------------------------------------------
+# Column helpers
+# -----------------------------------------------------------
+
+def to_ist(ts):
+    """Timestamp or DatetimeIndex in IST; naive values are read as IST wall-clock time."""
+    return ts.tz_localize(IST) if ts.tz is None else ts.tz_convert(IST)
+
+
+def ist_index(values):
+    """DatetimeIndex in IST of any timestamp values (strings, datetimes, mixed offsets)."""
+    try:
+        return to_ist(pd.DatetimeIndex(pd.to_datetime(values)))
+    except ValueError:
+        # Mixed offsets, or naive and aware values together: one at a time
+        return pd.DatetimeIndex([to_ist(pd.Timestamp(v)) for v in values])
+
+
+def frame_to_columns(df):
+    """{"timestamp": DatetimeIndex, "open": ndarray, ...} from an OHLC DataFrame.
+
+    Accepts `timestamp` or `start_time`; timestamps are converted to IST,
+    rows are sorted and de-duplicated (last copy wins). A missing volume
+    column is filled with 0.
+    """
+    df = df.rename(columns={"start_time": "timestamp"})
+    timestamps = ist_index(df["timestamp"])
+    volume = df["volume"] if "volume" in df.columns else 0
+
+    columns = {"timestamp": timestamps}
+    for name in PRICE_COLUMNS:
+        values = volume if name == "volume" else df[name]
+        columns[name] = np.broadcast_to(np.asarray(values, dtype=float), len(df)).copy()
+
+    return _sorted_unique(columns)
+
+
+def _sorted_unique(columns):
+    timestamps = columns["timestamp"]
+    # Reverse so np.unique keeps the *last* occurrence of each timestamp
+    _, reverse_index = np.unique(timestamps.asi8[::-1], return_index=True)
+    keep = len(timestamps) - 1 - reverse_index
+
+    return {name: values[keep] for name, values in columns.items()}
+
+
+def merge_columns(cached, fresh, max_candles=None):
+    """Union of two column dicts; on equal timestamps the `fresh` row wins."""
+    if cached is None or len(cached["timestamp"]) == 0:
+        merged = fresh
+    elif len(fresh["timestamp"]) == 0:
+        merged = cached
+    else:
+        merged = {"timestamp": to_ist(cached["timestamp"]).append(to_ist(fresh["timestamp"]))}
+        for name in PRICE_COLUMNS:
+            merged[name] = np.concatenate([cached[name], fresh[name]])
+        merged = _sorted_unique(merged)
+
+    if max_candles is not None and len(merged["timestamp"]) > max_candles:
+        merged = {name: values[-max_candles:] for name, values in merged.items()}
+    return merged
+
+
+def columns_to_frame(columns):
+    df = pd.DataFrame({name: columns[name] for name in PRICE_COLUMNS})
+    df.insert(0, "timestamp", columns["timestamp"])
+    return df
+
+
+# -----------------------------------------------------------
+# Cache
+# -----------------------------------------------------------
+
+class CandleCache:
+    """Per-token candle history on disk, synced incrementally.
+
+        cache = CandleCache()
+        columns = cache.sync("13", lambda since: api.fetch_historical_ohlc("13", since=since))
+        strategy.load_historical_candles(columns)
+        ...
+        cache.append("13", live_data)     # persisted by the writer thread
+    """
+
+    def __init__(self, directory=CACHE_DIR, max_candles=2000, write_delay=5.0):
+        self.directory = directory
+        self.max_candles = max_candles
+        self.write_delay = write_delay
+        self._columns = {}
+        self._locks = {}
+
+        # Background writer of appended tokens
+        self._dirty = set()
+        self._dirty_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._writer = None
+
+    def _lock(self, token):
+        # One lock per token: index threads never wait on each other's fetch
+        return self._locks.setdefault(token, threading.Lock())
+
+    def path(self, token):
+        return os.path.join(self.directory, f"{str(token).replace('|', '_')}.npz")
+
+    # -------------------------------------------------------
+    # Disk
+    # -------------------------------------------------------
+
+    def load(self, token):
+        """Cached columns of `token`, or None when there is no usable cache."""
+        token = str(token)
+        if token in self._columns:
+            return self._columns[token]
+
+        path = self.path(token)
+        if not os.path.exists(path):
+            return None
+
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                tz = str(data["tz"])
+                timestamps = pd.DatetimeIndex(data["timestamp"].astype("datetime64[ns]"))
+                # Files written before the IST normalisation may hold naive wall-clock times
+                timestamps = to_ist(timestamps.tz_localize("UTC") if tz else timestamps)
+                columns = {"timestamp": timestamps}
+                columns.update({name: data[name] for name in PRICE_COLUMNS})
+        except Exception as e:
+            logger.error(f"Ignoring unreadable candle cache {path}: {e}")
+            return None
+
+        self._columns[token] = columns
+        return columns
+
+    def save(self, token, columns):
+        """Writes `columns` to the cache file of `token` (does not touch the in-memory copy)."""
+        token = str(token)
+        os.makedirs(self.directory, exist_ok=True)
+
+        timestamps = to_ist(columns["timestamp"])
+
+        path = self.path(token)
+        tmp_path = f"{path}.tmp.npz"
+        with self._write_lock:
+            np.savez(
+                tmp_path,
+                timestamp=timestamps.as_unit("ns").asi8,  # UTC
+                tz=np.array(str(IST)),
+                **{name: columns[name] for name in PRICE_COLUMNS}
+            )
+            os.replace(tmp_path, path)  # readers never see a half-written file
+
+    # -------------------------------------------------------
+    # Sync
+    # -------------------------------------------------------
+
+    def last_timestamp(self, token):
+        columns = self.load(token)
+        if columns is None or len(columns["timestamp"]) == 0:
+            return None
+        return columns["timestamp"][-1]
+
+    def sync(self, token, fetch):
+        """Brings the cache of `token` up to date and returns its columns.
+
+        `fetch(since)` must return an OHLC DataFrame; `since` is the last
+        cached timestamp (None on a cold start). Rows older than `since` are
+        dropped client-side, so an endpoint that ignores `since` still works,
+        it just downloads more than necessary.
+        """
+        token = str(token)
+        with self._lock(token):
+            cached = self.load(token)
+            since = self.last_timestamp(token)
+
+            df = fetch(since)
+            if df is None or df.empty:
+                logger.info(f"Candle cache {token}: no new candles (since={since})")
+                return cached
+
+            fresh = frame_to_columns(df)
+            if since is not None:
+                recent = np.asarray(fresh["timestamp"] >= since)
+                fresh = {name: values[recent] for name, values in fresh.items()}
+
+            merged = merge_columns(cached, fresh, self.max_candles)
+            self.save(token, merged)
+            self._columns[token] = merged
+
+            logger.info(
+                f"Candle cache {token}: {len(fresh['timestamp'])} fetched, "
+                f"{len(merged['timestamp'])} cached (since={since})"
+            )
+            return merged
+
+    def append(self, token, candle):
+        """Adds one live candle dict (timestamp, open, high, low, close[, volume]).
+
+        Only the in-memory columns change here; the writer thread saves them.
+        """
+        token = str(token)
+        fresh = {"timestamp": ist_index([candle["timestamp"]])}
+        for name in PRICE_COLUMNS:
+            fresh[name] = np.array([float(candle.get(name) or 0)])
+        with self._lock(token):
+            self._columns[token] = merge_columns(self.load(token), fresh, self.max_candles)
+        with self._dirty_lock:
+            self._dirty.add(token)
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._run_writer, name="candle-cache", daemon=True)
+                self._writer.start()
+                atexit.register(self.flush)
+        self._wake.set()
+
+    # -------------------------------------------------------
+    # Writer thread
+    # -------------------------------------------------------
+
+    def flush(self):
+        """Saves every token appended since the last write (returns once they are on disk)."""
+        with self._flush_lock:
+            with self._dirty_lock:
+                tokens, self._dirty = self._dirty, set()
+            for token in tokens:
+                with self._lock(token):
+                    columns = self._columns.get(token)
+                if columns is None:
+                    continue
+                try:
+                    self.save(token, columns)
+                except Exception as e:
+                    logger.error(f"Candle cache write failed for token {token}: {e}")
+
+    def _run_writer(self):
+        while True:
+            self._wake.wait()
+            # Candles of all tokens close together: one write per token per burst
+            time.sleep(self.write_delay)
+            self._wake.clear()
+            self.flush()
@@ -0,0 +1,200 @@
+"""
+Push-based closed-candle feed
+
+Subscribes to the API's server-sent-event stream (GET /stream/candles) and
+hands every candle to the token's trading loop the moment it closes, instead
+of each loop polling /current/ohlc and discarding duplicates.
+
+- The subscription runs on its own thread + event loop; trading threads block
+  on `get(token, timeout)`, which doubles as their loop sleep.
+- While the stream is down `live` is False and the trader falls back to
+  polling; polled candles are reported back through `mark_seen`.
+- The server sends a keepalive comment every 15 s, so a read that stalls
+  for `read_timeout` (40 s) means a half-open connection: it raises, `live`
+  clears and the feed reconnects.
+- After every (re)connect the gap since the last seen candle is backfilled
+  through `backfill(token, since)` (fetch_historical_ohlc), so no closed
+  candle is skipped. Candles are delivered at most once and in order.
+"""
+
+import asyncio
+import json
+import logging
+import queue
+import threading
+from datetime import datetime
+
+import aiohttp
+import pandas as pd
+import pytz
+
+
+logger = logging.getLogger(__name__)
+
+IST = pytz.timezone("Asia/Kolkata")
+
+CANDLE_FIELDS = ("start_time", "open", "high", "low", "close")
+
+# Longest silence tolerated on the stream (the server keepalive is 15 s)
+READ_TIMEOUT = 40.0
+
+
+def _as_timestamp(value):
+    ts = pd.Timestamp(value)
+    return ts.tz_localize(IST) if ts.tzinfo is None else ts
+
+
+class ClosedCandleFeed:
+
+    def __init__(self, stream_url, tokens, backfill=None, timeframe="3min",
+                 reconnect_delay=1.0, max_reconnect_delay=30.0, read_timeout=READ_TIMEOUT):
+        self.stream_url = stream_url
+        self.tokens = [str(token) for token in tokens]
+        self.backfill = backfill
+        self.timeframe = pd.Timedelta(timeframe)
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.read_timeout = read_timeout
+
+        self.queues = {token: queue.Queue() for token in self.tokens}
+        self.last_seen = {}                 # token -> Timestamp of the last delivered candle
+        self._lock = threading.Lock()
+
+        self.connected = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+        # Metrics
+        self.pushed = 0
+        self.backfilled = 0
+        self.reconnects = 0
+
+    @property
+    def live(self):
+        return self.connected.is_set()
+
+    # -------------------------------------------------------
+    # Consumer side (trading threads)
+    # -------------------------------------------------------
+
+    def get(self, token, timeout=None):
+        """Next closed candle dict of `token`, or None if none closed within `timeout`."""
+        try:
+            return self.queues[str(token)].get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def mark_seen(self, token, start_time):
+        """Records a candle the trader obtained by polling, so it is not delivered again."""
+        token = str(token)
+        ts = _as_timestamp(start_time)
+        with self._lock:
+            last = self.last_seen.get(token)
+            if last is None or ts > last:
+                self.last_seen[token] = ts
+
+            # Drop pushes that arrived before the trader caught up to `ts`
+            pending = self.queues[token]
+            with pending.mutex:
+                newer = [c for c in pending.queue if _as_timestamp(c["start_time"]) > ts]
+                pending.queue.clear()
+                pending.queue.extend(newer)
+
+    # -------------------------------------------------------
+    # Producer side
+    # -------------------------------------------------------
+
+    def _deliver(self, token, candle):
+        token = str(token)
+        if token not in self.queues:
+            return False
+        ts = _as_timestamp(candle["start_time"])
+        with self._lock:
+            last = self.last_seen.get(token)
+            if last is not None and ts <= last:
+                return False
+            self.last_seen[token] = ts
+        pushed = {field: candle[field] for field in CANDLE_FIELDS}
+        pushed["volume"] = candle.get("volume") or 0
+        self.queues[token].put(pushed)
+        return True
+
+    def _backfill(self):
+        """Delivers candles that closed after the last seen one, per token."""
+        for token in self.tokens:
+            self._backfill_token(token)
+
+    def _backfill_token(self, token):
+        if self.backfill is None:
+            return
+        since = self.last_seen.get(token)
+        if since is None:
+            return  # nothing seen yet: the strategy was seeded from history
+        try:
+            df = self.backfill(token, since)
+        except Exception as e:
+            logger.error(f"Candle backfill failed for token {token}: {e}")
+            return
+        if df is None or df.empty:
+            return
+
+        now = datetime.now(IST)
+        df = df.rename(columns={"timestamp": "start_time"})
+        starts = df["start_time"].map(_as_timestamp)
+        for candle, start in zip(df.to_dict("records"), starts):
+            if start + self.timeframe > now:
+                continue  # still forming; the stream will push it when it closes
+            if self._deliver(token, candle):
+                self.backfilled += 1
+
+    async def _subscribe(self, session):
+        params = {"tokens": ",".join(self.tokens)}
+        async with session.get(self.stream_url, params=params) as resp:
+            resp.raise_for_status()
+
+            await asyncio.get_running_loop().run_in_executor(None, self._backfill)
+            self.connected.set()
+            logger.info(f"Candle feed connected: {self.stream_url} ({len(self.tokens)} tokens)")
+
+            event = None
+            async for raw in resp.content:
+                if self._stop.is_set():
+                    return
+                line = raw.decode().rstrip("\r\n")
+                if line.startswith("event:"):
+                    event = line[6:].strip()
+                elif line.startswith("data:") and event == "candle":
+                    candle = json.loads(line[5:])
+                    if self._deliver(candle["token"], candle):
+                        self.pushed += 1
+                elif not line:
+                    event = None
+
+    async def _run(self):
+        delay = self.reconnect_delay
+        timeout = aiohttp.ClientTimeout(total=None, connect=5, sock_read=self.read_timeout)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            while not self._stop.is_set():
+                try:
+                    await self._subscribe(session)
+                    delay = self.reconnect_delay
+                except Exception as e:
+                    logger.error(f"Candle feed disconnected ({type(e).__name__}: {e}), polling fallback active")
+                finally:
+                    self.connected.clear()
+
+                if self._stop.is_set():
+                    return
+                self.reconnects += 1
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_reconnect_delay)
+
+    def start(self):
+        self._thread = threading.Thread(
+            target=lambda: asyncio.run(self._run()), name="candle-feed", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
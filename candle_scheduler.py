@@ -0,0 +1,107 @@
+"""
+Candle-boundary-aligned polling
+
+A candle of the strategy's `etf` timeframe can only close on the session grid
+(09:15 IST + k * etf), so the OHLC endpoint only needs polling just after
+each boundary instead of every loop iteration:
+
+    schedule = CandleSchedule("3min")
+    poller = CandlePoller(schedule)
+    if poller.due(now):
+        ... fetch_ohlc ...
+        poller.fetched(now, new_candle)
+    time.sleep(poller.wait_time(now))
+
+The first poll fires `close_delay` seconds after the boundary. If the API does
+not have the new candle yet, it is retried every `burst_interval` seconds, up
+to `burst_attempts` times, before waiting for the next boundary. LTP exit
+checks keep their own cadence in the trading loop.
+"""
+
+import logging
+from datetime import datetime, time as time_c, timedelta
+
+import pandas as pd
+import pytz
+
+
+logger = logging.getLogger(__name__)
+
+IST = pytz.timezone("Asia/Kolkata")
+
+SESSION_OPEN = time_c(9, 15)
+SESSION_CLOSE = time_c(15, 30)
+
+
+class CandleSchedule:
+    """Expected candle closes of one timeframe on the NSE session calendar (Mon-Fri)."""
+
+    def __init__(self, timeframe="3min", session_open=SESSION_OPEN, session_close=SESSION_CLOSE,
+                 close_delay=1.0, burst_interval=1.0, burst_attempts=5):
+        self.timeframe = pd.Timedelta(timeframe).to_pytimedelta()
+        self.session_open = session_open
+        self.session_close = session_close
+        self.close_delay = timedelta(seconds=close_delay)
+        self.burst_interval = timedelta(seconds=burst_interval)
+        self.burst_attempts = burst_attempts
+
+    def _session(self, day):
+        return (IST.localize(datetime.combine(day, self.session_open)),
+                IST.localize(datetime.combine(day, self.session_close)))
+
+    def next_close(self, now):
+        """First candle close strictly after `now` (skipping nights and weekends)."""
+        now = now.astimezone(IST)
+        day = now.date()
+        while True:
+            if day.weekday() < 5:
+                session_open, session_close = self._session(day)
+                if now < session_open + self.timeframe:
+                    return session_open + self.timeframe
+                if now < session_close:
+                    elapsed = (now - session_open) // self.timeframe + 1
+                    return min(session_open + elapsed * self.timeframe, session_close)
+            day += timedelta(days=1)
+            now = IST.localize(datetime.combine(day, time_c(0, 0)))
+
+
+class CandlePoller:
+    """Per-token OHLC poll timing on top of a CandleSchedule."""
+
+    def __init__(self, schedule):
+        self.schedule = schedule
+        self.next_attempt = None            # None: poll right away (startup)
+        self.attempts = 0
+
+        # Metrics
+        self.polls = 0
+        self.misses = 0
+
+    def _arm(self, now):
+        self.next_attempt = self.schedule.next_close(now) + self.schedule.close_delay
+        self.attempts = 0
+
+    def due(self, now):
+        return self.next_attempt is None or now >= self.next_attempt
+
+    def fetched(self, now, new_candle):
+        """Records a poll; `new_candle` is False if the API still had the previous candle."""
+        self.polls += 1
+        if new_candle or self.next_attempt is None:
+            self._arm(now)
+            return
+
+        self.attempts += 1
+        if self.attempts < self.schedule.burst_attempts:
+            self.next_attempt = now + self.schedule.burst_interval
+        else:
+            self.misses += 1
+            logger.warning(f"No new candle {self.attempts} polls after the expected close, "
+                           f"waiting for the next boundary")
+            self._arm(now)
+
+    def wait_time(self, now):
+        """Seconds until the next OHLC poll is due (0 if due now)."""
+        if self.next_attempt is None:
+            return 0.0
+        return max(0.0, (self.next_attempt - now).total_seconds())
@@ -0,0 +1,108 @@
+"""
+Bounded candle + indicator store
+
+A fixed-size ring buffer backed by NumPy arrays. Appending a candle writes one
+row in place, so the cost per candle is constant and memory stays bounded no
+matter how long the process runs. Recent rows are read directly by position;
+a pandas DataFrame is only built when `to_frame()` is called (debugging,
+export, CSV dumps).
+"""
+
+import numpy as np
+import pandas as pd
+
+
+CANDLE_COLUMNS = (
+    "open", "high", "low", "close", "volume",
+    "ha_open", "ha_high", "ha_low", "ha_close",
+    "atr", "rsi_ltf", "rsi_htf",
+)
+
+
+class CandleStore:
+
+    def __init__(self, capacity=500, columns=CANDLE_COLUMNS):
+        if capacity < 1:
+            raise ValueError(f"capacity must be >= 1, got {capacity}")
+
+        self.capacity = capacity
+        self.columns = tuple(columns)
+        self._column_index = {name: i for i, name in enumerate(self.columns)}
+
+        self._values = np.full((capacity, len(self.columns)), np.nan)
+        self._timestamps = np.zeros(capacity, dtype=np.int64)  # UTC nanoseconds
+        self._tz = None
+
+        self._next = 0     # slot the next candle is written to
+        self._size = 0     # rows currently held (<= capacity)
+        self.total = 0     # candles appended since creation
+
+    def __len__(self):
+        return self._size
+
+    def _slot(self, i):
+        if i < 0:
+            i += self._size
+        if not 0 <= i < self._size:
+            raise IndexError(f"candle index {i} out of range for {self._size} rows")
+        return (self._next - self._size + i) % self.capacity
+
+    def _to_timestamp(self, value):
+        if self._tz is None:
+            return pd.Timestamp(value)
+        return pd.Timestamp(value, tz="UTC").tz_convert(self._tz)
+
+    # -------------------------------------------------------
+    # Write
+    # -------------------------------------------------------
+
+    def append(self, timestamp, values):
+        """Stores one candle. Columns missing from `values` are NaN."""
+        timestamp = pd.Timestamp(timestamp)
+        if self.total == 0:
+            self._tz = timestamp.tz
+
+        slot = self._next
+        self._timestamps[slot] = timestamp.value
+
+        row = self._values[slot]
+        row.fill(np.nan)
+        for name, value in values.items():
+            column = self._column_index.get(name)
+            if column is not None and value is not None:
+                row[column] = value
+
+        self._next = (slot + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+        self.total += 1
+
+    # -------------------------------------------------------
+    # Read
+    # -------------------------------------------------------
+
+    def value(self, column, i=-1):
+        """Single value by column name and position (negative = from the end)."""
+        return self._values[self._slot(i), self._column_index[column]]
+
+    def timestamp(self, i=-1):
+        return self._to_timestamp(self._timestamps[self._slot(i)])
+
+    def row(self, i=-1):
+        """One row as a dict: {"timestamp": ..., "open": ..., ...}."""
+        slot = self._slot(i)
+        row = dict(zip(self.columns, self._values[slot]))
+        row["timestamp"] = self._to_timestamp(self._timestamps[slot])
+        return row
+
+    def to_frame(self):
+        """Chronological DataFrame copy of the rows currently held."""
+        order = np.arange(self._next - self._size, self._next) % self.capacity
+
+        df = pd.DataFrame(self._values[order], columns=list(self.columns))
+
+        timestamps = pd.to_datetime(self._timestamps[order], utc=self._tz is not None)
+        if self._tz is not None:
+            timestamps = timestamps.tz_convert(self._tz)
+        df.insert(0, "timestamp", timestamps)
+
+        return df
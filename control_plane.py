@@ -0,0 +1,140 @@
+"""
+Control-plane watcher
+
+One background thread fetches the admin flags of every open position (the
+kill switch of its token and its strike-price close) in a single call, and
+publishes them as threading.Events. Only open positions are watched: the
+loops register them on entry and drop them on exit, so with no position open
+the watcher makes no request at all. The trading loops only check
+`killed(token)` / `strike_closed(unique_id)`, so they make no request of their own.
+
+When the API supports it, the call long-polls: the server holds it until a
+flag changes or `long_poll` seconds pass, so a kill reaches the loops one
+response later instead of after N serialized per-thread requests. Otherwise
+the flags are polled every `interval` seconds (see
+ApiDatabaseClient.fetch_control_flags for the per-key fallback).
+
+Positions opened while a long-poll is in flight are included from the next
+request, i.e. within `long_poll` seconds.
+"""
+
+import logging
+import threading
+from collections import defaultdict
+
+
+logger = logging.getLogger(__name__)
+
+
+class ControlPlaneWatcher:
+
+    def __init__(self, api_client, interval=1.0, long_poll=10.0):
+        self.api = api_client
+        self.interval = interval
+        self.long_poll = long_poll
+
+        self._tokens = set()
+        self._unique_ids = set()
+        self._kill = defaultdict(threading.Event)
+        self._strike_close = defaultdict(threading.Event)
+        self._lock = threading.Lock()
+        self._changed = threading.Event()   # set when the watch list grows
+
+        self.version = None
+        self._stop = threading.Event()
+        self._thread = None
+
+        # Metrics
+        self.polls = 0
+
+    # -------------------------------------------------------
+    # Trading loops
+    # -------------------------------------------------------
+
+    def watch(self, token=None, unique_id=None):
+        with self._lock:
+            if token is not None:
+                self._tokens.add(str(token))
+            if unique_id is not None:
+                self._unique_ids.add(unique_id)
+        self._changed.set()
+
+    def unwatch(self, unique_id, token=None):
+        """Stops watching a closed position and drops its flags."""
+        with self._lock:
+            self._unique_ids.discard(unique_id)
+            self._strike_close.pop(unique_id, None)
+            if token is not None:
+                self._tokens.discard(str(token))
+                self._kill.pop(str(token), None)
+
+    def killed(self, token):
+        return self._kill[str(token)].is_set()
+
+    def strike_closed(self, unique_id):
+        return self._strike_close[unique_id].is_set()
+
+    def kill_event(self, token):
+        """Event set while the kill switch of `token` is on (for loops that want to wait on it)."""
+        return self._kill[str(token)]
+
+    # -------------------------------------------------------
+    # Watcher thread
+    # -------------------------------------------------------
+
+    def _apply(self, flags, events):
+        for key, on in flags.items():
+            event = events[key]
+            if on and not event.is_set():
+                logger.info(f"Control flag raised for {key}")
+                event.set()
+            elif not on and event.is_set():
+                event.clear()
+
+    def poll_once(self):
+        with self._lock:
+            tokens = sorted(self._tokens)
+            unique_ids = sorted(self._unique_ids)
+        if not tokens and not unique_ids:
+            self._changed.wait(self.interval)
+            self._changed.clear()
+            return
+
+        self._changed.clear()
+        wait = self.long_poll if self.version is not None else 0
+        result = self.api.fetch_control_flags(tokens, unique_ids, since=self.version, wait=wait)
+        self.polls += 1
+
+        with self._lock:
+            # Positions closed while the request was in flight are not resurrected
+            self._apply(
+                {token: on for token, on in result.get("kill", {}).items() if token in self._tokens},
+                self._kill
+            )
+            self._apply(
+                {uid: on for uid, on in result.get("strike_close", {}).items() if uid in self._unique_ids},
+                self._strike_close
+            )
+        self.version = result.get("version")
+
+        if self.version is None:
+            # No long-poll support: plain polling, woken early by new positions
+            self._changed.wait(self.interval)
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll_once()
+            except Exception as e:
+                logger.error(f"Control-plane poll failed: {e}")
+                self.version = None
+                self._stop.wait(self.interval)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="control-plane", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._changed.set()
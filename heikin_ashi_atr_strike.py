@@ -3,24 +3,13 @@
 import math  # For mathematical operations
 import pandas as pd  # For data manipulation
 import pandas_ta as ta  # For technical analysis indicators
+from indicator_engine import MultiTimeframeRSI  # Incremental HTF / ETF RSI
 
 # Set up logging to a separate file for this script
 import logging
 
-# Create a named logger for this module
-logger = logging.getLogger(__name__)
-logger.setLevel(logging.INFO)
-
-# Create file handler for this logger
-file_handler = logging.FileHandler('heikin_ashi_atr_strike.log')
-file_handler.setLevel(logging.INFO)
-
-# Create formatter and add it to the handler
-formatter = logging.Formatter('%(asctime)s %(levelname)s %(message)s')
-file_handler.setFormatter(formatter)
-
-# Add the handler to the logger
-logger.addHandler(file_handler)
+# Create a named logger for this module (written to heikin_ashi_atr_strike.log by log_setup.setup_logging)
+logger = logging.getLogger('heikin_ashi_atr_strike')
 
 class HeikinAshiATRStrategy:
     def __init__(self,
@@ -53,6 +42,11 @@ class HeikinAshiATRStrategy:
         self.highest_since_entry = None  # Highest price since entry (for long)
         self.lowest_since_entry = None  # Lowest price since entry (for short)
         self.strike_roundup_value = strike_roundup_value
+        self.timeframe_rsi = self._new_timeframe_rsi()  # Open-bucket HTF / ETF RSI state
+
+    def _new_timeframe_rsi(self):
+        # HTF and ETF RSI on HA close, updated per candle without resampling the history
+        return MultiTimeframeRSI(self.rsi_len, fill_forward=False, rsi_htf=self.htf, rsi_etf=self.etf)
 
     def reset_state(self):
         """Reset all position-related state variables to effectively 'cancel' a trade."""
@@ -130,6 +124,11 @@ class HeikinAshiATRStrategy:
         rsi_etf = rsi_etf.reindex(self.df['timestamp'], method='ffill')
         self.df['rsi_etf'] = rsi_etf.values
 
+        # Warm up the incremental HTF / ETF RSI used by add_live_data
+        self.timeframe_rsi = self._new_timeframe_rsi()
+        for ts, ha_close in zip(self.df['timestamp'], self.df['ha_close'].to_numpy()):
+            self.timeframe_rsi.update(ts, ha_close)
+
         # Mark if each row is within the trading session
         self.df['in_session'] = self.df['timestamp'].dt.time.between(
             pd.to_datetime("09:15").time(),
@@ -176,17 +175,10 @@ class HeikinAshiATRStrategy:
         rsi_series = ta.rsi(self.df['ha_close'], length=self.rsi_len)
         self.df.at[idx, 'rsi_ltf'] = rsi_series.iloc[-1]
 
-        # Update HTF and ETF RSI for last row
-        df_temp = self.df.set_index('timestamp')
-        rsi_htf = df_temp['ha_close'].resample(self.htf).last()
-        rsi_htf = ta.rsi(rsi_htf, length=self.rsi_len)
-        rsi_htf_val = rsi_htf.reindex([ts], method='ffill').iloc[0]
-        self.df.at[idx, 'rsi_htf'] = rsi_htf_val
-
-        rsi_etf = df_temp['ha_close'].resample(self.etf).last()
-        rsi_etf = ta.rsi(rsi_etf, length=self.rsi_len)
-        rsi_etf_val = rsi_etf.reindex([ts], method='ffill').iloc[0]
-        self.df.at[idx, 'rsi_etf'] = rsi_etf_val
+        # Update HTF and ETF RSI for last row (only the open bucket is recomputed)
+        timeframe_rsi = self.timeframe_rsi.update(ts, self.df.at[idx, 'ha_close'])
+        self.df.at[idx, 'rsi_htf'] = timeframe_rsi['rsi_htf']
+        self.df.at[idx, 'rsi_etf'] = timeframe_rsi['rsi_etf']
 
         # Mark if this row is within the trading session
         ts_time = ts.timetz()
@@ -328,6 +320,9 @@ class HeikinAshiATRStrategy:
 
 
 if __name__ == "__main__":
+    from log_setup import setup_logging
+    setup_logging()
+
     # Example usage: run strategy on historical and simulated live data
     strategy = HeikinAshiATRStrategy(token="Nifty", stock_symbol="Nifty50")  # Initialize strategy
     # strategy.load_historical_data('old_3min.csv')  # Load historical data
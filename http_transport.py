@@ -0,0 +1,274 @@
+"""
+Deadline-aware HTTP transport
+
+`ResilientSession` is a drop-in requests.Session for ApiDatabaseClient. Every
+`session.get/post/put` goes through `request()`, which adds, per endpoint:
+
+- connect/read timeouts and an overall deadline (ENDPOINT_POLICIES, matched
+  by path prefix), so a stalled socket can no longer hang a token's thread;
+- retries with full-jitter exponential backoff for idempotent methods only
+  (GET/HEAD/PUT), on connection errors, timeouts and 502/503/504, for as
+  long as the deadline allows; POSTs are sent once;
+- a circuit breaker: after `failure_threshold` consecutive failures the
+  endpoint fails fast with CircuitOpenError for `cooldown` seconds, then
+  lets one probe request through. Entry/exit signals are exempt
+  (`breaker=False`): an exit must always reach the server, however the
+  previous ones fared;
+- a latency histogram for every method (`stats()`, `log_stats()`).
+
+async_api_client.AsyncApiDatabaseClient applies the same policies
+(`policy_for`, `retry_delay`) to its timeouts and retries.
+
+An explicit `timeout=` from the caller (e.g. a long-poll) takes precedence
+over the policy. CircuitOpenError is a requests.ConnectionError, so the
+callers' existing error handling applies unchanged.
+"""
+
+import logging
+import random
+import re
+import threading
+import time
+from bisect import bisect_left
+from urllib.parse import urlsplit
+
+import requests
+
+
+logger = logging.getLogger(__name__)
+
+
+class EndpointPolicy:
+    __slots__ = ("connect", "read", "deadline", "retries", "breaker")
+
+    def __init__(self, connect=2.0, read=5.0, deadline=8.0, retries=2, breaker=True):
+        self.connect = connect
+        self.read = read
+        self.deadline = deadline
+        self.retries = retries
+        self.breaker = breaker
+
+
+DEFAULT_POLICY = EndpointPolicy()
+
+# Matched against the URL path; the longest matching fragment wins
+ENDPOINT_POLICIES = {
+    "/indices/ltp": EndpointPolicy(connect=1.0, read=2.0, deadline=4.0),
+    "/current/ohlc": EndpointPolicy(connect=1.0, read=3.0, deadline=5.0),
+    "/historical/ohlc/load": EndpointPolicy(connect=2.0, read=20.0, deadline=45.0),
+    "/signals/get-symbol-token-file": EndpointPolicy(connect=2.0, read=30.0, deadline=60.0),
+    # Entry/exit signals are POSTs: never retried, never short-circuited, but bounded
+    "/signals/entry": EndpointPolicy(connect=2.0, read=10.0, deadline=10.0, retries=0, breaker=False),
+    "/signals/exit": EndpointPolicy(connect=2.0, read=10.0, deadline=10.0, retries=0, breaker=False),
+}
+
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "PUT"})
+RETRY_STATUSES = frozenset({502, 503, 504})
+
+_POLICIES_BY_LENGTH = sorted(ENDPOINT_POLICIES.items(), key=lambda kv: -len(kv[0]))
+
+# Histogram bucket upper bounds in ms (last bucket is open-ended)
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+_ID_SEGMENT = re.compile(r"^(\d+|[0-9a-fA-F-]{16,})$")
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """Raised without a request while an endpoint's circuit is open."""
+
+
+def policy_for(url, policies=None):
+    """EndpointPolicy of `url`: the longest matching fragment of `policies`, else DEFAULT_POLICY."""
+    path = urlsplit(url).path
+    for prefix, policy in (policies or _POLICIES_BY_LENGTH):
+        if prefix in path:
+            return policy
+    return DEFAULT_POLICY
+
+
+def retry_delay(attempt, base=0.1, cap=1.0):
+    """Full-jitter exponential backoff before retry `attempt` + 1."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def endpoint_key(url):
+    """Path with id-like segments folded: /signals/get-stop-loss-target/v1/{id}."""
+    path = urlsplit(url).path
+    return "/".join("{id}" if _ID_SEGMENT.match(part) else part for part in path.split("/"))
+
+
+class LatencyHistogram:
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.total = 0
+        self.errors = 0
+        self.max_ms = 0.0
+
+    def add(self, ms, error=False):
+        self.counts[bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+        self.total += 1
+        self.errors += error
+        self.max_ms = max(self.max_ms, ms)
+
+    def percentile(self, q):
+        """Upper bound (ms) of the bucket holding the q-th percentile, capped at the max seen."""
+        if not self.total:
+            return None
+        rank = q / 100 * self.total
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                bound = LATENCY_BUCKETS_MS[i] if i < len(LATENCY_BUCKETS_MS) else self.max_ms
+                return round(min(bound, self.max_ms), 1)
+        return round(self.max_ms, 1)
+
+
+class CircuitBreaker:
+
+    def __init__(self, failure_threshold=5, cooldown=10.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if self.probing else "open"
+
+    def allow(self, now):
+        if self.opened_at is None:
+            return True
+        if now - self.opened_at >= self.cooldown and not self.probing:
+            self.probing = True     # one probe request; its outcome decides
+            return True
+        return False
+
+    def record(self, ok, now):
+        if ok:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+            return False
+        self.failures += 1
+        if self.probing or self.failures >= self.failure_threshold:
+            opened = self.opened_at is None or self.probing
+            self.opened_at = now
+            self.probing = False
+            return opened
+        return False
+
+
+class ResilientSession(requests.Session):
+
+    def __init__(self, policies=None, failure_threshold=5, cooldown=10.0,
+                 backoff_base=0.1, backoff_cap=1.0):
+        super().__init__()
+        self.policies = sorted((policies or ENDPOINT_POLICIES).items(), key=lambda kv: -len(kv[0]))
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+
+        self._breakers = {}
+        self._histograms = {}
+        self._stats_lock = threading.Lock()
+
+    def policy_for(self, url):
+        return policy_for(url, self.policies)
+
+    def _endpoint(self, key, policy):
+        """(breaker, histogram) of an endpoint; breaker is None when its policy exempts it."""
+        with self._stats_lock:
+            if key not in self._histograms:
+                self._histograms[key] = LatencyHistogram()
+                self._breakers[key] = CircuitBreaker(self.failure_threshold, self.cooldown) \
+                    if policy.breaker else None
+            return self._breakers[key], self._histograms[key]
+
+    def _record(self, key, breaker, histogram, started, ok):
+        now = time.monotonic()
+        with self._stats_lock:
+            histogram.add((now - started) * 1000, error=not ok)
+            if breaker is not None and breaker.record(ok, now):
+                logger.error(f"Circuit opened for {key} after {breaker.failures} failures "
+                             f"(failing fast for {breaker.cooldown}s)")
+
+    def request(self, method, url, *args, **kwargs):
+        method = method.upper()
+        key = f"{method} {endpoint_key(url)}"
+        policy = self.policy_for(url)
+        breaker, histogram = self._endpoint(key, policy)
+
+        explicit_timeout = kwargs.pop("timeout", None)
+        retries = policy.retries if method in IDEMPOTENT_METHODS else 0
+        deadline = time.monotonic() + policy.deadline
+
+        attempt = 0
+        while True:
+            now = time.monotonic()
+            if breaker is not None:
+                with self._stats_lock:
+                    allowed = breaker.allow(now)
+                if not allowed:
+                    raise CircuitOpenError(f"{key}: circuit open, failing fast")
+
+            if explicit_timeout is not None:
+                timeout = explicit_timeout
+            else:
+                timeout = (policy.connect, max(0.1, min(policy.read, deadline - now)))
+
+            started = time.monotonic()
+            try:
+                resp = super().request(method, url, *args, timeout=timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self._record(key, breaker, histogram, started, ok=False)
+                error, resp = e, None
+            else:
+                failed = resp.status_code >= 500
+                self._record(key, breaker, histogram, started, ok=not failed)
+                if not (failed and resp.status_code in RETRY_STATUSES):
+                    return resp
+                error = None
+
+            # Retry only idempotent requests, and only while the deadline allows
+            delay = retry_delay(attempt, self.backoff_base, self.backoff_cap)
+            if attempt >= retries or time.monotonic() + delay >= deadline:
+                if error is not None:
+                    raise error
+                return resp
+            attempt += 1
+            logger.info(f"Retrying {key} (attempt {attempt + 1}) in {delay * 1000:.0f} ms: "
+                        f"{error if error is not None else resp.status_code}")
+            time.sleep(delay)
+
+    # -------------------------------------------------------
+    # Stats
+    # -------------------------------------------------------
+
+    def stats(self):
+        """{endpoint: {count, errors, p50_ms, p90_ms, p99_ms, max_ms, circuit}}."""
+        with self._stats_lock:
+            return {
+                key: {
+                    "count": h.total,
+                    "errors": h.errors,
+                    "p50_ms": h.percentile(50),
+                    "p90_ms": h.percentile(90),
+                    "p99_ms": h.percentile(99),
+                    "max_ms": round(h.max_ms, 1),
+                    "circuit": self._breakers[key].state if self._breakers[key] is not None else "exempt",
+                }
+                for key, h in self._histograms.items()
+            }
+
+    def log_stats(self):
+        for key, s in sorted(self.stats().items()):
+            logger.info(
+                f"HTTP {key}: n={s['count']} err={s['errors']} p50<={s['p50_ms']}ms "
+                f"p90<={s['p90_ms']}ms p99<={s['p99_ms']}ms max={s['max_ms']}ms circuit={s['circuit']}"
+            )
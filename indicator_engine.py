@@ -0,0 +1,291 @@
+"""
+Streaming indicator engine for the Heikin Ashi + ATR + RSI strategy
+
+Keeps the recursive state of every indicator the strategy needs so each new
+candle is processed in constant time instead of re-running pandas_ta over the
+whole session.
+
+The arithmetic mirrors pandas_ta 0.4.x (pure pandas path, no TA-Lib) step by
+step, so the values produced for the newest candle are bit-identical to what
+HeikinAshiATRStrategy._recalculate_indicators computes for its last row:
+
+- ta.ha   : HA_open seeded with 0.5 * (open + close) of the first candle
+- ta.atr  : true range on HA candles, SMA seed of the first `length` values,
+            then pandas ewm(alpha=1/length, adjust=False)
+- ta.rsi  : pandas ewm(alpha=1/length, adjust=False) of gains / losses
+- rsi_htf : ta.rsi over resample(htf).last(), including the empty buckets
+            resample inserts for overnight / weekend gaps, forward filled
+
+Deviations from the reference (bounded by test_indicator_parity.py):
+
+- ATR epsilon: pandas_ta adds float epsilon to *every* high-low range as
+  soon as one zero range exists anywhere in the series. The streaming ATR
+  only applies it from the first flat HA candle onwards; replaying the whole
+  history for it would cost O(n) state. The ATR differs by a few ulps
+  (relative error < 1e-13).
+- Historical rows are as-of values: each candle keeps what the engine
+  produced when it was the newest. The reference recomputes every row over
+  the full DataFrame, so its older rows see the final close of their 15min
+  bucket (rsi_htf) and the warm-up ATR row. The newest candle, the only
+  one the signals read, matches the reference.
+"""
+
+import sys
+import pandas as pd
+
+from timeframes import NAN, TimeframeBucketAggregator
+
+
+# -----------------------------------------------------------
+# Wilder / RMA smoothing
+# -----------------------------------------------------------
+
+class WilderRMA:
+    """Recursive pandas `ewm(alpha=1/length, adjust=False).mean()`.
+
+    NaN inputs are handled like pandas with ignore_na=False: they leave the
+    average untouched but keep decaying the weight of the previous value.
+    """
+
+    def __init__(self, length):
+        self.alpha = 1.0 / length
+        self.factor = 1.0 - self.alpha
+        self.value = NAN
+        self._old_wt = 1.0
+
+    def _step(self, x):
+        value, old_wt = self.value, self._old_wt
+
+        if value != value:
+            # No observation yet: the first non-NaN input seeds the average
+            return (x, old_wt) if x == x else (value, old_wt)
+
+        old_wt *= self.factor
+        if x == x:
+            if value != x:
+                value = (old_wt * value + self.alpha * x) / (old_wt + self.alpha)
+            old_wt = 1.0
+
+        return value, old_wt
+
+    def peek(self, x):
+        """Value the average would have after `x`, without committing it."""
+        return self._step(x)[0]
+
+    def update(self, x):
+        self.value, self._old_wt = self._step(x)
+        return self.value
+
+
+# -----------------------------------------------------------
+# RSI
+# -----------------------------------------------------------
+
+class StreamingRSI:
+    """Incremental equivalent of ta.rsi(series, length)."""
+
+    def __init__(self, length, scalar=100):
+        self.length = length
+        self.scalar = scalar
+        self.count = 0
+        self.prev = NAN
+        self.raw = NAN   # latest RSI ignoring the length + 1 warm-up rule
+        self.gain = WilderRMA(length)
+        self.loss = WilderRMA(length)
+
+    def _split(self, x):
+        diff = x - self.prev
+        gain = 0.0 if diff < 0 else diff
+        loss = 0.0 if diff > 0 else diff
+        return gain, loss
+
+    def _rsi(self, gain_avg, loss_avg):
+        denominator = gain_avg + abs(loss_avg)
+        if denominator != denominator or denominator == 0:
+            return NAN
+        return self.scalar * gain_avg / denominator
+
+    def peek(self, x):
+        """RSI if `x` were appended now (state is left unchanged)."""
+        if self.count + 1 < self.length + 1:
+            return NAN
+        gain, loss = self._split(x)
+        return self._rsi(self.gain.peek(gain), self.loss.peek(loss))
+
+    def update(self, x):
+        gain, loss = self._split(x)
+        self.raw = self._rsi(self.gain.update(gain), self.loss.update(loss))
+        self.prev = x
+        self.count += 1
+
+        # ta.rsi returns None until it has length + 1 values
+        if self.count < self.length + 1:
+            return NAN
+        return self.raw
+
+
+# -----------------------------------------------------------
+# ATR
+# -----------------------------------------------------------
+
+class StreamingATR:
+    """Incremental equivalent of ta.atr(high, low, close, length)."""
+
+    def __init__(self, length):
+        self.length = length
+        self.count = 0
+        self.prev_close = NAN
+        self.rma = WilderRMA(length)
+        self._seed = []
+        self._zero_range_seen = False
+
+    def update(self, high, low, close):
+        hl_range = high - low
+        if hl_range == 0:
+            self._zero_range_seen = True
+        if self._zero_range_seen:
+            hl_range += sys.float_info.epsilon
+
+        if self.prev_close != self.prev_close:
+            true_range = abs(hl_range)
+        else:
+            true_range = max(
+                abs(hl_range),
+                abs(high - self.prev_close),
+                abs(self.prev_close - low)
+            )
+
+        self.prev_close = close
+        self.count += 1
+
+        if self.count < self.length:
+            self._seed.append(true_range)
+        elif self.count == self.length:
+            self._seed.append(true_range)
+            self.rma.update(pd.Series(self._seed).mean())
+            self._seed = []
+        else:
+            self.rma.update(true_range)
+
+        # ta.atr returns None until it has length + 1 values
+        if self.count < self.length + 1:
+            return NAN
+        return self.rma.value
+
+
+# -----------------------------------------------------------
+# Heikin Ashi
+# -----------------------------------------------------------
+
+class StreamingHeikinAshi:
+    """Incremental equivalent of ta.ha(open, high, low, close)."""
+
+    def __init__(self):
+        self.prev_open = None
+        self.prev_close = None
+
+    def update(self, open_, high, low, close):
+        ha_close = 0.25 * (open_ + high + low + close)
+
+        if self.prev_open is None:
+            ha_open = 0.5 * (open_ + close)
+        else:
+            ha_open = 0.5 * (self.prev_open + self.prev_close)
+
+        ha_high = max(max(ha_open, ha_close), high)
+        ha_low = min(min(ha_open, ha_close), low)
+
+        self.prev_open = ha_open
+        self.prev_close = ha_close
+
+        return ha_open, ha_high, ha_low, ha_close
+
+
+# -----------------------------------------------------------
+# Higher timeframe RSI
+# -----------------------------------------------------------
+
+class HigherTimeframeRSI:
+    """RSI of resample(freq).last() reindexed (ffill) onto the base candles.
+
+    Only the open bucket is re-evaluated per candle; the RSI state advances
+    when a bucket closes (empty buckets are fed as NaN, like resample does).
+
+    fill_forward=True reproduces algo.py's `.ffill()` after the reindex: a NaN
+    RSI for the open bucket falls back to the last valid closed bucket.
+    heikin_ashi_atr_strike.py does not ffill, so it uses fill_forward=False.
+    """
+
+    def __init__(self, freq, length, fill_forward=True):
+        self.length = length
+        self.fill_forward = fill_forward
+        self.buckets = TimeframeBucketAggregator(freq)
+        self.rsi = StreamingRSI(length)
+        self.last_valid = NAN
+
+    def update(self, timestamp, value):
+        closed = self.buckets.update(timestamp, value)
+
+        if closed is not None:
+            self.rsi.update(closed.last)
+            if self.rsi.raw == self.rsi.raw:
+                self.last_valid = self.rsi.raw
+            for _ in range(closed.empty_after):
+                self.rsi.update(NAN)
+
+        # ta.rsi returns None while there are <= length buckets
+        if self.buckets.bucket_count < self.length + 1:
+            return NAN
+
+        current = self.rsi.peek(value)
+        if current != current and self.fill_forward:
+            return self.last_valid
+        return current
+
+
+class MultiTimeframeRSI:
+    """A HigherTimeframeRSI per named timeframe, fed from one candle stream.
+
+        MultiTimeframeRSI(14, rsi_htf="15min", rsi_etf="3min")
+    """
+
+    def __init__(self, length, fill_forward=True, **timeframes):
+        self.timeframes = {
+            name: HigherTimeframeRSI(freq, length, fill_forward=fill_forward)
+            for name, freq in timeframes.items()
+        }
+
+    def update(self, timestamp, value):
+        return {
+            name: rsi.update(timestamp, value)
+            for name, rsi in self.timeframes.items()
+        }
+
+
+# -----------------------------------------------------------
+# Engine
+# -----------------------------------------------------------
+
+class StreamingIndicatorEngine:
+    """Produces ha_*, atr, rsi_ltf and rsi_htf for one candle at a time."""
+
+    def __init__(self, atr_len=14, rsi_len=14, htf="15min"):
+        self.ha = StreamingHeikinAshi()
+        self.atr = StreamingATR(atr_len)
+        self.rsi_ltf = StreamingRSI(rsi_len)
+        self.rsi_htf = HigherTimeframeRSI(htf, rsi_len)
+
+    def update(self, timestamp, open_, high, low, close):
+        ha_open, ha_high, ha_low, ha_close = self.ha.update(
+            float(open_), float(high), float(low), float(close)
+        )
+
+        return {
+            "ha_open":  ha_open,
+            "ha_high":  ha_high,
+            "ha_low":   ha_low,
+            "ha_close": ha_close,
+            "atr":      self.atr.update(ha_high, ha_low, ha_close),
+            "rsi_ltf":  self.rsi_ltf.update(ha_close),
+            "rsi_htf":  self.rsi_htf.update(timestamp, ha_close),
+        }
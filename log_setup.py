@@ -0,0 +1,191 @@
+"""
+Queue-backed logging
+
+`setup_logging()` is the one startup call for every entry point (Main.py,
+spws.py, the backtests). Each module logger gets the same QueueHandler. The
+handler only puts the LogRecord on an in-memory queue. One QueueListener
+thread formats the records and writes them to each module's file (or the
+console), so the trading and tick threads never touch the disk or stdout:
+
+    main                    -> main.log (rotating, 1 MB x 1)
+    algo                    -> heikin_ashi_strategy.log
+    heikin_ashi_atr_strike  -> heikin_ashi_atr_strike.log
+    spws, console           -> console (stdout)
+
+The order path and feed modules log to getLogger(__name__); LOG_ROUTES sends
+those loggers (and `__main__`, for modules run as scripts) to a destination
+above, so they share main.log and each record carries its module name.
+
+Records are enqueued unformatted. Log with %-style arguments
+(`logger.debug("ts=%s rsi=%.2f", ts, rsi)`): a disabled level then costs
+one level check, and the message is built on the listener thread. For the
+same reason, pass immutable values as arguments.
+
+`RateLimitedLogger` wraps a logger for per-tick messages. Each message
+template (or explicit `key=`, e.g. a token) is emitted at most once per
+interval, together with the number of repeats it suppressed.
+
+LOG_LEVEL sets the level (default INFO). LOG_CONSOLE=1 also echoes every
+logger to the console.
+"""
+
+import atexit
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+
+FORMAT = "%(asctime)s %(name)s %(levelname)s %(message)s"
+
+# logger name -> (file, max_bytes, backup_count); file None = console
+LOG_DESTINATIONS = {
+    "main": ("main.log", 1 * 1024 * 1024, 1),
+    "algo": ("heikin_ashi_strategy.log", 0, 0),
+    "heikin_ashi_atr_strike": ("heikin_ashi_atr_strike.log", 0, 0),
+    "spws": (None, 0, 0),
+    "console": (None, 0, 0),
+}
+
+# module logger name -> destination logger name
+LOG_ROUTES = {
+    name: "main" for name in (
+        "__main__",
+        "async_api_client",
+        "candle_cache",
+        "candle_feed",
+        "candle_scheduler",
+        "control_plane",
+        "http_transport",
+        "order_executor",
+        "order_queue",
+        "order_updates",
+        "position_sync",
+        "request_coalescer",
+        "strike_index",
+        "tick_candles",
+        "trade_journal",
+    )
+}
+
+_listener = None
+_lock = threading.Lock()
+
+
+class DeferredQueueHandler(QueueHandler):
+    """QueueHandler that leaves formatting (msg % args, exc_info) to the listener thread."""
+
+    def prepare(self, record):
+        return record
+
+
+class RouteFilter(logging.Filter):
+    """Passes records of any of `names` (and their child loggers)."""
+
+    def __init__(self, names):
+        super().__init__()
+        self.filters = [logging.Filter(name) for name in names]
+
+    def filter(self, record):
+        return any(f.filter(record) for f in self.filters)
+
+
+def _handler(names, path, max_bytes, backup_count):
+    if path is None:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+    else:
+        if max_bytes:
+            handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count)
+        else:
+            handler = logging.FileHandler(path)
+        handler.setFormatter(logging.Formatter(FORMAT))
+    handler.addFilter(RouteFilter(names))
+    return handler
+
+
+def setup_logging(level=None, console=None, destinations=LOG_DESTINATIONS, routes=LOG_ROUTES):
+    """Routes every module logger through one queue and listener thread (idempotent)."""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            return _listener
+
+        level = level or os.getenv("LOG_LEVEL", "INFO").upper()
+        if console is None:
+            console = os.getenv("LOG_CONSOLE", "").lower() in ("1", "true", "yes")
+
+        handlers = [
+            _handler([name] + [src for src, dst in routes.items() if dst == name], *dest)
+            for name, dest in destinations.items()
+        ]
+        if console:
+            echo = logging.StreamHandler(sys.stderr)
+            echo.setFormatter(logging.Formatter(FORMAT))
+            handlers.append(echo)
+
+        queue_handler = DeferredQueueHandler(queue.SimpleQueue())
+        for name in [*destinations, *routes]:
+            logger = logging.getLogger(name)
+            logger.setLevel(level)
+            for handler in list(logger.handlers):
+                logger.removeHandler(handler)
+            logger.addHandler(queue_handler)
+            logger.propagate = False
+
+        _listener = QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(stop_logging)
+        return _listener
+
+
+def stop_logging():
+    """Flushes the queue and stops the listener (registered atexit)."""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            for handler in _listener.handlers:
+                handler.close()
+            _listener = None
+
+
+class RateLimitedLogger:
+    """At most one record per message template and `interval` seconds; repeats are counted."""
+
+    def __init__(self, logger, interval=5.0):
+        self.logger = logger
+        self.interval = interval
+        self._last = {}             # (level, msg, key) -> (last emitted, suppressed since)
+        self._lock = threading.Lock()
+
+    def log(self, level, msg, *args, key=None):
+        if not self.logger.isEnabledFor(level):
+            return
+        key = (level, msg, key)
+        now = time.monotonic()
+        with self._lock:
+            last, suppressed = self._last.get(key, (None, 0))
+            if last is not None and now - last < self.interval:
+                self._last[key] = (last, suppressed + 1)
+                return
+            self._last[key] = (now, 0)
+        if suppressed:
+            self.logger.log(level, msg + " (%d similar suppressed)", *args, suppressed)
+        else:
+            self.logger.log(level, msg, *args)
+
+    def debug(self, msg, *args, key=None):
+        self.log(logging.DEBUG, msg, *args, key=key)
+
+    def info(self, msg, *args, key=None):
+        self.log(logging.INFO, msg, *args, key=key)
+
+    def warning(self, msg, *args, key=None):
+        self.log(logging.WARNING, msg, *args, key=key)
+
+    def error(self, msg, *args, key=None):
+        self.log(logging.ERROR, msg, *args, key=key)
@@ -0,0 +1,233 @@
+"""
+Shared-memory LTP board
+
+A fixed array of slots in `multiprocessing.shared_memory`, written by the
+streamer process (spws) and read by the trader process, so the trader reads
+an LTP with a memory load instead of an HTTP round trip.
+
+Each slot holds (seq, token, ltp, updated_at). The writer claims a slot the
+first time it sees a token and records the token in it; readers find a
+token's slot by scanning the claimed slots once and caching the index.
+
+Slots are guarded by a seqlock: the writer bumps `seq` to an odd value,
+writes the fields, then bumps it back to even. A reader retries while `seq`
+is odd or changed during its read, so it never returns a torn (ltp, time)
+pair. The retries are capped (READ_RETRIES): a slot left odd by a writer
+that died mid-write reads as None, and the trader falls back to the API.
+Only one process may write to a board.
+
+Every board carries a generation stamped by `create()`, and `close()` marks
+it closed. At most every RECHECK_INTERVAL seconds (or at once when the
+board was closed) a reader checks which board is currently registered
+under its name. When the streamer has recreated the board, the reader
+switches its mapping to the new generation.
+
+    board = LtpBoard.create()                   # streamer
+    board.write("13", 24510.5)
+
+    board = LtpBoard.attach()                   # trader
+    board.read("13")                            # (datetime, 24510.5) or None
+"""
+
+import threading
+import time
+from datetime import datetime
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+import pytz
+
+
+IST = pytz.timezone("Asia/Kolkata")
+
+DEFAULT_NAME = "ltp_board"
+DEFAULT_CAPACITY = 4096
+
+HEADER = np.dtype([("capacity", "<i8"), ("used", "<i8"), ("generation", "<u8"), ("closed", "<u8")])
+SLOT = np.dtype([("seq", "<u8"), ("token", "<i8"), ("ltp", "<f8"), ("updated_at", "<f8")])
+
+READ_RETRIES = 1000         # seqlock attempts before a read gives up (writer stuck mid-write)
+SPIN_RETRIES = 16           # attempts before the reader starts yielding the CPU
+RECHECK_INTERVAL = 1.0      # seconds between reader checks for a recreated board
+
+
+def _generation(shm):
+    return int(np.frombuffer(bytes(shm.buf[:HEADER.itemsize]), dtype=HEADER)["generation"][0])
+
+
+class LtpBoard:
+
+    def __init__(self, shm, owner=False):
+        self.owner = owner
+        self.name = shm.name
+        self._map(shm)
+
+        self._retired = []                  # replaced mappings (closed in close())
+        self._checked_at = time.monotonic()
+        self._recheck_lock = threading.Lock()
+
+        # Metrics
+        self.read_failures = 0              # reads given up on a slot stuck mid-write
+        self.reattaches = 0
+
+    def _map(self, shm):
+        header = np.ndarray(1, dtype=HEADER, buffer=shm.buf)
+        capacity = int(header["capacity"][0])
+        slots = np.ndarray(capacity, dtype=SLOT, buffer=shm.buf, offset=HEADER.itemsize)
+        self.shm = shm
+        self.capacity = capacity
+        self.generation = int(header["generation"][0])
+
+        # (header, seq, token, ltp, updated_at, slot cache) swapped as one
+        # tuple, so a read never mixes two mappings; the column views make
+        # the write path one scalar store per field
+        self._view = (header, slots["seq"], slots["token"], slots["ltp"], slots["updated_at"], {})
+
+    @classmethod
+    def create(cls, name=DEFAULT_NAME, capacity=DEFAULT_CAPACITY):
+        """Creates the board (writer side), replacing a stale one left by a crashed writer."""
+        size = HEADER.itemsize + capacity * SLOT.itemsize
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+
+        shm.buf[:size] = bytes(size)
+        header = np.ndarray(1, dtype=HEADER, buffer=shm.buf)
+        header["capacity"] = capacity
+        header["used"] = 0
+        header["generation"] = time.time_ns()
+        del header
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name=DEFAULT_NAME):
+        """Opens an existing board (reader side). Raises FileNotFoundError if there is none."""
+        shm = shared_memory.SharedMemory(name=name)
+        # Python < 3.13 registers attached segments too and would unlink the
+        # writer's board when this process exits
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return cls(shm)
+
+    def close(self):
+        if self.owner:
+            self._view[0]["closed"] = 1     # readers stop trusting this board at once
+        self._view = None
+        for shm in self._retired:
+            shm.close()
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    def __len__(self):
+        return int(self._view[0]["used"][0])
+
+    # -------------------------------------------------------
+    # Writer
+    # -------------------------------------------------------
+
+    def _claim(self, token):
+        header, _, token_column, _, _, slot_of = self._view
+        used = int(header["used"][0])
+        if used >= self.capacity:
+            raise ValueError(f"LTP board is full ({self.capacity} slots)")
+        token_column[used] = token
+        header["used"] = used + 1           # publish after the token is in place
+        slot_of[token] = used
+        return used
+
+    def write(self, token, ltp, updated_at=None):
+        token = int(token)
+        _, seq_column, _, ltp_column, updated_column, slot_of = self._view
+        slot = slot_of.get(token)
+        if slot is None:
+            slot = self._claim(token)
+
+        seq = seq_column[slot]
+        seq_column[slot] = seq + 1          # odd: write in progress
+        ltp_column[slot] = ltp
+        updated_column[slot] = time.time() if updated_at is None else updated_at
+        seq_column[slot] = seq + 2
+
+    # -------------------------------------------------------
+    # Reader
+    # -------------------------------------------------------
+
+    def _reattach_if_replaced(self):
+        """Maps the board now registered under our name if it is a new generation."""
+        try:
+            shm = shared_memory.SharedMemory(name=self.name)
+        except FileNotFoundError:
+            return False                    # writer gone and not restarted yet
+        resource_tracker.unregister(shm._name, "shared_memory")
+        if _generation(shm) == self.generation:
+            shm.close()
+            return False
+        # In-flight reads may still use the old views, so the old mapping is only closed in close()
+        self._retired.append(self.shm)
+        self._map(shm)
+        self.reattaches += 1
+        return True
+
+    def _check_current(self):
+        now = time.monotonic()
+        if now - self._checked_at < RECHECK_INTERVAL and not self._view[0]["closed"][0]:
+            return
+        if not self._recheck_lock.acquire(blocking=False):
+            return                          # another reader thread is checking
+        try:
+            self._checked_at = now
+            self._reattach_if_replaced()
+        finally:
+            self._recheck_lock.release()
+
+    @staticmethod
+    def _find(view, token):
+        header, _, token_column, _, _, slot_of = view
+        used = int(header["used"][0])
+        for slot in range(len(slot_of), used):
+            slot_of[int(token_column[slot])] = slot
+        return slot_of.get(token)
+
+    def read_raw(self, token, max_age=None):
+        """(updated_at epoch seconds, ltp) of `token`, or None if absent, stale, closed or unreadable."""
+        if not self.owner:
+            self._check_current()
+        view = self._view
+        header, seq_column, _, ltp_column, updated_column, slot_of = view
+        if header["closed"][0]:
+            return None
+
+        token = int(token)
+        slot = slot_of.get(token)
+        if slot is None:
+            slot = self._find(view, token)
+            if slot is None:
+                return None
+
+        for attempt in range(READ_RETRIES):
+            before = seq_column[slot]
+            if not before & 1:
+                ltp = float(ltp_column[slot])
+                updated_at = float(updated_column[slot])
+                if seq_column[slot] == before:
+                    break
+            if attempt >= SPIN_RETRIES:
+                time.sleep(0)               # let a descheduled writer finish
+        else:
+            self.read_failures += 1
+            return None
+
+        if max_age is not None and time.time() - updated_at > max_age:
+            return None
+        return updated_at, ltp
+
+    def read(self, token, max_age=None):
+        """Same shape as ApiDatabaseClient.fetch_latest_ltp: (last_update, ltp), or None."""
+        quote = self.read_raw(token, max_age)
+        if quote is None:
+            return None
+        return datetime.fromtimestamp(quote[0], IST), quote[1]
@@ -1,23 +1,33 @@
 import json
+import logging
 import time
+import threading
 import requests
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
 from datetime import datetime
 from dhanhq import dhanhq, DhanContext
 import os
 from dotenv import load_dotenv
+
+from http_transport import LatencyHistogram
+from order_queue import OrderScheduler, PRIORITY_ENTRY, PRIORITY_EXIT, PRIORITY_KILL
+from order_updates import OrderStateTracker, OrderUpdateStream
+from trade_journal import TradeJournal
+from log_setup import setup_logging
 load_dotenv()
+
+logger = logging.getLogger(__name__)
 # --- Load credentials ---
 def load_credentials(path='creds.json'):
     with open(path, 'r') as file:
         return json.load(file)
 
-user_creds = load_credentials()
 user_ids = [2,11,12,13,14,]
 
 
 # API_BASE = os.getenv('API_URL') 
 # print(f"API_BASE: {API_BASE}")
-time.sleep(5)
 API_BASE = 'https://localhost:8000'  
 
 # --- Generate custom order ID ---
@@ -43,91 +53,311 @@ def post_to_close_trade_api(order_data: dict):
     except Exception as e:
         return {"error": str(e)}
 
-# --- Main Order Function ---
-def order_function(transaction_type: str, token: str, ltp: float = 0.0, option_symbol: str = 'BANKNIFTYXXX',position:str=None):
+# --- Call /trade/order-status API ---
+def post_order_status_to_trade_api(order_data: dict):
+    try:
+        res = requests.post(f"{API_BASE}/standalone/option/trade/order-status", json=order_data)
+        res.raise_for_status()
+        return res.json()
+    except Exception as e:
+        return {"error": str(e)}
+
+# --- Pooled broker clients ---
+# Keep-alive pool of each user's dhanhq session (requests.adapters.HTTPAdapter kwargs)
+BROKER_HTTP_POOL = {"pool_connections": 1, "pool_maxsize": 4}
+
+
+class BrokerClientPool:
+    """One dhanhq client per user, built once at startup instead of per order.
+
+    Each client keeps its own keep-alive session to the broker; `warm_up()`
+    checks every user's token and opens those connections before the first order.
     """
-    Places Dhan orders and logs trades to FastAPI backend.
 
-    Args:
-        transaction_type (str): 'entry' for BUY, anything else for SELL
-        token (str): Security token for the option
-        ltp (float): Last traded price to be saved in trade log
-        option_symbol (str): Option symbol like BANKNIFTY24AUG48000CE
+    def __init__(self, user_ids, creds, pool=BROKER_HTTP_POOL):
+        self.contexts = {}
+        self.clients = {}
+        for user_id in user_ids:
+            dhan_creds = creds[str(user_id)]['dhan_creds']
+            self.contexts[user_id] = DhanContext(dhan_creds['client_id'], dhan_creds['access_token'], pool=pool)
+            self.clients[user_id] = dhanhq(self.contexts[user_id])
 
-    Returns:
-        list: Response log for each user
+    def __getitem__(self, user_id):
+        return self.clients[user_id]
+
+    def warm_up(self, executor):
+        """Calls get_fund_limits for every user concurrently; returns {user_id: ok}."""
+        futures = {uid: executor.submit(dhan.get_fund_limits) for uid, dhan in self.clients.items()}
+        status = {}
+        for user_id, future in futures.items():
+            try:
+                res = future.result()
+                status[user_id] = res.get('status') == 'success'
+            except Exception as e:
+                res, status[user_id] = str(e), False
+            if not status[user_id]:
+                logger.warning(f"Broker warm-up failed for user {user_id}: {res}")
+        return status
+
+
+# Broker order limit per account (orders/second) and the burst sent back to back
+ORDER_RATE = float(os.getenv('ORDER_RATE', '10'))
+ORDER_BURST = int(os.getenv('ORDER_BURST', '10'))
+
+
+class OrderFanOut:
+    """Places one order per user concurrently and tracks per-user submit-to-ack latency.
+
+    Broker calls go through an OrderScheduler (per-account rate limit, exits
+    and kill-switch closes ahead of entries). Each trade API follow-up is
+    chained to its order's ack and only then takes an `executor` worker, so
+    no worker sits waiting on an order still queued behind the rate limit.
     """
-    results = []
 
-    for user_id in user_ids:
-        user_dict = user_creds[str(user_id)]
-        dhan_context = DhanContext(
-            user_dict['dhan_creds']['client_id'],
-            user_dict['dhan_creds']['access_token']
+    def __init__(self, broker_pool, max_workers=None, rate=ORDER_RATE, burst=ORDER_BURST):
+        self.broker_pool = broker_pool
+        self.scheduler = OrderScheduler(broker_pool.clients, rate=rate, burst=burst)
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers or len(broker_pool.clients) or 1,
+            thread_name_prefix="order"
         )
-        dhan = dhanhq(dhan_context)
+        self.latency = {user_id: LatencyHistogram() for user_id in broker_pool.clients}
+        self._lock = threading.Lock()
 
-        custom_order_id = generate_order_id(user_id, token, transaction_type)
+    def run(self, place, settle, user_ids, priority):
+        """Queues place(user_id, dhan) for every user, then settle(user_id, res, ack_ms) on the executor.
+
+        Returns the settle results in user order.
+        """
+        submitted = time.perf_counter()
+
+        def acked(user_id, dhan):
+            return place(user_id, dhan), (time.perf_counter() - submitted) * 1000
+
+        follow_ups = []
+        for user_id in user_ids:
+            order = self.scheduler.submit(user_id, priority, acked, user_id, self.broker_pool[user_id])
+            follow_up = Future()
+            order.add_done_callback(partial(self._chain, settle, user_id, submitted, follow_up))
+            follow_ups.append(follow_up)
+        return [future.result() for future in follow_ups]
+
+    def _chain(self, settle, user_id, submitted, follow_up, order):
+        """Done-callback of an order (runs on its dispatcher thread): hands settle to the executor."""
+        def run_settle():
+            try:
+                follow_up.set_result(self._settle(settle, user_id, order, submitted))
+            except Exception as e:
+                follow_up.set_exception(e)
 
         try:
-            # --- Place order with Dhan ---
-            res = dhan.place_order(
-                security_id=token,
-                exchange_segment=dhan.NSE_FNO,
-                transaction_type=dhan.BUY if transaction_type.lower() == 'entry' else dhan.SELL,
-                quantity=35,
-                order_type=dhan.MARKET,
-                product_type=dhan.INTRA,
-                price=0,
-            )
-
-            # --- Send to local trade API ---
-            now = datetime.now().isoformat()
-
-            if transaction_type.lower() == 'entry':
-                open_payload = {
-                    "order_id": custom_order_id,
-                    "option_symbol": option_symbol,
-                    "option_type": "CE" if "CE" == position.upper() else "PE",
-                    "trade_type": "BUY",
-                    "quantity": 35,
-                    "entry_ltp": ltp,
-                    "trade_entry_time": now
-                }
-                api_res = post_to_open_trade_api(open_payload)
-            else:
-                close_payload = {
-                    "user_id": user_id,
-                    "exit_ltp": ltp,
-                    "trade_exit_time": now,
-                }
-                print(close_payload)
-                api_res = post_to_close_trade_api(close_payload)
+            self.executor.submit(run_settle)
+        except Exception as e:
+            follow_up.set_exception(e)
 
-            log_entry = {
-                "user_id": user_id,
-                "status": "success",
-                "custom_order_id": custom_order_id,
-                "dhan_response": res,
-                "trade_api": api_res,
+    def _settle(self, settle, user_id, order, submitted):
+        try:
+            res, ack_ms = order.result()
+        except Exception as e:
+            self.record(user_id, (time.perf_counter() - submitted) * 1000, ok=False)
+            return settle(user_id, None, None, e)
+        self.record(user_id, ack_ms, ok=res.get('status') == 'success')
+        return settle(user_id, res, ack_ms, None)
+
+    def record(self, user_id, ack_ms, ok):
+        with self._lock:
+            self.latency[user_id].add(ack_ms, error=not ok)
+
+    def latency_stats(self):
+        """{user_id: {count, errors, p50_ms, p99_ms, max_ms}} of submit-to-ack times."""
+        with self._lock:
+            return {
+                user_id: {
+                    "count": h.total,
+                    "errors": h.errors,
+                    "p50_ms": h.percentile(50),
+                    "p99_ms": h.percentile(99),
+                    "max_ms": round(h.max_ms, 1),
+                }
+                for user_id, h in self.latency.items()
             }
 
-        except Exception as e:
-            log_entry = {
+
+# --- Order path, built by init() ---
+journal = None          # trade journal (written by a background thread)
+broker_pool = None
+order_fan_out = None
+status_executor = None  # order-status posts, kept off the order follow-up workers
+_init_lock = threading.Lock()
+
+
+def init(warm_up: bool = True):
+    """Builds the journal, broker clients and order queue, warms the broker
+    connections and opens the order-update stream.
+
+    Call once at startup, before the first order_function; importing this
+    module opens no connection. Later calls are no-ops.
+    """
+    global journal, broker_pool, order_fan_out, order_update_stream, status_executor
+    with _init_lock:
+        if order_fan_out is not None:
+            return
+        journal = TradeJournal(
+            os.getenv('JOURNAL_PATH', 'dhan_response.txt'),
+            fsync=os.getenv('JOURNAL_FSYNC', 'interval'),
+            max_bytes=int(os.getenv('JOURNAL_MAX_BYTES', '0')) or None,
+            rotate_daily=os.getenv('JOURNAL_ROTATE_DAILY', '1').lower() not in ('0', 'false', 'no'),
+        )
+        broker_pool = BrokerClientPool(user_ids, load_credentials())
+        fan_out = OrderFanOut(broker_pool)
+        if warm_up:
+            broker_pool.warm_up(fan_out.executor)
+        status_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="order-status")
+        if os.getenv('ORDER_UPDATES', '1').lower() not in ('0', 'false', 'no'):
+            order_update_stream = OrderUpdateStream(order_states, broker_pool.contexts).start()
+        order_fan_out = fan_out
+
+
+# --- Order state from the broker's order-update stream ---
+def publish_order_state(custom_order_id: str, state: dict):
+    """Forwards every fill / rejection / cancel to the trade API (off the stream thread) and the journal."""
+    payload = {
+        "order_id": custom_order_id,
+        "user_id": state["user_id"],
+        "broker_order_id": state["order_no"],
+        "status": state["status"],
+        "quantity": state["quantity"],
+        "filled_qty": state["filled_qty"],
+        "avg_price": state["avg_price"],
+        "reason": state["reason"],
+        "updated_at": datetime.fromtimestamp(state["updated_at"]).isoformat(),
+    }
+    status_executor.submit(post_order_status_to_trade_api, payload)
+    journal.write(dict(payload, event="order_state"))
+
+
+order_states = OrderStateTracker()
+order_states.subscribe(publish_order_state)
+order_update_stream = None      # started by init() unless ORDER_UPDATES=0
+
+
+# --- Per-user order ---
+def place_broker_order(dhan, transaction_type: str, token: str, tag: str = None) -> dict:
+    return dhan.place_order(
+        security_id=token,
+        exchange_segment=dhan.NSE_FNO,
+        transaction_type=dhan.BUY if transaction_type.lower() == 'entry' else dhan.SELL,
+        quantity=35,
+        order_type=dhan.MARKET,
+        product_type=dhan.INTRA,
+        price=0,
+        tag=tag,
+    )
+
+
+def settle_user_order(user_id: int, custom_order_id: str, res, ack_ms, error, transaction_type: str,
+                      ltp: float, option_symbol: str, position: str) -> dict:
+    if res is not None:
+        order_states.acknowledged(custom_order_id, res)
+    if error is not None:
+        return {
+            "user_id": user_id,
+            "status": "failed",
+            "custom_order_id": custom_order_id,
+            "error": str(error)
+        }
+
+    try:
+        # --- Send to local trade API ---
+        now = datetime.now().isoformat()
+
+        if transaction_type.lower() == 'entry':
+            open_payload = {
+                "order_id": custom_order_id,
+                "option_symbol": option_symbol,
+                "option_type": "CE" if "CE" == position.upper() else "PE",
+                "trade_type": "BUY",
+                "quantity": 35,
+                "entry_ltp": ltp,
+                "trade_entry_time": now
+            }
+            api_res = post_to_open_trade_api(open_payload)
+        else:
+            close_payload = {
                 "user_id": user_id,
-                "status": "failed",
-                "custom_order_id": custom_order_id,
-                "error": str(e)
+                "exit_ltp": ltp,
+                "trade_exit_time": now,
             }
+            logger.info(f"Closing trade for user {user_id}: {close_payload}")
+            api_res = post_to_close_trade_api(close_payload)
 
-        results.append(log_entry)
-        with open('dhan_response.txt', 'a') as f:
-            f.write(json.dumps(log_entry) + '\n')
+        return {
+            "user_id": user_id,
+            "status": "success",
+            "custom_order_id": custom_order_id,
+            "submit_to_ack_ms": round(ack_ms, 1),
+            "dhan_response": res,
+            "trade_api": api_res,
+        }
+
+    except Exception as e:
+        return {
+            "user_id": user_id,
+            "status": "failed",
+            "custom_order_id": custom_order_id,
+            "dhan_response": res,
+            "error": str(e)
+        }
+
+
+# --- Main Order Function ---
+def order_function(transaction_type: str, token: str, ltp: float = 0.0, option_symbol: str = 'BANKNIFTYXXX',position:str=None,
+                   priority: int = None):
+    """
+    Places Dhan orders for all users concurrently and logs trades to FastAPI backend.
+
+    Args:
+        transaction_type (str): 'entry' for BUY, anything else for SELL
+        token (str): Security token for the option
+        ltp (float): Last traded price to be saved in trade log
+        option_symbol (str): Option symbol like BANKNIFTY24AUG48000CE
+        priority (int): PRIORITY_KILL for kill-switch / forced closes; defaults to
+            PRIORITY_ENTRY for entries and PRIORITY_EXIT otherwise
+
+    Returns:
+        list: Response log for each user
+    """
+    if order_fan_out is None:
+        raise RuntimeError("order_executor.init() must be called before placing orders")
+    if priority is None:
+        priority = PRIORITY_ENTRY if transaction_type.lower() == 'entry' else PRIORITY_EXIT
+    order_ids = {user_id: generate_order_id(user_id, token, transaction_type) for user_id in user_ids}
+    tags = {user_id: order_states.expect(order_ids[user_id], user_id) for user_id in user_ids}
+
+    results = order_fan_out.run(
+        lambda user_id, dhan: place_broker_order(dhan, transaction_type, token, tags[user_id]),
+        lambda user_id, res, ack_ms, error: settle_user_order(
+            user_id, order_ids[user_id], res, ack_ms, error, transaction_type, ltp, option_symbol, position
+        ),
+        user_ids,
+        priority
+    )
+
+    for log_entry in results:
+        journal.write(log_entry)
 
     return results
 
+def force_close(token: str, ltp: float = 0.0, option_symbol: str = 'BANKNIFTYXXX', position: str = None):
+    """Exit orders for a kill switch or forced close (e.g. 1:30 PM), sent in the kill
+    lane ahead of every queued strategy exit and entry."""
+    return order_function('exit', token, ltp, option_symbol, position, priority=PRIORITY_KILL)
+
+
 # --- Script Entry Point ---
 if __name__ == '__main__':
+    setup_logging()
+    init()
     response = order_function(
         transaction_type='entry',
         token='54033',
@@ -136,3 +366,5 @@ if __name__ == '__main__':
         position='CE'
     )
     print(json.dumps(response, indent=2))
+    print(json.dumps(order_fan_out.latency_stats(), indent=2))
+    print(json.dumps(order_fan_out.scheduler.stats(), indent=2))
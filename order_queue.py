@@ -0,0 +1,187 @@
+"""
+Rate-limited, prioritized order queue
+
+Every broker account gets its own dispatcher thread, a priority queue and a
+token bucket sized to the broker's per-second order limit. Orders are sent
+in lane order, and FIFO within a lane:
+
+    PRIORITY_KILL   kill-switch / forced closes
+    PRIORITY_EXIT   strategy exits
+    PRIORITY_ENTRY  new entries
+
+so when several indices force-close at the same moment, their exits are
+never stuck behind an entry for another token, and a burst larger than the
+bucket is spread over time rather than rejected by the broker:
+
+    scheduler = OrderScheduler(user_ids, rate=10, burst=10)
+    future = scheduler.submit(user_id, PRIORITY_EXIT, dhan.place_order, **order)
+    res = future.result()
+
+`depth()` gives the queued orders per account and lane. `stats()` and
+`log_stats()` give the time from enqueue to dispatch for each lane.
+"""
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import Future
+
+from http_transport import LatencyHistogram
+
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_KILL = 0
+PRIORITY_EXIT = 1
+PRIORITY_ENTRY = 2
+
+LANES = {PRIORITY_KILL: "kill", PRIORITY_EXIT: "exit", PRIORITY_ENTRY: "entry"}
+
+
+class SchedulerStopped(RuntimeError):
+    """An order was submitted to, or still queued in, a stopped OrderScheduler."""
+
+
+class TokenBucket:
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self, now):
+        """Takes one token; returns 0, or the seconds to wait before one is available."""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class _AccountQueue:
+
+    def __init__(self, rate, burst):
+        self.bucket = TokenBucket(rate, burst)
+        self.heap = []
+        self.cond = threading.Condition()
+        self.thread = None
+
+
+class OrderScheduler:
+
+    def __init__(self, accounts, rate=10.0, burst=10):
+        self._seq = itertools.count()
+        self._queues = {account: _AccountQueue(rate, burst) for account in accounts}
+        self._waits = {lane: LatencyHistogram() for lane in LANES}
+        self._stats_lock = threading.Lock()
+        self._stop = threading.Event()
+
+        for account, queue in self._queues.items():
+            queue.thread = threading.Thread(
+                target=self._run, args=(queue,), name=f"orders-{account}", daemon=True
+            )
+            queue.thread.start()
+
+    def submit(self, account, priority, fn, *args, **kwargs):
+        """Queues fn(*args, **kwargs) for `account`; returns a Future of its result."""
+        if priority not in LANES:
+            raise ValueError(f"Unknown order priority {priority}")
+        future = Future()
+        queue = self._queues[account]
+        with queue.cond:
+            if self._stop.is_set():
+                raise SchedulerStopped("Order scheduler is stopped")
+            heapq.heappush(
+                queue.heap,
+                (priority, next(self._seq), time.monotonic(), future, fn, args, kwargs)
+            )
+            queue.cond.notify()
+        return future
+
+    # -------------------------------------------------------
+    # Dispatcher threads
+    # -------------------------------------------------------
+
+    def _next(self, queue):
+        """Blocks until the head order may be sent under the bucket; pops it (None on stop)."""
+        with queue.cond:
+            while not self._stop.is_set():
+                if not queue.heap:
+                    queue.cond.wait()
+                    continue
+                wait = queue.bucket.take(time.monotonic())
+                if not wait:
+                    return heapq.heappop(queue.heap)
+                # A higher-priority order arriving meanwhile is picked up on wake
+                queue.cond.wait(wait)
+        return None
+
+    def _run(self, queue):
+        while True:
+            item = self._next(queue)
+            if item is None:
+                return
+            priority, _, enqueued, future, fn, args, kwargs = item
+            with self._stats_lock:
+                self._waits[priority].add((time.monotonic() - enqueued) * 1000)
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+
+    def stop(self):
+        """Stops the dispatchers; orders still queued fail with SchedulerStopped."""
+        self._stop.set()
+        for account, queue in self._queues.items():
+            with queue.cond:
+                pending, queue.heap = queue.heap, []
+                queue.cond.notify_all()
+            for item in pending:
+                future = item[3]
+                if future.set_running_or_notify_cancel():
+                    future.set_exception(SchedulerStopped(
+                        f"Order scheduler stopped before the order for {account} was sent"
+                    ))
+
+    # -------------------------------------------------------
+    # Stats
+    # -------------------------------------------------------
+
+    def depth(self):
+        """{account: {lane: queued orders}}."""
+        depth = {}
+        for account, queue in self._queues.items():
+            with queue.cond:
+                lanes = dict.fromkeys(LANES.values(), 0)
+                for item in queue.heap:
+                    lanes[LANES[item[0]]] += 1
+            depth[account] = lanes
+        return depth
+
+    def stats(self):
+        """{lane: {count, p50_ms, p99_ms, max_ms}} of enqueue-to-dispatch waits."""
+        with self._stats_lock:
+            return {
+                LANES[priority]: {
+                    "count": h.total,
+                    "p50_ms": h.percentile(50),
+                    "p99_ms": h.percentile(99),
+                    "max_ms": round(h.max_ms, 1),
+                }
+                for priority, h in self._waits.items()
+            }
+
+    def log_stats(self):
+        queued = {account: sum(lanes.values()) for account, lanes in self.depth().items()}
+        logger.info(f"Order queue depth: {queued}")
+        for lane, s in self.stats().items():
+            logger.info(
+                f"Order queue {lane}: n={s['count']} wait p50<={s['p50_ms']}ms "
+                f"p99<={s['p99_ms']}ms max={s['max_ms']}ms"
+            )
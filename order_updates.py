@@ -0,0 +1,281 @@
+"""
+Order-state tracking from the broker's order-update stream
+
+The broker pushes every order event (accepted, partly traded, traded,
+rejected, cancelled) on its order-update websocket. `OrderUpdateStream` keeps
+one socket per account open on a background event loop. It feeds the events
+to an `OrderStateTracker`, which maps `custom_order_id` to the latest order
+state and calls its listeners on every change, so no order status has to be
+polled:
+
+    tracker = OrderStateTracker()
+    tracker.subscribe(lambda custom_order_id, state: ...)
+    OrderUpdateStream(tracker, {user_id: dhan_context, ...}).start()
+
+    tag = tracker.expect(custom_order_id, user_id)   # before placing
+    dhan.place_order(..., tag=tag)
+    tracker.acknowledged(custom_order_id, res)        # after the REST ack
+
+Orders are matched by correlation id (`tag`), so an update that arrives
+before the REST ack still resolves; the broker order number is used as a
+fallback. Orders are dropped `retention` seconds after reaching a terminal
+status, and after `stale_after` seconds if they never do. Set ORDER_UPDATE_WSS to point the stream at a local stand-in
+(stand_in_server.py serves one at /broker/order-update).
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+import websockets
+
+
+logger = logging.getLogger(__name__)
+
+ORDER_UPDATE_WSS = "wss://api-order-update.dhan.co"
+
+TERMINAL_STATUSES = frozenset({"TRADED", "REJECTED", "CANCELLED", "EXPIRED"})
+
+
+def correlation_id(custom_order_id):
+    """Broker-safe tag for an order (the broker caps correlation ids at 25 characters)."""
+    return hashlib.blake2b(custom_order_id.encode(), digest_size=10).hexdigest()
+
+
+def _field(data, *names):
+    for name in names:
+        if data.get(name) not in (None, ""):
+            return data[name]
+    return None
+
+
+class OrderStateTracker:
+
+    def __init__(self, retention=300.0, stale_after=86400.0):
+        self.retention = retention
+        self.stale_after = stale_after
+
+        self._orders = {}           # custom_order_id -> state dict
+        self._by_tag = {}           # correlation id -> custom_order_id
+        self._by_order_no = {}      # broker order number -> custom_order_id
+        self._finished = deque()    # (terminal at, custom_order_id), oldest first
+        self._next_sweep = 0.0
+        self._listeners = []
+        self._cond = threading.Condition()
+
+        # Metrics
+        self.updates = 0
+        self.unmatched = 0
+        self.pruned = 0
+
+    def subscribe(self, listener):
+        """listener(custom_order_id, state) runs on the stream thread, outside the
+        tracker's lock (it may query the tracker); keep it short."""
+        with self._cond:
+            self._listeners = self._listeners + [listener]
+
+    # -------------------------------------------------------
+    # Order placement
+    # -------------------------------------------------------
+
+    def expect(self, custom_order_id, user_id):
+        """Registers an order about to be placed; returns the tag to place it with."""
+        tag = correlation_id(custom_order_id)
+        with self._cond:
+            self._prune(time.time())
+            self._by_tag[tag] = custom_order_id
+            self._orders[custom_order_id] = {
+                "custom_order_id": custom_order_id,
+                "user_id": user_id,
+                "order_no": None,
+                "status": "SUBMITTED",
+                "quantity": None,
+                "filled_qty": 0,
+                "avg_price": None,
+                "reason": None,
+                "submitted_at": time.time(),
+                "updated_at": time.time(),
+            }
+        return tag
+
+    def acknowledged(self, custom_order_id, res):
+        """Records the broker order number from place_order's response."""
+        data = res.get("data") if isinstance(res, dict) else None
+        order_no = str(_field(data, "orderId", "orderNo")) if isinstance(data, dict) else None
+        snapshot = None
+        with self._cond:
+            state = self._orders.get(custom_order_id)
+            if state is None:
+                return
+            if order_no and order_no != "None":
+                state["order_no"] = order_no
+                self._by_order_no[order_no] = custom_order_id
+            if res.get("status") != "success" and state["status"] == "SUBMITTED":
+                snapshot = self._update(state, {"status": "REJECTED", "reason": str(res.get("remarks") or res)})
+        self._notify(snapshot)
+
+    # -------------------------------------------------------
+    # Stream
+    # -------------------------------------------------------
+
+    def on_update(self, data):
+        """Applies one order_alert payload from the broker."""
+        tag = _field(data, "CorrelationId", "correlationId")
+        order_no = _field(data, "OrderNo", "orderNo")
+        with self._cond:
+            self.updates += 1
+            custom_order_id = self._by_tag.get(tag) or self._by_order_no.get(str(order_no))
+            state = self._orders.get(custom_order_id)
+            if state is None:
+                self.unmatched += 1
+                return
+            if order_no is not None and state["order_no"] is None:
+                state["order_no"] = str(order_no)
+                self._by_order_no[str(order_no)] = custom_order_id
+            changes = {
+                "status": str(_field(data, "Status", "status") or state["status"]).upper(),
+                "quantity": _field(data, "Quantity", "quantity"),
+                "filled_qty": _field(data, "TradedQty", "tradedQty", "filledQty"),
+                "avg_price": _field(data, "AvgTradedPrice", "TradedPrice", "averageTradedPrice"),
+                "reason": _field(data, "ReasonDescription", "Remarks", "omsErrorDescription"),
+            }
+            snapshot = self._update(state, {k: v for k, v in changes.items() if v is not None})
+        self._notify(snapshot)
+
+    def _update(self, state, changes):
+        """Applies `changes` (caller holds the lock); returns a snapshot for _notify, or None."""
+        changed = {k: v for k, v in changes.items() if state.get(k) != v}
+        if not changed:
+            return None
+        now = time.time()
+        state.update(changed, updated_at=now)
+        if state["status"] in TERMINAL_STATUSES:
+            # Late fields (e.g. the average price) push the expiry back
+            self._finished.append((now, state["custom_order_id"]))
+        self._cond.notify_all()
+        return dict(state)
+
+    def _notify(self, snapshot):
+        """Calls the listeners; must run without the lock held."""
+        if snapshot is None:
+            return
+        for listener in self._listeners:
+            try:
+                listener(snapshot["custom_order_id"], snapshot)
+            except Exception as e:
+                logger.error(f"Order update listener failed for {snapshot['custom_order_id']}: {e}")
+
+    def _prune(self, now):
+        """Drops orders terminal for `retention` seconds, and every `stale_after` old order
+        once a minute (caller holds the lock)."""
+        while self._finished and now - self._finished[0][0] >= self.retention:
+            _, custom_order_id = self._finished.popleft()
+            state = self._orders.get(custom_order_id)
+            # Skip orders already forgotten, re-registered or updated since
+            if state is not None and state["status"] in TERMINAL_STATUSES \
+                    and now - state["updated_at"] >= self.retention:
+                self._drop(custom_order_id)
+        if now >= self._next_sweep:
+            self._next_sweep = now + 60
+            for custom_order_id, state in list(self._orders.items()):
+                if now - state["submitted_at"] >= self.stale_after:
+                    self._drop(custom_order_id)
+
+    def _drop(self, custom_order_id):
+        state = self._orders.pop(custom_order_id, None)
+        if state is not None:
+            self._by_tag.pop(correlation_id(custom_order_id), None)
+            self._by_order_no.pop(state["order_no"], None)
+            self.pruned += 1
+
+    # -------------------------------------------------------
+    # Readers
+    # -------------------------------------------------------
+
+    def get(self, custom_order_id):
+        with self._cond:
+            state = self._orders.get(custom_order_id)
+            return dict(state) if state is not None else None
+
+    def wait(self, custom_order_id, statuses=TERMINAL_STATUSES, timeout=None):
+        """Blocks until the order reaches one of `statuses`; returns its state (None on timeout)."""
+        with self._cond:
+            done = self._cond.wait_for(
+                lambda: self._orders.get(custom_order_id, {}).get("status") in statuses, timeout
+            )
+            return dict(self._orders[custom_order_id]) if done else None
+
+    def forget(self, custom_order_id):
+        with self._cond:
+            state = self._orders.pop(custom_order_id, None)
+            if state is not None:
+                self._by_tag.pop(correlation_id(custom_order_id), None)
+                self._by_order_no.pop(state["order_no"], None)
+
+    def __len__(self):
+        with self._cond:
+            return len(self._orders)
+
+
+class OrderUpdateStream:
+    """One order-update websocket per account on a background event loop, reconnecting on drops."""
+
+    def __init__(self, tracker, contexts, url=None, reconnect_delay=1.0, max_reconnect_delay=30.0):
+        self.tracker = tracker
+        self.contexts = contexts                # {user_id: DhanContext}
+        self.url = url or os.getenv("ORDER_UPDATE_WSS", ORDER_UPDATE_WSS)
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+
+        self.connected = {user_id: threading.Event() for user_id in contexts}
+        self._loop = None
+        self._thread = None
+
+    async def _listen(self, user_id, context):
+        delay = self.reconnect_delay
+        while True:
+            try:
+                async with websockets.connect(self.url) as ws:
+                    await ws.send(json.dumps({
+                        "LoginReq": {
+                            "MsgCode": 42,
+                            "ClientId": str(context.get_client_id()),
+                            "Token": str(context.get_access_token())
+                        },
+                        "UserType": "SELF"
+                    }))
+                    self.connected[user_id].set()
+                    delay = self.reconnect_delay
+                    logger.info(f"Order-update stream connected for user {user_id}")
+                    async for message in ws:
+                        update = json.loads(message)
+                        if update.get("Type") == "order_alert":
+                            self.tracker.on_update(update.get("Data", {}))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Order-update stream for user {user_id} dropped: {e}; reconnecting in {delay}s")
+            self.connected[user_id].clear()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        for user_id, context in self.contexts.items():
+            self._loop.create_task(self._listen(user_id, context))
+        self._loop.run_forever()
+
+    def start(self):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name="order-updates", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
@@ -0,0 +1,135 @@
+"""
+Stop-loss / target sync
+
+Keeps the SL/TP of every open position in a local cache so the trading loop
+stops round-tripping to the API on every iteration:
+
+- `get()` serves the cached values until they are `ttl` seconds old, then
+  revalidates with a conditional GET (If-None-Match on the last ETag). A 304
+  just restarts the TTL. The trading loop reads `get()` on every iteration,
+  so an admin-side edit reaches it within about `ttl` seconds plus one loop
+  iteration; that is the only bound, there is no push notification.
+- `set()` writes to the API only when the values differ from what the server
+  is known to hold.
+"""
+
+import logging
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+
+def _same(a, b):
+    if a is None or b is None:
+        return a is b
+    return abs(float(a) - float(b)) < 1e-9
+
+
+class _Entry:
+    __slots__ = ("stop_loss", "target", "etag", "fetched_at")
+
+    def __init__(self, stop_loss, target, etag=None, fetched_at=0.0):
+        self.stop_loss = stop_loss
+        self.target = target
+        self.etag = etag
+        self.fetched_at = fetched_at
+
+
+class StopLossTargetSync:
+
+    def __init__(self, api_client, ttl=3.0):
+        self.api = api_client
+        self.ttl = ttl
+        self._entries = {}                  # unique_id -> _Entry (server's last known values)
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.fetches = 0
+        self.not_modified = 0
+        self.writes = 0
+        self.skipped_writes = 0
+        self.external_changes = 0
+
+    def track(self, unique_id, stop_loss, target):
+        """Starts caching a position whose SL/TP were just sent with its entry signal."""
+        with self._lock:
+            self._entries[unique_id] = _Entry(stop_loss, target, fetched_at=time.monotonic())
+
+    def forget(self, unique_id):
+        with self._lock:
+            self._entries.pop(unique_id, None)
+
+    # -------------------------------------------------------
+    # Read
+    # -------------------------------------------------------
+
+    def get(self, unique_id):
+        """(stop_loss, target) of `unique_id`, revalidated against the API once per TTL."""
+        with self._lock:
+            entry = self._entries.get(unique_id)
+        if entry is not None and time.monotonic() - entry.fetched_at < self.ttl:
+            return entry.stop_loss, entry.target
+        return self.refresh(unique_id)
+
+    def refresh(self, unique_id):
+        """Conditional GET of the server's SL/TP; logs values the trader did not write itself."""
+        with self._lock:
+            entry = self._entries.get(unique_id)
+        etag = entry.etag if entry is not None else None
+
+        values, etag = self.api.fetch_stop_loss_target(unique_id, etag=etag)
+        self.fetches += 1
+        now = time.monotonic()
+
+        changed = False
+        with self._lock:
+            entry = self._entries.get(unique_id)
+            if values is None:
+                # 304 Not Modified
+                self.not_modified += 1
+                if entry is None:
+                    return None, None   # forgotten while the request was in flight
+                entry.fetched_at = now
+            else:
+                stop_loss, target = values
+                if entry is None:
+                    entry = self._entries[unique_id] = _Entry(stop_loss, target)
+                elif not (_same(entry.stop_loss, stop_loss) and _same(entry.target, target)):
+                    changed = True
+                    self.external_changes += 1
+                    entry.stop_loss, entry.target = stop_loss, target
+                entry.etag = etag
+                entry.fetched_at = now
+            result = entry.stop_loss, entry.target
+
+        if changed:
+            logger.info(f"SL/TP changed on the server for {unique_id}: sl={result[0]} tp={result[1]}")
+        return result
+
+    # -------------------------------------------------------
+    # Write
+    # -------------------------------------------------------
+
+    def set(self, unique_id, stop_loss, target):
+        """Writes SL/TP to the API if they differ from the server's; returns True if written."""
+        with self._lock:
+            entry = self._entries.get(unique_id)
+            if entry is not None and _same(entry.stop_loss, stop_loss) and _same(entry.target, target):
+                self.skipped_writes += 1
+                return False
+
+        self.api.update_stop_loss_target(unique_id, stop_loss, target)
+        self.writes += 1
+
+        with self._lock:
+            entry = self._entries.get(unique_id)
+            if entry is None:
+                self._entries[unique_id] = _Entry(stop_loss, target, fetched_at=time.monotonic())
+            else:
+                # Our own write: the old ETag no longer matches, so the next
+                # refresh reloads without reporting it as an external change
+                entry.stop_loss, entry.target = stop_loss, target
+                entry.fetched_at = time.monotonic()
+        return True
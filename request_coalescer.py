@@ -0,0 +1,100 @@
+"""
+Cross-thread request coalescer
+
+Per-token threads each ask for "the LTP of token X" / "the current candle of
+token X". A RequestCoalescer collects those lookups for a short window and
+answers all of them with one bulk call; each caller gets its own slice back
+through a concurrent.futures.Future.
+
+    ltp = RequestCoalescer(api.fetch_latest_ltp_bulk, window=0.05, name="ltp")
+    last_update, price = ltp.get("13")          # blocks until the batch returns
+
+`fetch_bulk(keys)` must return {key: result}. A key missing from the result
+fails only that caller (KeyError); an exception from fetch_bulk fails every
+caller of the batch, so each thread's existing try/except still applies.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import Future
+
+
+logger = logging.getLogger(__name__)
+
+
+class RequestCoalescer:
+
+    def __init__(self, fetch_bulk, window=0.05, name="bulk"):
+        self.fetch_bulk = fetch_bulk
+        self.window = window
+        self.name = name
+
+        self._pending = {}                  # key -> [Future, ...]
+        self._cond = threading.Condition()
+        self._closed = False
+
+        # Metrics
+        self.batches = 0
+        self.requests = 0
+
+        self._thread = threading.Thread(target=self._dispatch_loop, name=f"coalescer-{name}", daemon=True)
+        self._thread.start()
+
+    def submit(self, key):
+        """Future resolving to this key's slice of the next bulk response."""
+        future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError(f"{self.name} coalescer is closed")
+            self._pending.setdefault(key, []).append(future)
+            self.requests += 1
+            self._cond.notify()
+        return future
+
+    def get(self, key, timeout=None):
+        return self.submit(key).result(timeout)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+
+    def _dispatch_loop(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if self._closed and not self._pending:
+                    return
+
+            # Let the other threads' lookups for this interval arrive
+            time.sleep(self.window)
+
+            with self._cond:
+                batch, self._pending = self._pending, {}
+            self._dispatch(batch)
+
+    def _dispatch(self, batch):
+        self.batches += 1
+        started = time.perf_counter()
+        try:
+            results = self.fetch_bulk(list(batch))
+        except Exception as e:
+            for futures in batch.values():
+                for future in futures:
+                    future.set_exception(e)
+            return
+
+        for key, futures in batch.items():
+            for future in futures:
+                if key in results:
+                    future.set_result(results[key])
+                else:
+                    future.set_exception(KeyError(f"{self.name}: no result for {key!r}"))
+
+        logger.debug(
+            "%s batch: %d keys, %d callers, %.1f ms",
+            self.name, len(batch), sum(map(len, batch.values())), (time.perf_counter() - started) * 1000
+        )
@@ -4,39 +4,74 @@ from pathlib import Path
 # ---------- CONFIG ----------
 CSV_FILE = "historical_data_202601091034.csv"
 TIMESTAMP_COL = "timestamp"
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S.%f %z"
 OUTPUT_DIR = "split_output"
 DAY_SPLIT = [3, 2]  # <-- change pattern here
 # ----------------------------
 
-Path(OUTPUT_DIR).mkdir(exist_ok=True)
 
-# Read CSV
-df = pd.read_csv(CSV_FILE)
+def load_candles(csv_file=CSV_FILE, timestamp_col=TIMESTAMP_COL, timestamp_format=TIMESTAMP_FORMAT):
+    """Reads the CSV and adds a `trade_date` column used for day partitioning."""
+    df = pd.read_csv(csv_file)
 
-# Parse timestamp column
-df[TIMESTAMP_COL] = pd.to_datetime(
-    df[TIMESTAMP_COL],
-    format="%Y-%m-%d %H:%M:%S.%f %z"
-)
+    # Parse timestamp column
+    df[timestamp_col] = pd.to_datetime(df[timestamp_col], format=timestamp_format)
 
-# Extract date
-df["trade_date"] = df[TIMESTAMP_COL].dt.date
+    # Extract date
+    df["trade_date"] = df[timestamp_col].dt.date
+    return df
 
-# Get unique sorted dates
-unique_dates = sorted(df["trade_date"].unique())
 
-print(f"Total unique days: {len(unique_dates)}")
+def trading_days(df):
+    """Sorted unique trade dates of `df`."""
+    return sorted(df["trade_date"].unique())
 
-start = 0
-for idx, days_count in enumerate(DAY_SPLIT, start=1):
-    selected_dates = unique_dates[start:start + days_count]
-    start += days_count
 
-    split_df = df[df["trade_date"].isin(selected_dates)]
+def split_by_days(df, day_split):
+    """Consecutive chunks of `df` holding day_split[0], day_split[1], ... days."""
+    unique_dates = trading_days(df)
 
-    output_file = f"{OUTPUT_DIR}/output_part_{idx}.csv"
-    split_df.drop(columns=["trade_date"]).to_csv(output_file, index=False)
+    parts = []
+    start = 0
+    for days_count in day_split:
+        selected_dates = unique_dates[start:start + days_count]
+        start += days_count
+        parts.append((selected_dates, df[df["trade_date"].isin(selected_dates)]))
+    return parts
 
-    print(f"Created {output_file} with {len(selected_dates)} days")
 
-print("✅ Split completed")
+def rolling_day_windows(dates, train_days, test_days, step_days=None):
+    """Walk-forward windows over `dates`: [(train_dates, test_dates), ...].
+
+    The train window is followed directly by the test window; both roll
+    forward by `step_days` (default: test_days) until the test window no
+    longer fits.
+    """
+    step_days = step_days or test_days
+
+    windows = []
+    start = 0
+    while start + train_days + test_days <= len(dates):
+        train = dates[start:start + train_days]
+        test = dates[start + train_days:start + train_days + test_days]
+        windows.append((train, test))
+        start += step_days
+    return windows
+
+
+if __name__ == "__main__":
+
+    Path(OUTPUT_DIR).mkdir(exist_ok=True)
+
+    # Read CSV
+    df = load_candles()
+
+    print(f"Total unique days: {len(trading_days(df))}")
+
+    for idx, (selected_dates, split_df) in enumerate(split_by_days(df, DAY_SPLIT), start=1):
+        output_file = f"{OUTPUT_DIR}/output_part_{idx}.csv"
+        split_df.drop(columns=["trade_date"]).to_csv(output_file, index=False)
+
+        print(f"Created {output_file} with {len(selected_dates)} days")
+
+    print("✅ Split completed")
@@ -1,4 +1,5 @@
 import asyncio
+import logging
 import os
 import pandas as pd
 import aiohttp
@@ -7,6 +8,9 @@ from dhanhq import DhanContext, MarketFeed
 from collections import deque
 import time
 
+from ltp_board import LtpBoard
+from log_setup import setup_logging, RateLimitedLogger
+
 load_dotenv()
 
 BASE_URL = os.getenv("API_BASE_URL")
@@ -16,41 +20,72 @@ VERSION = "v2"
 
 # ===== CONFIG =====
 MAX_WORKERS = 20  # Reduced workers to avoid overwhelming API
-MAX_QUEUE_SIZE = 10000  # Prevent memory overflow
 RATE_LIMIT_SECONDS = 1.5  # Min time between updates for same token
+LTP_BOARD = os.getenv("LTP_BOARD")  # Shared-memory board name; unset = HTTP only
+LTP_BOARD_INDICES = os.getenv("LTP_BOARD_INDICES", "13,25,27,51,442")  # Index tokens also published to the board
+LOG_INTERVAL = 5.0  # Per-tick warnings: at most one per message every LOG_INTERVAL seconds
+
+logger = logging.getLogger("spws")
+tick_logger = RateLimitedLogger(logger, interval=LOG_INTERVAL)
 
 
 class HighPerformanceStreamer:
-    def __init__(self):
-        # Load strike data once
-        df = pd.read_excel(r"strike_data/Bank-Nifty.xlsx")
-        df["token"] = df["token"].astype(str)
-        self.token_symbol = dict(zip(df["token"], df["symbol"]))
+    def __init__(self, api_client=None, token_symbol=None):
+        # Load strike data once (token -> symbol)
+        if token_symbol is None:
+            df = pd.read_excel(r"strike_data/Bank-Nifty.xlsx")
+            df["token"] = df["token"].astype(str)
+            token_symbol = dict(zip(df["token"], df["symbol"]))
+        self.token_symbol = token_symbol
         
         # Create instruments list
         self.instruments = [
             (MarketFeed.NSE_FNO, token, MarketFeed.Ticker)
             for token in self.token_symbol.keys()
         ]
+
+        # Shared-memory LTP board read by the trader process (strikes + indices)
+        self.ltp_board = LtpBoard.create(LTP_BOARD) if LTP_BOARD else None
+        if self.ltp_board is not None:
+            self.instruments += [
+                (MarketFeed.IDX, token, MarketFeed.Ticker)
+                for token in LTP_BOARD_INDICES.split(",") if token
+            ]
         
         self.dhan_context = DhanContext(CLIENT_ID, ACCESS_TOKEN)
         self.last_ltp = {}
         self.last_sent_time = {}  # Track last send time per token
+
+        # Conflation: only the latest LTP per token waits to be sent, so the
+        # API always gets the freshest price and memory is bounded by the
+        # number of instruments. `dirty` (an insertion-ordered dict used as a
+        # set) holds tokens whose latest LTP differs from the last one sent;
+        # `held` tokens are in flight or inside RATE_LIMIT_SECONDS of their
+        # last attempt and rejoin `dirty` when released.
+        self.latest = {}          # token -> latest LTP
+        self.sent_ltp = {}        # token -> LTP last accepted by the API
+        self.dirty = {}
+        self.held = set()
+        self.dirty_event = asyncio.Event()
         
-        # High-performance queue
-        self.update_queue = asyncio.Queue(maxsize=MAX_QUEUE_SIZE)
-        
-        # Connection pool with optimizations
+        # Connection pool with optimizations; an AsyncApiDatabaseClient passed
+        # in (e.g. the one Main shares through BlockingApiClient) replaces it
         self.session = None
+        self.api = api_client
         
         # Metrics
         self.ticks_received = 0
         self.ticks_sent = 0
+        self.ticks_conflated = 0
         self.api_calls = 0
         self.last_metric_time = time.time()
     
     async def init_session(self):
         """Initialize aiohttp session with connection pooling"""
+        if self.api is not None:
+            await self.api.init_session()
+            return
+
         connector = aiohttp.TCPConnector(
             limit=100,  # Max 100 concurrent connections
             limit_per_host=50,
@@ -71,15 +106,10 @@ class HighPerformanceStreamer:
         )
     
     async def send_single(self, item):
-        """Send single update to API with per-token rate limiting"""
+        """Send single update to API; True if it was accepted"""
         token = item["token"]
         now = time.time()
         
-        # Check if we sent this token recently (within 1.5 seconds)
-        last_sent = self.last_sent_time.get(token, 0)
-        if now - last_sent < RATE_LIMIT_SECONDS:
-            return  # Skip - too soon for this token
-        
         try:
             payload = {
                 "token": token,
@@ -87,42 +117,73 @@ class HighPerformanceStreamer:
                 "symbol": item["symbol"]
             }
             
-            async with self.session.post(
-                f"{BASE_URL}/signals/strike-ltp",
-                json=payload
-            ) as resp:
-                if resp.status == 200:
-                    self.ticks_sent += 1
-                    self.api_calls += 1
-                    self.last_sent_time[token] = now  # Record send time
-                elif resp.status == 404:
-                    print(f"⚠️ API endpoint not found: {BASE_URL}/signals/strike-ltp")
-                elif resp.status >= 500:
-                    print(f"⚠️ Server error {resp.status}")
-                else:
-                    text = await resp.text()
-                    print(f"⚠️ API returned {resp.status}: {text[:100]}")
+            if self.api is not None:
+                status, text = await self.api.post_strike_ltp(**payload)
+            else:
+                async with self.session.post(
+                    f"{BASE_URL}/signals/strike-ltp",
+                    json=payload
+                ) as resp:
+                    status, text = resp.status, await resp.text()
+
+            if status == 200:
+                self.ticks_sent += 1
+                self.api_calls += 1
+                self.last_sent_time[token] = now  # Record send time
+                return True
+            elif status == 404:
+                tick_logger.warning("⚠️ API endpoint not found: %s/signals/strike-ltp", BASE_URL)
+            elif status >= 500:
+                tick_logger.warning("⚠️ Server error %s", status)
+            else:
+                tick_logger.warning("⚠️ API returned %s: %s", status, text[:100])
             
         except asyncio.TimeoutError:
-            print(f"⚠️ API timeout (>{5}s) - Check if {BASE_URL} is reachable")
+            tick_logger.warning("⚠️ API timeout (>%ss) - Check if %s is reachable", 5, BASE_URL)
         except aiohttp.ClientConnectorError as e:
-            print(f"⚠️ Cannot connect to {BASE_URL}: {e}")
+            tick_logger.warning("⚠️ Cannot connect to %s: %s", BASE_URL, e)
         except aiohttp.ClientError as e:
-            print(f"⚠️ Connection error: {e}")
+            tick_logger.warning("⚠️ Connection error: %s", e)
         except Exception as e:
-            print(f"⚠️ API error: {type(e).__name__}: {e}")
-    
+            tick_logger.warning("⚠️ API error: %s: %s", type(e).__name__, e)
+        return False
+
+    def mark_dirty(self, token):
+        """Queues `token` for sending unless it is held (in flight / rate-limited)"""
+        if token in self.held or token in self.dirty:
+            self.ticks_conflated += 1  # Folded into the pending send instead of queued
+            return
+        self.dirty[token] = None
+        self.dirty_event.set()
+
+    def release(self, token):
+        """End of a token's rate-limit window: send again if a newer LTP arrived meanwhile"""
+        self.held.discard(token)
+        if self.latest.get(token) != self.sent_ltp.get(token):
+            self.mark_dirty(token)
+
+    async def next_dirty(self):
+        while not self.dirty:
+            self.dirty_event.clear()
+            await self.dirty_event.wait()
+        token = next(iter(self.dirty))
+        del self.dirty[token]
+        return token
+
     async def api_worker(self):
-        """Worker that sends individual API calls"""
+        """Worker that sends the latest LTP of dirty tokens"""
+        loop = asyncio.get_running_loop()
         while True:
+            token = await self.next_dirty()
+            self.held.add(token)
+            ltp = self.latest[token]
             try:
-                item = await self.update_queue.get()
-                await self.send_single(item)
-                self.update_queue.task_done()
-                
+                if await self.send_single({"token": token, "ltp": ltp, "symbol": self.token_symbol[token]}):
+                    self.sent_ltp[token] = ltp
             except Exception as e:
-                print(f"⚠️ Worker error: {e}")
-                await asyncio.sleep(0.1)
+                tick_logger.warning("⚠️ Worker error: %s", e)
+            # Held until RATE_LIMIT_SECONDS after this attempt (failed sends retry then, with the latest LTP)
+            loop.call_later(RATE_LIMIT_SECONDS, self.release, token)
     
     async def process_tick(self, response):
         """Fast tick processing"""
@@ -134,6 +195,9 @@ class HighPerformanceStreamer:
         
         if ltp <= 0:
             return
+
+        if self.ltp_board is not None:
+            self.ltp_board.write(token, ltp)
         
         # DEDUP check
         if self.last_ltp.get(token) == ltp:
@@ -146,16 +210,10 @@ class HighPerformanceStreamer:
             return
         
         self.ticks_received += 1
-        
-        # Non-blocking queue put
-        try:
-            self.update_queue.put_nowait({
-                "token": token,
-                "ltp": ltp,
-                "symbol": symbol
-            })
-        except asyncio.QueueFull:
-            print("⚠️ Queue full - dropping tick")
+
+        # Conflate: overwrite the token's pending LTP instead of queueing the tick
+        self.latest[token] = ltp
+        self.mark_dirty(token)
     
     async def print_metrics(self):
         """Print performance metrics"""
@@ -169,17 +227,25 @@ class HighPerformanceStreamer:
             sent_per_sec = self.ticks_sent / elapsed if elapsed > 0 else 0
             api_per_sec = self.api_calls / elapsed if elapsed > 0 else 0
             
-            print(f"\n📊 METRICS (last 5s):")
-            print(f"   Ticks received: {self.ticks_received} ({ticks_per_sec:.0f}/s)")
-            print(f"   Ticks sent: {self.ticks_sent} ({sent_per_sec:.0f}/s)")
-            print(f"   API calls: {self.api_calls} ({api_per_sec:.1f}/s)")
-            print(f"   Queue size: {self.update_queue.qsize()}")
-            print(f"   Dedup cache: {len(self.last_ltp)}")
-            print(f"   Rate limit cache: {len(self.last_sent_time)}")
+            logger.info(
+                "\n📊 METRICS (last 5s):\n"
+                "   Ticks received: %d (%.0f/s)\n"
+                "   Ticks sent: %d (%.0f/s)\n"
+                "   API calls: %d (%.1f/s)\n"
+                "   Conflated: %d\n"
+                "   Dirty tokens: %d (held: %d)\n"
+                "   Dedup cache: %d\n"
+                "   Rate limit cache: %d",
+                self.ticks_received, ticks_per_sec, self.ticks_sent, sent_per_sec,
+                self.api_calls, api_per_sec, self.ticks_conflated,
+                len(self.dirty), len(self.held),
+                len(self.last_ltp), len(self.last_sent_time)
+            )
             
             # Reset counters
             self.ticks_received = 0
             self.ticks_sent = 0
+            self.ticks_conflated = 0
             self.api_calls = 0
             self.last_metric_time = now
     
@@ -191,9 +257,9 @@ class HighPerformanceStreamer:
         
         try:
             await data.connect()
-            print("✅ WebSocket connected")
-            print(f"📈 Monitoring {len(self.instruments)} instruments")
-            print(f"⚙️ Workers: {MAX_WORKERS}")
+            logger.info("✅ WebSocket connected")
+            logger.info("📈 Monitoring %d instruments", len(self.instruments))
+            logger.info("⚙️ Workers: %d", MAX_WORKERS)
             
             # Start API workers
             workers = [
@@ -210,23 +276,28 @@ class HighPerformanceStreamer:
                 await self.process_tick(response)
             
         finally:
-            await self.session.close()
+            if self.session is not None:
+                await self.session.close()
             await data.disconnect()
-            print("🔌 Stream closed")
+            if self.ltp_board is not None:
+                self.ltp_board.close()
+            logger.info("🔌 Stream closed")
 
 
 def start_strike_ltp_stream():
     """Entry point"""
+    setup_logging()
     streamer = HighPerformanceStreamer()
     
     try:
         asyncio.run(streamer.run())
     except KeyboardInterrupt:
-        print("\n🛑 Stream stopped")
+        logger.info("\n🛑 Stream stopped")
 
 
 if __name__ == "__main__":
+    setup_logging()
     try:
         start_strike_ltp_stream()
     except KeyboardInterrupt:
-        print("\n🛑 Stopping stream...")
\ No newline at end of file
+        logger.info("\n🛑 Stopping stream...")
\ No newline at end of file
@@ -0,0 +1,316 @@
+"""
+Local stand-in for the DB API
+
+Serves the market-data endpoints Main.ApiDatabaseClient polls from a synthetic
+random walk per token, including the bulk endpoints used by the request
+coalescer, plus the stop-loss/target endpoints (with ETags) and the admin
+control flags (POST /db/_control sets them), so the trader can be exercised
+end to end without the real backend.
+
+It also stands in for the broker's order-update websocket at
+/broker/order-update: POST /broker/_order-update with an order_alert `Data`
+payload (and optionally its `ClientId`) to push it to the logged-in sockets.
+
+    ORDER_UPDATE_WSS=ws://localhost:8000/broker/order-update python order_executor.py
+
+    python stand_in_server.py --port 8000
+    API_BASE_URL=http://localhost:8000/db REQUEST_COALESCE_WINDOW=0.05 python Main.py
+
+Candles are 3-min buckets of the wall clock in IST; the current candle is
+the one still forming. Closed candles are pushed on the SSE stream
+/db/stream/candles. Request counts per path are exposed at /db/_stats.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+from collections import Counter
+from datetime import datetime, timedelta
+
+import pytz
+from aiohttp import web
+
+
+IST = pytz.timezone("Asia/Kolkata")
+
+CANDLE = timedelta(minutes=3)
+
+START_PRICES = {"13": 24000.0, "25": 52000.0, "27": 23500.0, "51": 80000.0, "442": 12500.0}
+
+
+class SyntheticMarket:
+    """Random-walk LTP per token, rolled into candles on demand.
+
+    Every candle that closes is passed to the `on_close(token, candle)`
+    callbacks (used by the SSE candle stream).
+    """
+
+    def __init__(self, seed=0, candle=CANDLE):
+        self.rng = random.Random(seed)
+        self.candle = candle
+        self.ltp = {}
+        self.candles = {}   # token -> {start: [open, high, low, close]}
+        self.on_close = []
+
+    def _bucket(self, now):
+        midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        return midnight + ((now - midnight) // self.candle) * self.candle
+
+    @staticmethod
+    def _candle_dict(start, c):
+        return {"start_time": start.isoformat(), "open": c[0], "high": c[1], "low": c[2], "close": c[3]}
+
+    def tick(self, token, now=None):
+        token = str(token)
+        now = now or datetime.now(IST)
+
+        price = self.ltp.get(token, START_PRICES.get(token, 10000.0))
+        price = round(price + self.rng.gauss(0, price * 0.0002), 2)
+        self.ltp[token] = price
+
+        start = self._bucket(now)
+        candles = self.candles.setdefault(token, {})
+        candle = candles.get(start)
+        if candle is None:
+            if candles:
+                closed_start = max(candles)
+                for callback in self.on_close:
+                    callback(token, self._candle_dict(closed_start, candles[closed_start]))
+            candles[start] = [price, price, price, price]
+        else:
+            candle[1] = max(candle[1], price)
+            candle[2] = min(candle[2], price)
+            candle[3] = price
+        return now, price
+
+    def current_candle(self, token):
+        self.tick(token)
+        return self._candle_dict(*max(self.candles[str(token)].items()))
+
+    def history(self, token, since=None):
+        self.tick(token)
+        return [
+            self._candle_dict(start, c)
+            for start, c in sorted(self.candles[str(token)].items())
+            if since is None or start >= since
+        ]
+
+
+def create_app(market=None, tick_interval=1.0):
+    market = market or SyntheticMarket()
+    stats = Counter()
+    sl_tp = {}          # unique_id -> {"stop_loss", "target", "version"}
+    strike_ltps = {}    # strike token -> last payload posted by spws
+    control = {"kill": {}, "strike_close": {}, "version": 0, "changed": asyncio.Condition()}
+
+    @web.middleware
+    async def count_requests(request, handler):
+        stats[request.path] += 1
+        return await handler(request)
+
+    def tokens_param(request, name):
+        return [t for t in request.query.get(name, "").split(",") if t]
+
+    async def nifty_tokens(request):
+        return web.json_response({"tokens": list(START_PRICES)})
+
+    async def ltp(request):
+        now, price = market.tick(request.query["stock_token"])
+        return web.json_response({"data": {"last_update": now.isoformat(), "ltp": price}})
+
+    async def ltp_bulk(request):
+        data = {}
+        for token in tokens_param(request, "stock_tokens"):
+            now, price = market.tick(token)
+            data[token] = {"last_update": now.isoformat(), "ltp": price}
+        return web.json_response({"status": "success", "data": data})
+
+    async def ohlc(request):
+        return web.json_response({"status": "success", "data": market.current_candle(request.query["token"])})
+
+    async def ohlc_bulk(request):
+        data = {token: market.current_candle(token) for token in tokens_param(request, "tokens")}
+        return web.json_response({"status": "success", "data": data})
+
+    async def historical(request):
+        since = request.query.get("since")
+        since = datetime.fromisoformat(since) if since else None
+        return web.json_response({"data": market.history(request.query["token"], since)})
+
+    async def get_sl_tp(request):
+        """SL/TP of a signal, with an ETag so pollers can revalidate cheaply."""
+        levels = sl_tp.get(request.match_info["unique_id"])
+        if levels is None:
+            raise web.HTTPNotFound()
+        etag = f'"{levels["version"]}"'
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+        return web.json_response(
+            {"stop_loss": levels["stop_loss"], "target": levels["target"]}, headers={"ETag": etag}
+        )
+
+    async def update_sl_tp(request):
+        levels = sl_tp.setdefault(request.query["unique_id"], {"stop_loss": None, "target": None, "version": 0})
+        for field in ("stop_loss", "target"):
+            if field in request.query:
+                levels[field] = float(request.query[field])
+        levels["version"] += 1
+        return web.json_response({"status": "success"})
+
+    async def kill_trade_signal(request):
+        token = str((await request.json())["token"])
+        return web.json_response({"kill": control["kill"].get(token, False)})
+
+    async def strike_close_signal(request):
+        return web.json_response({"data": control["strike_close"].get(request.match_info["unique_id"], False)})
+
+    async def control_flags(request):
+        """All flags in one call; with `since` = current version, held up to `wait` s until one changes."""
+        body = await request.json()
+        since, wait = body.get("since"), float(body.get("wait") or 0)
+        if since is not None and since == control["version"] and wait > 0:
+            async with control["changed"]:
+                try:
+                    await asyncio.wait_for(
+                        control["changed"].wait_for(lambda: control["version"] != since), timeout=wait
+                    )
+                except asyncio.TimeoutError:
+                    pass
+        return web.json_response({
+            "kill": {t: control["kill"].get(str(t), False) for t in body.get("tokens", [])},
+            "strike_close": {u: control["strike_close"].get(u, False) for u in body.get("unique_ids", [])},
+            "version": control["version"],
+        })
+
+    async def set_control(request):
+        """Test hook: {"kill": {token: bool}, "strike_close": {unique_id: bool}}."""
+        body = await request.json()
+        for name in ("kill", "strike_close"):
+            control[name].update({str(k): bool(v) for k, v in body.get(name, {}).items()})
+        async with control["changed"]:
+            control["version"] += 1
+            control["changed"].notify_all()
+        return web.json_response({"version": control["version"]})
+
+    async def strike_ltp(request):
+        body = await request.json()
+        strike_ltps[str(body["token"])] = body
+        return web.json_response({"status": "success"})
+
+    async def order_update_feed(request):
+        """Broker order-update websocket: expects the LoginReq, then pushes order_alert messages."""
+        ws = web.WebSocketResponse(heartbeat=15)
+        await ws.prepare(request)
+        login = await ws.receive_json()
+        client = (str(login.get("LoginReq", {}).get("ClientId")), ws)
+        request.app["order_sockets"].append(client)
+        try:
+            async for _ in ws:
+                pass
+        finally:
+            request.app["order_sockets"].remove(client)
+        return ws
+
+    async def push_order_update(request):
+        """Test hook: {"ClientId": ..., "Data": {...}} -> order_alert to that client's sockets."""
+        body = await request.json()
+        message = {"Type": "order_alert", "Data": body["Data"]}
+        client_id = body.get("ClientId")
+        sent = 0
+        for client, ws in list(request.app["order_sockets"]):
+            if client_id is None or client == str(client_id):
+                await ws.send_json(message)
+                sent += 1
+        return web.json_response({"sent": sent})
+
+    async def stats_view(request):
+        return web.json_response(dict(stats))
+
+    async def candle_stream(request):
+        """SSE: one `candle` event per closed candle of the requested tokens."""
+        tokens = set(tokens_param(request, "tokens"))
+        events = asyncio.Queue()
+        subscriber = (tokens, events)
+        request.app["subscribers"].append(subscriber)
+
+        resp = web.StreamResponse(headers={"Content-Type": "text/event-stream", "Cache-Control": "no-cache"})
+        await resp.prepare(request)
+        try:
+            while True:
+                try:
+                    candle = await asyncio.wait_for(events.get(), timeout=15)
+                    if candle is None:
+                        break  # server shutting down
+                    await resp.write(f"event: candle\ndata: {json.dumps(candle)}\n\n".encode())
+                except asyncio.TimeoutError:
+                    await resp.write(b": keepalive\n\n")
+        finally:
+            request.app["subscribers"].remove(subscriber)
+        return resp
+
+    def publish(token, candle):
+        for tokens, events in app["subscribers"]:
+            if not tokens or token in tokens:
+                events.put_nowait(dict(candle, token=token))
+
+    async def market_clock(app):
+        # Ticks every token continuously so candles close even without requests
+        async def run():
+            while True:
+                for token in START_PRICES:
+                    market.tick(token)
+                await asyncio.sleep(app["tick_interval"])
+        app["clock"] = asyncio.create_task(run())
+
+    async def stop_clock(app):
+        app["clock"].cancel()
+
+    async def close_streams(app):
+        for _, events in app["subscribers"]:
+            events.put_nowait(None)
+        for _, ws in list(app["order_sockets"]):
+            await ws.close()
+
+    app = web.Application(middlewares=[count_requests])
+    app["market"] = market
+    app["subscribers"] = []
+    app["order_sockets"] = []
+    app["tick_interval"] = tick_interval
+    market.on_close.append(publish)
+    app.on_startup.append(market_clock)
+    app.on_shutdown.append(close_streams)
+    app.on_cleanup.append(stop_clock)
+    app.router.add_get("/db/indices/nifty-tokens", nifty_tokens)
+    app.router.add_get("/db/indices/ltp", ltp)
+    app.router.add_get("/db/indices/ltp/bulk", ltp_bulk)
+    app.router.add_get("/db/current/ohlc", ohlc)
+    app.router.add_get("/db/current/ohlc/bulk", ohlc_bulk)
+    app.router.add_get("/db/historical/ohlc/load", historical)
+    app.router.add_get("/db/stream/candles", candle_stream)
+    app.router.add_get("/db/signals/get-stop-loss-target/v1/{unique_id}", get_sl_tp)
+    app.router.add_put("/db/signals/update-stop-loss-target/v1", update_sl_tp)
+    app.router.add_post("/db/admin/kill-trade-signal", kill_trade_signal)
+    app.router.add_get("/db/signals/get-strike-price-close-trade-signal/{unique_id}", strike_close_signal)
+    app.router.add_post("/db/admin/control-flags", control_flags)
+    app.router.add_post("/db/_control", set_control)
+    app.router.add_post("/db/signals/strike-ltp", strike_ltp)
+    app.router.add_get("/db/_stats", stats_view)
+    app.router.add_get("/broker/order-update", order_update_feed)
+    app.router.add_post("/broker/_order-update", push_order_update)
+    return app
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Local stand-in for the DB API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--candle-seconds", type=float, default=CANDLE.total_seconds(),
+                        help="candle length (shorten it to exercise the candle stream quickly)")
+    parser.add_argument("--tick-interval", type=float, default=1.0)
+    args = parser.parse_args()
+
+    market = SyntheticMarket(args.seed, candle=timedelta(seconds=args.candle_seconds))
+    web.run_app(create_app(market, args.tick_interval), host=args.host, port=args.port)
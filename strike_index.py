@@ -0,0 +1,109 @@
+"""
+Preloaded option strike index
+
+Parses a strike_data/<index>.xlsx file once and keeps a dict keyed by
+(strike_price, position) -> strike_data, so an entry signal resolves its
+option contract with a dict lookup instead of pd.read_excel + a boolean
+filter.
+
+The file is re-checked on every lookup with os.stat (microseconds). When its
+mtime or size changed the content hash is recomputed, and the index is only
+rebuilt when the content really differs (get_symbol_token_file rewrites the
+same bytes on every start).
+"""
+
+import hashlib
+import logging
+import os
+import threading
+
+import pandas as pd
+
+
+logger = logging.getLogger(__name__)
+
+
+def file_digest(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class StrikeIndex:
+    """(strike_price, "CE"/"PE") -> strike_data dict for one strike file."""
+
+    def __init__(self, path, lot_qty, exchange):
+        self.path = path
+        self.lot_qty = lot_qty
+        self.exchange = exchange
+
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._stat = None      # (mtime_ns, size) the index was checked against
+        self._digest = None    # sha256 of the file the index was built from
+
+        try:
+            self.refresh()
+        except OSError as e:
+            logger.error(f"Strike index not built yet, {self.path} unreadable: {e}")
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _build(self):
+        df = pd.read_excel(self.path)
+
+        entries = {}
+        for row in df.itertuples(index=False):
+            if pd.isna(row.strike_price):
+                continue
+            key = (int(row.strike_price), str(row.position))
+            if key in entries:
+                continue  # same as .iloc[0] on the filtered frame: first row wins
+            entries[key] = {
+                "token":        str(row.token),
+                "exchange":     self.exchange,
+                "index_name":   str(row.index_name),
+                "DOE":          str(row.DOE),
+                "strike_price": int(row.strike_price),
+                "position":     str(row.position),
+                "symbol":       str(row.symbol),
+                "lot_qty":      self.lot_qty,
+            }
+        return entries
+
+    def refresh(self):
+        """Rebuilds the index if the file content changed; returns True if it did."""
+        st = os.stat(self.path)
+        stat = (st.st_mtime_ns, st.st_size)
+        if stat == self._stat:
+            return False
+
+        with self._lock:
+            if stat == self._stat:
+                return False
+
+            digest = file_digest(self.path)
+            if digest == self._digest:
+                self._stat = stat
+                return False
+
+            self._entries = self._build()
+            self._stat = stat
+            self._digest = digest
+
+        logger.info(f"Strike index built from {self.path}: {len(self._entries)} contracts")
+        return True
+
+    def lookup(self, strike_price, position):
+        """strike_data for `strike_price` / "CE" or "PE", or None if not listed."""
+        try:
+            self.refresh()
+        except OSError as e:
+            # Keep serving the last good index if the file is being replaced
+            logger.error(f"Strike index refresh failed for {self.path}: {e}")
+
+        entry = self._entries.get((int(strike_price), position))
+        return None if entry is None else dict(entry)
@@ -0,0 +1,300 @@
+"""
+Parallel parameter sweep for algo.HeikinAshiATRStrategy
+
+Grid-searches atr_len, atr_mult, rsi_len, risk_reward, body_expansion_factor
+and round_off_diff over one candle history with the vectorized backtest.
+
+- The candle arrays are placed in shared memory once; worker processes map
+  them instead of receiving a pickled copy per task.
+- Combinations are grouped by (atr_len, rsi_len). Each group is one task, so
+  Heikin Ashi, ATR, RSI and HTF RSI are computed once per group and only the
+  cheap state machine runs per combination. Workers also keep a per-process
+  cache keyed by the parameters each column depends on (ATR by atr_len,
+  RSI by rsi_len, ...), so columns are reused across groups too.
+- Results are written as a table ranked by P&L.
+
+risk_reward only changes the P&L with --bracket-exits (take-profit exits);
+round_off_diff only changes the option strike, not underlying points.
+
+Usage:
+    python sweep.py nifty50.csv --token 13 --atr-len 10 14 21 --atr-mult 2 2.5 3 \\
+        --rsi-len 9 14 --workers 4 --out sweep_results.csv
+"""
+
+import argparse
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from backtest import (
+    atr_column,
+    candle_arrays,
+    heikin_ashi_columns,
+    htf_rsi_column,
+    rsi_column,
+    signals_table,
+    simulate,
+    trades_table,
+)
+
+
+PARAMETERS = ("atr_len", "atr_mult", "rsi_len", "risk_reward", "body_expansion_factor", "round_off_diff")
+
+PRICE_COLUMNS = ("open", "high", "low", "close")
+
+RESULT_COLUMNS = list(PARAMETERS) + ["pnl", "hit_rate", "max_drawdown", "trades"]
+
+
+# -----------------------------------------------------------
+# Shared candle arrays
+# -----------------------------------------------------------
+
+class SharedCandles:
+    """Candle prices + wall-clock timestamps in two shared memory blocks."""
+
+    def __init__(self, columns):
+        n = len(columns["close"])
+
+        self.prices = shared_memory.SharedMemory(create=True, size=max(1, 8 * n * len(PRICE_COLUMNS)))
+        self.wall_ns = shared_memory.SharedMemory(create=True, size=max(1, 8 * n))
+
+        np.ndarray((len(PRICE_COLUMNS), n), dtype=np.float64, buffer=self.prices.buf)[:] = [
+            columns[name] for name in PRICE_COLUMNS
+        ]
+        np.ndarray(n, dtype=np.int64, buffer=self.wall_ns.buf)[:] = columns["wall_ns"]
+
+        self.spec = (self.prices.name, self.wall_ns.name, n)
+
+    def close(self):
+        for block in (self.prices, self.wall_ns):
+            block.close()
+            block.unlink()
+
+
+# Worker-process state, set by _attach()
+_blocks = []
+_columns = {}
+_cache = {}
+
+
+def _attach(prices_name, wall_ns_name, n):
+    prices = shared_memory.SharedMemory(name=prices_name)
+    wall_ns = shared_memory.SharedMemory(name=wall_ns_name)
+    _blocks.extend([prices, wall_ns])  # keep the mappings alive for the worker's lifetime
+
+    matrix = np.ndarray((len(PRICE_COLUMNS), n), dtype=np.float64, buffer=prices.buf)
+    _columns.update(zip(PRICE_COLUMNS, matrix))
+    _columns["wall_ns"] = np.ndarray(n, dtype=np.int64, buffer=wall_ns.buf)
+
+
+def indicator_columns(candles, atr_len, rsi_len, htf, cache):
+    """Indicator columns for one group, each memoized in `cache` on the
+    parameters it depends on. `cache` must belong to this `candles` set."""
+
+    def cached(key, compute):
+        if key not in cache:
+            cache[key] = compute()
+        return cache[key]
+
+    columns = dict(candles)
+    columns.update(cached(("ha",), lambda: heikin_ashi_columns(
+        columns["open"], columns["high"], columns["low"], columns["close"]
+    )))
+    columns["atr"] = cached(("atr", atr_len), lambda: atr_column(
+        columns["ha_high"], columns["ha_low"], columns["ha_close"], atr_len
+    ))
+    columns["rsi_ltf"] = cached(("rsi_ltf", rsi_len), lambda: rsi_column(
+        columns["ha_close"], rsi_len
+    ))
+    columns["rsi_htf"] = cached(("rsi_htf", rsi_len, htf), lambda: htf_rsi_column(
+        columns["wall_ns"], columns["ha_close"], htf, rsi_len
+    ))
+    return columns
+
+
+# -----------------------------------------------------------
+# Evaluation
+# -----------------------------------------------------------
+
+def trade_metrics(points):
+    """P&L, hit rate and max drawdown (in points) of closed-trade results."""
+    points = np.asarray(points, dtype=float)
+    if len(points) == 0:
+        return {"pnl": 0.0, "hit_rate": np.nan, "max_drawdown": 0.0, "trades": 0}
+
+    equity = np.cumsum(points)
+    peak = np.maximum.accumulate(np.r_[0.0, equity])[1:]
+
+    return {
+        "pnl": float(equity[-1]),
+        "hit_rate": float(np.mean(points > 0)),
+        "max_drawdown": float(np.max(peak - equity)),
+        "trades": int(len(points)),
+    }
+
+
+def backtest_trades(columns, params, settings):
+    """Trades table for one parameter combination over indicator `columns`."""
+    signals = simulate(
+        columns,
+        start=settings["start"],
+        atr_len=params["atr_len"],
+        atr_mult=params["atr_mult"],
+        risk_reward=params["risk_reward"],
+        body_expansion_factor=params["body_expansion_factor"],
+        strike_roundup_value=settings["strike_roundup_value"],
+        round_off_diff=params["round_off_diff"],
+        bracket_exits=settings["bracket_exits"]
+    )
+    return trades_table(signals_table(columns, signals))
+
+
+def evaluate_group(candles, atr_len, rsi_len, combos, settings, cache):
+    """Metrics for every (atr_mult, risk_reward, body_expansion_factor,
+    round_off_diff) combination sharing one (atr_len, rsi_len)."""
+    columns = indicator_columns(candles, atr_len, rsi_len, settings["htf"], cache)
+    if "timestamp" not in columns:
+        # row numbers stand in for timestamps; only the points are needed here
+        columns["timestamp"] = pd.Series(np.arange(len(columns["close"])))
+
+    results = []
+    for atr_mult, risk_reward, body_expansion_factor, round_off_diff in combos:
+        params = dict(zip(PARAMETERS, (
+            atr_len, atr_mult, rsi_len, risk_reward, body_expansion_factor, round_off_diff
+        )))
+        trades = backtest_trades(columns, params, settings)
+
+        params.update(trade_metrics(trades["points"].dropna()))
+        results.append(params)
+
+    return results
+
+
+def _evaluate_group(task):
+    atr_len, rsi_len, combos, settings = task
+    return evaluate_group(_columns, atr_len, rsi_len, combos, settings, _cache)
+
+
+def full_grid(grid):
+    """`grid` with the HeikinAshiATRStrategy defaults for missing parameters."""
+    defaults = {
+        "atr_len": [14], "atr_mult": [2.5], "rsi_len": [14],
+        "risk_reward": [2.0], "body_expansion_factor": [0.68], "round_off_diff": [100],
+    }
+    unknown = set(grid) - set(PARAMETERS)
+    if unknown:
+        raise ValueError(f"Unknown sweep parameters: {sorted(unknown)}")
+    return {**defaults, **grid}
+
+
+def grid_groups(grid):
+    """[(atr_len, rsi_len, combos)] where combos share that group's indicators."""
+    grid = full_grid(grid)
+    combos = list(itertools.product(
+        grid["atr_mult"], grid["risk_reward"], grid["body_expansion_factor"], grid["round_off_diff"]
+    ))
+    return [
+        (atr_len, rsi_len, combos)
+        for atr_len, rsi_len in itertools.product(grid["atr_len"], grid["rsi_len"])
+    ]
+
+
+def rank_results(results):
+    ranked = pd.DataFrame(results, columns=RESULT_COLUMNS)
+    ranked.sort_values(["pnl", "max_drawdown"], ascending=[False, True], inplace=True)
+    ranked.reset_index(drop=True, inplace=True)
+    ranked.index.name = "rank"
+    return ranked
+
+
+def run_sweep(
+    candles,
+    grid,
+    start=0,
+    htf="15min",
+    strike_roundup_value=100,
+    bracket_exits=False,
+    workers=None
+):
+    """Evaluates every combination in `grid` ({parameter: [values]}).
+
+    Missing parameters use the HeikinAshiATRStrategy defaults. Returns the
+    results DataFrame ranked by P&L (best first).
+    """
+    columns = candle_arrays(candles)
+    if isinstance(start, float):
+        start = int(len(columns["close"]) * start)
+
+    settings = {
+        "start": start,
+        "htf": htf,
+        "strike_roundup_value": strike_roundup_value,
+        "bracket_exits": bracket_exits,
+    }
+    tasks = [
+        (atr_len, rsi_len, combos, settings)
+        for atr_len, rsi_len, combos in grid_groups(grid)
+    ]
+
+    shared = SharedCandles(columns)
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers or os.cpu_count(),
+            initializer=_attach,
+            initargs=shared.spec
+        ) as pool:
+            results = [row for group in pool.map(_evaluate_group, tasks) for row in group]
+    finally:
+        shared.close()
+
+    return rank_results(results)
+
+
+# -----------------------------------------------------------
+# CLI
+# -----------------------------------------------------------
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Grid search for algo.HeikinAshiATRStrategy")
+    parser.add_argument("csv", help="OHLC CSV with timestamp/start_time, open, high, low, close")
+    parser.add_argument("--token", help="index token from Main.tokens_utils (sets strike_roundup_value)")
+    parser.add_argument("--start", type=float, default=0.0,
+                        help="first traded row: fraction (<1) or row number (default 0)")
+    parser.add_argument("--htf", default="15min")
+    parser.add_argument("--atr-len", type=int, nargs="+", default=[14])
+    parser.add_argument("--atr-mult", type=float, nargs="+", default=[2.5])
+    parser.add_argument("--rsi-len", type=int, nargs="+", default=[14])
+    parser.add_argument("--risk-reward", type=float, nargs="+", default=[2.0])
+    parser.add_argument("--body-expansion-factor", type=float, nargs="+", default=[0.68])
+    parser.add_argument("--round-off-diff", type=float, nargs="+", default=[100])
+    parser.add_argument("--bracket-exits", action="store_true",
+                        help="also exit when a candle touches stop_loss / take_profit")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--out", default="sweep_results.csv")
+    args = parser.parse_args()
+
+    strike_roundup_value = 100
+    if args.token:
+        from Main import tokens_utils
+        strike_roundup_value = tokens_utils[str(args.token)]["strike_roundup_value"]
+
+    start = args.start if args.start < 1 else int(args.start)
+
+    ranked = run_sweep(
+        args.csv,
+        grid={name: getattr(args, name) for name in PARAMETERS},
+        start=start,
+        htf=args.htf,
+        strike_roundup_value=strike_roundup_value,
+        bracket_exits=args.bracket_exits,
+        workers=args.workers
+    )
+    ranked.to_csv(args.out)
+
+    print(f"{len(ranked)} combinations -> {args.out}")
+    print(ranked.head(10).to_string())
@@ -0,0 +1,142 @@
+"""
+AsyncApiDatabaseClient through BlockingApiClient: retries, timeouts, bulk fallback
+"""
+import asyncio
+import threading
+
+import pytest
+from aiohttp import web
+
+import async_api_client
+from async_api_client import AsyncApiDatabaseClient, BlockingApiClient
+from http_transport import EndpointPolicy
+
+
+class ScriptedServer:
+    """Local API whose handlers answer from a per-path script of outcomes."""
+
+    def __init__(self, routes):
+        self.routes = routes            # (method, path) -> handler(request, call_number)
+        self.calls = []
+        self.ready = threading.Event()
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+
+    def _handler(self, key, handler):
+        async def handle(request):
+            self.calls.append(key[1])
+            return await handler(request, self.count(key[1]))
+        return handle
+
+    def _serve(self):
+        asyncio.set_event_loop(self.loop)
+        app = web.Application()
+        for key, handler in self.routes.items():
+            app.router.add_route(key[0], key[1], self._handler(key, handler))
+        self.runner = web.AppRunner(app, shutdown_timeout=0.1, handler_cancellation=True)
+        self.loop.run_until_complete(self.runner.setup())
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        self.loop.run_until_complete(site.start())
+        self.port = site._server.sockets[0].getsockname()[1]
+        self.ready.set()
+        self.loop.run_forever()
+
+    def count(self, path):
+        return self.calls.count(path)
+
+    def __enter__(self):
+        self.thread.start()
+        self.ready.wait(5)
+        return self
+
+    def __exit__(self, *exc):
+        asyncio.run_coroutine_threadsafe(self.runner.cleanup(), self.loop).result(5)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+@pytest.fixture(autouse=True)
+def short_policy(monkeypatch):
+    monkeypatch.setattr(async_api_client, "policy_for",
+                        lambda url: EndpointPolicy(connect=1.0, read=0.3, deadline=3.0, retries=2))
+
+
+def client_for(server):
+    return BlockingApiClient(AsyncApiDatabaseClient(base_url=f"http://127.0.0.1:{server.port}/db"))
+
+
+def ltp_payload(token):
+    return {"last_update": "2026-10-16T10:00:00+05:30", "ltp": float(token)}
+
+
+async def unavailable_then_slow_then_ok(request, n):
+    if n == 1:
+        return web.Response(status=503)
+    if n == 2:
+        await asyncio.sleep(1.0)         # past the 0.3 s read timeout
+    return web.json_response({"data": ltp_payload(request.query["stock_token"])})
+
+
+async def kill_unavailable(request, n):
+    return web.Response(status=503)
+
+
+def test_get_is_retried_after_503_and_a_read_timeout():
+    with ScriptedServer({("GET", "/db/indices/ltp"): unavailable_then_slow_then_ok}) as server:
+        api = client_for(server)
+        try:
+            assert api.fetch_latest_ltp("13") == ("2026-10-16T10:00:00+05:30", 13.0)
+            assert server.count("/db/indices/ltp") == 3
+
+            stats = api.stats()["GET /db/indices/ltp"]
+            assert stats["count"] == 3 and stats["errors"] == 2
+        finally:
+            api.close()
+
+
+def test_post_is_sent_once():
+    with ScriptedServer({("POST", "/db/admin/kill-trade-signal"): kill_unavailable}) as server:
+        api = client_for(server)
+        try:
+            assert api.kill_trade_signal("13") is False
+            assert server.count("/db/admin/kill-trade-signal") == 1
+        finally:
+            api.close()
+
+
+async def ltp_or_fail(request, n):
+    token = request.query["stock_token"]
+    if token == "99":
+        return web.Response(status=500)
+    return web.json_response({"data": ltp_payload(token)})
+
+
+def test_missing_bulk_endpoint_falls_back_to_per_token_requests():
+    with ScriptedServer({("GET", "/db/indices/ltp"): ltp_or_fail}) as server:
+        api = client_for(server)
+        try:
+            prices = api.fetch_latest_ltp_bulk(["13", "25", "99"])
+            assert prices == {"13": ("2026-10-16T10:00:00+05:30", 13.0),
+                              "25": ("2026-10-16T10:00:00+05:30", 25.0)}
+            assert server.count("/db/indices/ltp") == 3
+
+            # The 404 is remembered: the next call goes straight to the shim
+            api.fetch_latest_ltp_bulk(["13"])
+            assert api.client._bulk_supported == {"/indices/ltp/bulk": False}
+            assert server.count("/db/indices/ltp") == 4
+        finally:
+            api.close()
+
+
+async def bulk_with_a_gap(request, n):
+    tokens = request.query["stock_tokens"].split(",")
+    return web.json_response({"status": "success",
+                              "data": {t: (ltp_payload(t) if t != "25" else None) for t in tokens}})
+
+
+def test_bulk_drops_tokens_without_a_price():
+    with ScriptedServer({("GET", "/db/indices/ltp/bulk"): bulk_with_a_gap}) as server:
+        api = client_for(server)
+        try:
+            assert api.fetch_latest_ltp_bulk(["13", "25"]) == {"13": ("2026-10-16T10:00:00+05:30", 13.0)}
+        finally:
+            api.close()
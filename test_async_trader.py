@@ -0,0 +1,109 @@
+"""
+AsyncStrategyTrader: API calls are awaited on the loop, only compute uses the pool
+"""
+import asyncio
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip("pandas_ta")
+
+import Main
+from async_api_client import BlockingApiClient
+from async_trader import AsyncStrategyTrader
+from candle_scheduler import CandlePoller, CandleSchedule
+from Main import IST, StrategyTrader, run_step
+
+
+class FakeClient:
+    """Async API whose OHLC request takes 0.2 s."""
+
+    def __init__(self):
+        self.requests = 0
+
+    async def init_session(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def fetch_ohlc(self, token, limit=1):
+        self.requests += 1
+        await asyncio.sleep(0.2)
+        return "2026-10-16T09:57:00+05:30", 1.0, 2.0, 0.5, 1.5
+
+
+class FakeSyncApi:
+
+    def fetch_ohlc(self, token, limit=1):
+        return "2026-10-16T09:57:00+05:30", 1.0, 2.0, 0.5, 1.5
+
+
+class FakeStrategy:
+
+    etf = "3min"
+
+    def __init__(self):
+        self.threads = []
+
+    def add_live_data(self, candle):
+        self.threads.append(threading.current_thread().name)
+
+    def generate_signal(self):
+        return None
+
+
+class FixedClock(datetime):
+
+    @classmethod
+    def now(cls, tz=None):
+        return IST.localize(datetime(2026, 10, 16, 10, 0, 1))
+
+
+def state(token):
+    return {
+        "token": token, "strategy": FakeStrategy(), "strike_index": None,
+        "candle_poller": CandlePoller(CandleSchedule("3min")), "pos": Main._reset_position_state(),
+        "previous_candle_time": None, "cache_candle": None,
+    }
+
+
+@pytest.fixture(autouse=True)
+def market_hours(monkeypatch):
+    monkeypatch.setattr(Main, "datetime", FixedClock)
+
+
+def test_steps_of_all_tokens_overlap_on_the_loop():
+    api = BlockingApiClient(FakeClient())
+    try:
+        trader = AsyncStrategyTrader(api, workers=1)
+        states = [state(str(token)) for token in range(8)]
+
+        async def step_all():
+            return await asyncio.gather(*(trader.trade_step(s, candle_wait=0) for s in states))
+
+        started = time.monotonic()
+        api.submit(step_all()).result(5)
+        elapsed = time.monotonic() - started
+
+        # Eight 0.2 s requests in flight at once, despite a single worker thread
+        assert api.client.requests == 8
+        assert elapsed < 0.2 * 4
+        for s in states:
+            assert s["previous_candle_time"] == "2026-10-16T09:57:00+05:30"
+            assert s["strategy"].threads == ["strategy_0"]
+        trader.executor.shutdown()
+    finally:
+        api.close()
+
+
+def test_threaded_driver_runs_the_same_step_without_a_loop():
+    trader = StrategyTrader(FakeSyncApi())
+    s = state("13")
+    wait = run_step(trader.trade_step(s, candle_wait=0))
+
+    assert wait > 0
+    assert s["previous_candle_time"] == "2026-10-16T09:57:00+05:30"
+    assert s["strategy"].threads == [threading.current_thread().name]
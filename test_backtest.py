@@ -0,0 +1,60 @@
+"""
+Vectorized backtest vs. a candle-by-candle replay of the live strategy
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("pandas_ta")
+
+from algo import HeikinAshiATRStrategy
+from backtest import run_backtest
+
+
+def candles(days=4, seed=1):
+    rng = np.random.default_rng(seed)
+    rows, price = [], 24000.0
+    for day in pd.bdate_range("2026-09-07", periods=days):
+        for ts in pd.date_range(f"{day.date()} 09:15", f"{day.date()} 15:27", freq="3min", tz="Asia/Kolkata"):
+            close = round(price + rng.normal(0, 8), 2)
+            high = round(max(price, close) + abs(rng.normal(0, 4)), 2)
+            low = round(min(price, close) - abs(rng.normal(0, 4)), 2)
+            rows.append((ts, price, high, low, close, 0))
+            price = close
+    return pd.DataFrame(rows, columns=["timestamp", "open", "high", "low", "close", "volume"])
+
+
+def live_signals(df, start, **params):
+    strategy = HeikinAshiATRStrategy(**params)
+    strategy.load_historical_candles(df.iloc[:start])
+
+    signals = []
+    for candle in df.iloc[start:].to_dict("records"):
+        strategy.add_live_data(candle)
+        signal = strategy.generate_signal()
+        if signal is None:
+            continue
+        timestamp = strategy.latest_row()["timestamp"]
+        if isinstance(signal, str):
+            signals.append((timestamp, signal, None))
+        else:
+            signals.append((timestamp, signal[0], tuple(signal[1:])))
+    return signals
+
+
+@pytest.mark.parametrize("params", [{}, {"atr_len": 10, "atr_mult": 2.0, "rsi_len": 9}])
+def test_backtest_signals_equal_the_live_path(params):
+    df = candles()
+    start = 150
+
+    live = live_signals(df, start, **params)
+    signals, _ = run_backtest(df, strategy=HeikinAshiATRStrategy(**params), start=start)
+    backtest = [
+        (row.timestamp, row.signal,
+         None if row.signal.endswith("EXIT") else (row.stop_loss, row.take_profit, row.strike))
+        for row in signals.itertuples()
+    ]
+
+    assert len(live) > 4
+    assert [s[:2] for s in backtest] == [s[:2] for s in live]
+    assert backtest == live
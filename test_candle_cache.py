@@ -0,0 +1,45 @@
+"""
+CandleCache: IST normalisation, incremental sync and the background writer
+"""
+import numpy as np
+import pandas as pd
+
+from candle_cache import CandleCache, IST, frame_to_columns, merge_columns
+
+
+def frame(timestamps, close):
+    return pd.DataFrame({"timestamp": timestamps, "open": close, "high": close,
+                         "low": close, "close": close, "volume": 0})
+
+
+def test_naive_and_aware_timestamps_merge_in_ist():
+    naive = frame_to_columns(frame(["2026-10-16 09:15:00", "2026-10-16 09:18:00"], [1.0, 2.0]))
+    aware = frame_to_columns(frame(["2026-10-16T03:51:00Z", "2026-10-16T09:18:00+05:30"], [3.0, 4.0]))
+
+    merged = merge_columns(naive, aware)
+    assert str(merged["timestamp"].tz) == str(IST)
+    assert [ts.strftime("%H:%M") for ts in merged["timestamp"]] == ["09:15", "09:18", "09:21"]
+    assert list(merged["close"]) == [1.0, 4.0, 3.0]     # same candle: the fresh copy wins
+
+
+def test_sync_fetches_only_after_the_last_cached_candle(tmp_path):
+    cache = CandleCache(directory=str(tmp_path))
+    history = frame(["2026-10-16 09:15:00+05:30", "2026-10-16 09:18:00+05:30"], [1.0, 2.0])
+    cache.sync("13", lambda since: history)
+
+    seen = []
+    restarted = CandleCache(directory=str(tmp_path))
+    columns = restarted.sync("13", lambda since: seen.append(since) or history)
+    assert seen == [pd.Timestamp("2026-10-16 09:18:00+05:30")]
+    assert len(columns["timestamp"]) == 2
+
+
+def test_append_is_written_by_the_writer(tmp_path):
+    cache = CandleCache(directory=str(tmp_path), write_delay=60)
+    cache.append("13", {"timestamp": "2026-10-16T09:15:00+05:30", "open": 1, "high": 2,
+                        "low": 0.5, "close": 1.5})
+    cache.flush()
+
+    columns = CandleCache(directory=str(tmp_path)).load("13")
+    assert columns["timestamp"][0] == pd.Timestamp("2026-10-16 09:15:00", tz=IST)
+    assert np.allclose(columns["close"], [1.5])
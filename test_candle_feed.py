@@ -0,0 +1,88 @@
+"""
+ClosedCandleFeed: a stream that stops writing is detected and reconnected
+"""
+import asyncio
+import json
+import threading
+import time
+
+import pandas as pd
+from aiohttp import web
+
+from candle_feed import ClosedCandleFeed
+
+
+class StallingServer:
+    """SSE endpoint that pushes one candle, then goes silent without closing."""
+
+    def __init__(self):
+        self.connections = 0
+        self.ready = threading.Event()
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._serve, daemon=True)
+
+    async def stream(self, request):
+        self.connections += 1
+        resp = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await resp.prepare(request)
+        if self.connections == 1:
+            candle = {"token": "13", "start_time": "2026-10-16T09:15:00+05:30",
+                      "open": 1, "high": 2, "low": 0.5, "close": 1.5}
+            await resp.write(f"event: candle\ndata: {json.dumps(candle)}\n\n".encode())
+        await asyncio.sleep(3600)
+        return resp
+
+    def _serve(self):
+        asyncio.set_event_loop(self.loop)
+        app = web.Application()
+        app.router.add_get("/stream/candles", self.stream)
+        self.runner = web.AppRunner(app, shutdown_timeout=0.1, handler_cancellation=True)
+        self.loop.run_until_complete(self.runner.setup())
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        self.loop.run_until_complete(site.start())
+        self.port = site._server.sockets[0].getsockname()[1]
+        self.ready.set()
+        self.loop.run_forever()
+
+    def __enter__(self):
+        self.thread.start()
+        self.ready.wait(5)
+        return self
+
+    def __exit__(self, *exc):
+        asyncio.run_coroutine_threadsafe(self.runner.cleanup(), self.loop).result(5)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_silent_stream_clears_live_and_reconnects():
+    backfills = []
+
+    def backfill(token, since):
+        backfills.append((token, since))
+        return pd.DataFrame()
+
+    with StallingServer() as server:
+        feed = ClosedCandleFeed(f"http://127.0.0.1:{server.port}/stream/candles", ["13"],
+                                backfill=backfill, reconnect_delay=0.05, read_timeout=0.3).start()
+        try:
+            assert feed.get("13", timeout=5)["close"] == 1.5
+            assert feed.live
+
+            # No byte for read_timeout: the half-open stream is dropped
+            assert wait_for(lambda: feed.reconnects >= 1)
+            assert wait_for(lambda: server.connections >= 2)
+
+            # The reconnect backfills from the last pushed candle
+            assert wait_for(lambda: backfills)
+            assert backfills[0] == ("13", pd.Timestamp("2026-10-16T09:15:00+05:30"))
+        finally:
+            feed.stop()
@@ -0,0 +1,86 @@
+"""
+CandleSchedule / CandlePoller: boundaries, session edges and burst retries on a fake clock
+"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from candle_scheduler import IST, CandlePoller, CandleSchedule
+
+
+def at(day, hh, mm, ss=0):
+    """IST time on 2026-10-`day` (the 16th is a Friday)."""
+    return IST.localize(datetime(2026, 10, day, hh, mm, ss))
+
+
+@pytest.mark.parametrize("now, expected", [
+    (at(16, 8, 0), at(16, 9, 18)),            # before the open
+    (at(16, 9, 15), at(16, 9, 18)),           # at the open
+    (at(16, 9, 17, 59), at(16, 9, 18)),
+    (at(16, 9, 18), at(16, 9, 21)),           # strictly after a close
+    (at(16, 10, 0, 1), at(16, 10, 3)),        # mid-session
+    (at(16, 15, 27), at(16, 15, 30)),         # last candle of the day
+    (at(16, 15, 30), at(19, 9, 18)),          # Friday close -> Monday
+    (at(17, 11, 0), at(19, 9, 18)),           # Saturday
+    (at(15, 23, 0), at(16, 9, 18)),           # overnight
+])
+def test_next_close_on_the_3min_grid(now, expected):
+    assert CandleSchedule("3min").next_close(now) == expected
+
+
+def test_a_candle_that_would_cross_the_close_ends_at_15_30():
+    schedule = CandleSchedule("7min")          # 09:15 + 53 * 7 min = 15:26
+    assert schedule.next_close(at(16, 15, 26)) == at(16, 15, 30)
+    assert schedule.next_close(at(16, 15, 29)) == at(16, 15, 30)
+
+
+def test_next_close_accepts_other_timezones():
+    utc = at(16, 10, 0, 1).astimezone(timezone.utc)
+    assert CandleSchedule("3min").next_close(utc) == at(16, 10, 3)
+
+
+def test_poller_follows_the_boundaries_across_a_day_and_a_weekend():
+    poller = CandlePoller(CandleSchedule("3min", close_delay=1.0))
+    now = at(16, 9, 16)
+
+    # Startup: poll right away, then wait for the first boundary
+    assert poller.due(now) and poller.wait_time(now) == 0.0
+    poller.fetched(now, new_candle=True)
+    assert poller.next_attempt == at(16, 9, 18, 1)
+    assert not poller.due(at(16, 9, 18))
+    assert poller.wait_time(now) == 121.0
+
+    # Mid-session: each new candle arms the next boundary
+    now = at(16, 12, 0, 1)
+    assert poller.due(now)
+    poller.fetched(now, new_candle=True)
+    assert poller.next_attempt == at(16, 12, 3, 1)
+
+    # Last candle of Friday: the next poll is Monday's first close
+    now = at(16, 15, 30, 1)
+    poller.fetched(now, new_candle=True)
+    assert poller.next_attempt == at(19, 9, 18, 1)
+    assert poller.wait_time(now) == (at(19, 9, 18, 1) - now).total_seconds()
+
+
+def test_missing_candle_is_retried_in_a_burst_then_rearmed():
+    poller = CandlePoller(CandleSchedule("3min", close_delay=1.0, burst_interval=1.0, burst_attempts=3))
+    poller.fetched(at(16, 10, 0, 1), new_candle=True)
+    now = poller.next_attempt                  # 10:03:01
+
+    # The API still serves the previous candle: retry every second
+    poller.fetched(now, new_candle=False)
+    assert poller.next_attempt == now + timedelta(seconds=1)
+    poller.fetched(poller.next_attempt, new_candle=False)
+    assert poller.next_attempt == now + timedelta(seconds=2)
+
+    # Burst exhausted: give up on this candle and wait for the next boundary
+    poller.fetched(poller.next_attempt, new_candle=False)
+    assert poller.next_attempt == at(16, 10, 6, 1)
+    assert poller.misses == 1 and poller.attempts == 0
+
+    # A hit inside the next burst rearms without counting a miss
+    poller.fetched(at(16, 10, 6, 1), new_candle=False)
+    poller.fetched(at(16, 10, 6, 2), new_candle=True)
+    assert poller.next_attempt == at(16, 10, 9, 1)
+    assert (poller.polls, poller.misses) == (6, 1)
@@ -0,0 +1,43 @@
+"""
+CandleStore: bounded ring buffer of candles
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from candle_store import CandleStore
+
+
+def ts(minute):
+    return pd.Timestamp("2026-10-16 09:15", tz="Asia/Kolkata") + pd.Timedelta(minutes=3 * minute)
+
+
+def test_ring_keeps_the_newest_rows_in_order():
+    store = CandleStore(capacity=3)
+    for i in range(5):
+        store.append(ts(i), {"close": float(i), "unknown": 1.0})
+
+    assert len(store) == 3 and store.total == 5
+    assert [store.value("close", i) for i in range(3)] == [2.0, 3.0, 4.0]
+    assert store.value("close", -1) == 4.0
+    assert store.timestamp(0) == ts(2)
+    assert np.isnan(store.value("atr"))
+
+    df = store.to_frame()
+    assert list(df["close"]) == [2.0, 3.0, 4.0]
+    assert list(df["timestamp"]) == [ts(2), ts(3), ts(4)]
+
+
+def test_row_and_bounds():
+    store = CandleStore(capacity=2)
+    with pytest.raises(IndexError):
+        store.value("close")
+
+    store.append(ts(0), {"open": 1.0, "close": 2.0})
+    row = store.row()
+    assert row["timestamp"] == ts(0) and row["open"] == 1.0 and row["close"] == 2.0
+    with pytest.raises(IndexError):
+        store.row(1)
+
+    with pytest.raises(ValueError):
+        CandleStore(capacity=0)
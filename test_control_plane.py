@@ -0,0 +1,39 @@
+"""
+ControlPlaneWatcher: only open positions are polled
+"""
+from control_plane import ControlPlaneWatcher
+
+
+class FakeApi:
+
+    def __init__(self):
+        self.calls = []
+        self.kill = {}
+
+    def fetch_control_flags(self, tokens, unique_ids, since=None, wait=0):
+        self.calls.append((tokens, unique_ids))
+        return {"kill": {t: self.kill.get(t, False) for t in tokens},
+                "strike_close": {u: False for u in unique_ids}, "version": None}
+
+
+def test_idle_watcher_makes_no_request():
+    api = FakeApi()
+    watcher = ControlPlaneWatcher(api, interval=0)
+    watcher.poll_once()
+    assert api.calls == []
+
+
+def test_position_watched_from_entry_to_exit():
+    api = FakeApi()
+    api.kill["13"] = True
+    watcher = ControlPlaneWatcher(api, interval=0)
+
+    watcher.watch(token="13", unique_id="u1")
+    watcher.poll_once()
+    assert api.calls[-1] == (["13"], ["u1"])
+    assert watcher.killed("13")
+
+    watcher.unwatch("u1", token="13")
+    assert not watcher.killed("13")
+    watcher.poll_once()
+    assert len(api.calls) == 1
@@ -0,0 +1,21 @@
+"""
+Smoke test: every entry point imports cleanly
+(skipped only when a third-party dependency is not installed)
+"""
+import importlib
+
+import pytest
+
+
+ENTRY_POINTS = ["Main", "async_trader", "sweep", "walk_forward", "backtest", "spws", "log_setup"]
+OPTIONAL_DEPENDENCIES = {"pandas_ta", "dhanhq", "httpx", "h2"}
+
+
+@pytest.mark.parametrize("module", ENTRY_POINTS)
+def test_entry_point_imports(module):
+    try:
+        importlib.import_module(module)
+    except ModuleNotFoundError as e:
+        if e.name not in OPTIONAL_DEPENDENCIES:
+            raise
+        pytest.skip(f"{e.name} not installed")
@@ -0,0 +1,73 @@
+"""
+ResilientSession: retries, circuit breaking and histograms per endpoint
+"""
+import pytest
+import requests
+from requests.adapters import BaseAdapter
+
+from http_transport import CircuitOpenError, ResilientSession
+
+
+class FakeAdapter(BaseAdapter):
+    """Answers every request with the next status (an int) or raises the next exception."""
+
+    def __init__(self, outcomes):
+        super().__init__()
+        self.outcomes = list(outcomes)
+        self.sent = []
+
+    def send(self, request, **kwargs):
+        self.sent.append(request.method)
+        outcome = self.outcomes.pop(0) if self.outcomes else 200
+        if isinstance(outcome, Exception):
+            raise outcome
+        resp = requests.Response()
+        resp.status_code = outcome
+        resp.request = request
+        resp._content = b"{}"
+        return resp
+
+    def close(self):
+        pass
+
+
+def session_with(outcomes):
+    session = ResilientSession(failure_threshold=3, cooldown=60, backoff_base=0.001)
+    adapter = FakeAdapter(outcomes)
+    session.mount("http://", adapter)
+    return session, adapter
+
+
+def test_get_is_retried_and_circuit_opens():
+    session, adapter = session_with([503, 200])
+    assert session.get("http://api/db/indices/ltp").status_code == 200
+    assert adapter.sent == ["GET", "GET"]
+
+    session, adapter = session_with([requests.ConnectionError("reset")] * 20)
+    for _ in range(3):
+        with pytest.raises(requests.ConnectionError):
+            session.get("http://api/db/current/ohlc")
+    with pytest.raises(CircuitOpenError):
+        session.get("http://api/db/current/ohlc")
+
+
+def test_put_is_retried_post_is_not():
+    session, adapter = session_with([503, 200])
+    assert session.put("http://api/db/signals/update-stop-loss-target/v1").status_code == 200
+    assert adapter.sent == ["PUT", "PUT"]
+
+    session, adapter = session_with([503, 200])
+    assert session.post("http://api/db/admin/kill-trade-signal", json={}).status_code == 503
+    assert adapter.sent == ["POST"]
+
+
+def test_exit_signals_are_never_short_circuited():
+    session, adapter = session_with([requests.ConnectionError("reset")] * 10)
+    for _ in range(10):
+        with pytest.raises(requests.ConnectionError) as info:
+            session.post("http://api/db/signals/exit/v3", json={})
+        assert not isinstance(info.value, CircuitOpenError)
+    assert len(adapter.sent) == 10
+
+    stats = session.stats()["POST /db/signals/exit/v3"]
+    assert (stats["count"], stats["errors"], stats["circuit"]) == (10, 10, "exempt")
@@ -0,0 +1,89 @@
+"""
+Streaming indicators vs. the pandas_ta reference (algo indicator_mode="reference")
+
+The newest candle's values must match the reference. The two documented
+deviations are bounded rather than hidden:
+
+- ATR epsilon: pandas_ta adds float epsilon to every high-low range once any
+  range in the series is zero; StreamingATR adds it from the first zero
+  range on. The difference stays within a few ulps of the ATR.
+- Historical rsi_htf: the reference recomputes every row with the bucket's
+  final close (look-ahead inside the open 15min bucket), the streaming store
+  keeps the as-of value each row had when it was the newest candle. The two
+  agree on the last candle of every bucket.
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+ta = pytest.importorskip("pandas_ta")
+
+from algo import HeikinAshiATRStrategy
+from indicator_engine import StreamingATR
+
+
+def candles(days=2, seed=7):
+    rng = np.random.default_rng(seed)
+    rows, price = [], 24000.0
+    for day in pd.bdate_range("2025-11-17", periods=days):
+        t = pd.Timestamp(day.date(), tz="Asia/Kolkata") + pd.Timedelta("9h15min")
+        for _ in range(125):
+            o = price
+            c = round((o + rng.normal(0, 8)) * 20) / 20
+            h = max(o, c) + round(abs(rng.normal(0, 4)) * 20) / 20
+            l = min(o, c) - round(abs(rng.normal(0, 4)) * 20) / 20
+            rows.append((t, o, h, l, c, 0))
+            price, t = c, t + pd.Timedelta("3min")
+    return pd.DataFrame(rows, columns=["timestamp", "open", "high", "low", "close", "volume"])
+
+
+def test_newest_candle_matches_the_reference():
+    df = candles()
+    # The reference needs rsi_len + 1 15min buckets before ta.rsi returns a series
+    streaming = HeikinAshiATRStrategy(indicator_mode="streaming")
+    streaming.load_historical_candles(df.iloc[:100])
+    reference = HeikinAshiATRStrategy(indicator_mode="reference")
+    reference.load_historical_candles(df.iloc[:100])
+
+    for row in df.iloc[100:].to_dict("records"):
+        streaming.add_live_data(dict(row))
+        reference.add_live_data(dict(row))
+        new, ref = streaming.latest_row(), reference.latest_row()
+        for column in ("ha_open", "ha_close", "atr", "rsi_ltf", "rsi_htf"):
+            assert new[column] == pytest.approx(ref[column], rel=1e-12, abs=1e-9), column
+
+
+def test_historical_rsi_htf_is_as_of_and_agrees_at_bucket_close():
+    df = candles()
+    streaming = HeikinAshiATRStrategy(indicator_mode="streaming")
+    streaming.load_historical_candles(df)
+    reference = HeikinAshiATRStrategy(indicator_mode="reference")
+    reference.load_historical_candles(df)
+
+    new, ref = streaming.df, reference.df
+    bucket = ref["timestamp"].dt.floor("15min")
+    closes_bucket = (bucket != bucket.shift(-1)).to_numpy().copy()
+    closes_bucket[-1] = False               # the newest bucket is still open
+    valid = ~np.isnan(new["rsi_htf"].to_numpy())
+
+    rows = closes_bucket & valid
+    assert rows.sum() > 20
+    assert np.allclose(new["rsi_htf"].to_numpy()[rows], ref["rsi_htf"].to_numpy()[rows],
+                       rtol=1e-12, atol=1e-9)
+
+
+def test_atr_epsilon_deviation_is_within_ulps():
+    df = candles(days=1)
+    high, low, close = df["high"].copy(), df["low"].copy(), df["close"].copy()
+    high.iloc[80] = low.iloc[80] = close.iloc[80]   # one flat candle late in the series
+
+    reference = ta.atr(high, low, close, length=14).to_numpy()
+    atr = StreamingATR(14)
+    streaming = np.array([atr.update(h, l, c) for h, l, c in zip(high, low, close)])
+
+    # As-of values: NaN until length + 1 candles, when ta.atr on the whole
+    # series starts returning values
+    valid = ~np.isnan(streaming)
+    assert valid.sum() == len(df) - 14
+    deviation = np.abs(streaming[valid] - reference[valid]) / reference[valid]
+    assert deviation.max() < 1e-13
@@ -0,0 +1,90 @@
+"""
+LtpBoard: seqlock reads, stuck writers and board replacement
+"""
+import threading
+import time
+import uuid
+
+import pytest
+
+import ltp_board
+from ltp_board import LtpBoard
+
+
+@pytest.fixture
+def name():
+    return f"ltp_test_{uuid.uuid4().hex[:8]}"
+
+
+def test_write_then_read(name):
+    writer = LtpBoard.create(name, capacity=8)
+    reader = LtpBoard.attach(name)
+    try:
+        writer.write("13", 24510.5, updated_at=time.time())
+        assert reader.read_raw("13")[1] == 24510.5
+        assert reader.read_raw("25") is None
+        writer.write("13", 24511.0, updated_at=time.time() - 60)
+        assert reader.read_raw("13", max_age=5) is None
+    finally:
+        reader.close()
+        writer.close()
+
+
+def test_slot_stuck_mid_write_gives_up(name):
+    writer = LtpBoard.create(name, capacity=8)
+    reader = LtpBoard.attach(name)
+    try:
+        writer.write("13", 100.0)
+        writer._view[1][0] += 1                 # writer "died" with the seq odd
+        started = time.monotonic()
+        assert reader.read_raw("13") is None
+        assert time.monotonic() - started < 1.0
+        assert reader.read_failures == 1
+    finally:
+        reader.close()
+        writer.close()
+
+
+def test_reader_never_sees_a_torn_pair(name):
+    writer = LtpBoard.create(name, capacity=8)
+    reader = LtpBoard.attach(name)
+    stop = threading.Event()
+
+    def write():
+        i = 1
+        while not stop.is_set():
+            writer.write("13", float(i), updated_at=float(i))
+            i += 1
+
+    thread = threading.Thread(target=write)
+    writer.write("13", 0.0, updated_at=0.0)
+    thread.start()
+    try:
+        for _ in range(20000):
+            quote = reader.read_raw("13")
+            if quote is not None:
+                assert quote[0] == quote[1]
+    finally:
+        stop.set()
+        thread.join()
+        reader.close()
+        writer.close()
+
+
+def test_reader_follows_a_recreated_board(name, monkeypatch):
+    monkeypatch.setattr(ltp_board, "RECHECK_INTERVAL", 0.0)
+    writer = LtpBoard.create(name, capacity=8)
+    reader = LtpBoard.attach(name)
+    writer.write("13", 100.0)
+    assert reader.read_raw("13")[1] == 100.0
+
+    writer.close()                              # streamer restarts
+    assert reader.read_raw("13") is None        # closed board is not trusted
+    writer = LtpBoard.create(name, capacity=8)
+    writer.write("13", 200.0)
+    try:
+        assert reader.read_raw("13")[1] == 200.0
+        assert reader.reattaches == 1
+    finally:
+        reader.close()
+        writer.close()
@@ -0,0 +1,113 @@
+"""
+OrderFanOut: concurrent placement, results in user order, latency per user
+"""
+import threading
+import time
+
+import pytest
+
+import order_executor
+from order_executor import BrokerClientPool, OrderFanOut
+from order_queue import PRIORITY_ENTRY
+
+
+class FakeContext:
+
+    def __init__(self, client_id, access_token, pool=None):
+        self.client_id = client_id
+
+
+class FakeDhan:
+    """dhanhq stand-in whose place_order takes `delays[client_id]` seconds."""
+
+    delays = {}
+
+    def __init__(self, context):
+        self.client_id = context.client_id
+
+    def place_order(self, **order):
+        time.sleep(self.delays[self.client_id])
+        if self.client_id == "c13":
+            return {"status": "failure", "remarks": "RMS rejection"}
+        return {"status": "success", "data": {"orderId": f"{self.client_id}-1"}}
+
+
+@pytest.fixture
+def fan_out(monkeypatch):
+    monkeypatch.setattr(order_executor, "DhanContext", FakeContext)
+    monkeypatch.setattr(order_executor, "dhanhq", FakeDhan)
+    users = [2, 11, 12, 13]
+    creds = {str(u): {"dhan_creds": {"client_id": f"c{u}", "access_token": "t"}} for u in users}
+    fan_out = OrderFanOut(BrokerClientPool(users, creds), max_workers=1, rate=100, burst=10)
+    yield fan_out
+    fan_out.scheduler.stop()
+    fan_out.executor.shutdown()
+
+
+def place(user_id, dhan):
+    return dhan.place_order(security_id="54033")
+
+
+def test_orders_are_placed_concurrently_and_returned_in_user_order(fan_out):
+    FakeDhan.delays = {"c2": 0.6, "c11": 0.2, "c12": 0.2, "c13": 0.2}
+    settled = []
+
+    def settle(user_id, res, ack_ms, error):
+        settled.append(user_id)
+        return user_id, res["status"], ack_ms
+
+    started = time.perf_counter()
+    results = fan_out.run(place, settle, [2, 11, 12, 13], PRIORITY_ENTRY)
+    elapsed = time.perf_counter() - started
+
+    # One dispatcher per account: the slowest broker call bounds the fan-out
+    assert elapsed < 0.6 + 0.3
+    assert [r[:2] for r in results] == [(2, "success"), (11, "success"), (12, "success"), (13, "failure")]
+    assert results[0][2] >= 600 > results[1][2] >= 200
+
+    # The single worker settled the fast acks without waiting on user 2's order
+    assert settled[-1] == 2
+
+    stats = fan_out.latency_stats()
+    assert [stats[u]["count"] for u in (2, 11, 12, 13)] == [1, 1, 1, 1]
+    assert [stats[u]["errors"] for u in (2, 11, 12, 13)] == [0, 0, 0, 1]
+    assert stats[2]["max_ms"] >= 600
+
+
+def test_a_failed_broker_call_is_settled_with_the_error(fan_out):
+    FakeDhan.delays = {"c2": 0.0, "c11": 0.0}
+
+    def broken(user_id, dhan):
+        if user_id == 11:
+            raise ConnectionError("broker unreachable")
+        return place(user_id, dhan)
+
+    results = fan_out.run(broken, lambda user_id, res, ack_ms, error: (user_id, res, error),
+                          [2, 11], PRIORITY_ENTRY)
+
+    assert results[0][1]["status"] == "success" and results[0][2] is None
+    assert results[1][1] is None and isinstance(results[1][2], ConnectionError)
+    assert fan_out.latency_stats()[11]["errors"] == 1
+
+
+def test_no_worker_waits_for_a_queued_order(fan_out):
+    FakeDhan.delays = {"c2": 0.0, "c11": 0.0, "c12": 0.0, "c13": 0.0}
+    release = threading.Event()
+
+    def slow_for_12(user_id, dhan):
+        if user_id == 12:
+            release.wait(2)
+        return place(user_id, dhan)
+
+    done = []
+    runner = threading.Thread(target=lambda: done.append(
+        fan_out.run(slow_for_12, lambda user_id, res, ack_ms, error: user_id, [12, 2], PRIORITY_ENTRY)
+    ))
+    runner.start()
+    time.sleep(0.1)
+
+    # The only worker is free while user 12's order is still with the broker
+    assert fan_out.executor.submit(lambda: "free").result(0.5) == "free"
+    release.set()
+    runner.join(2)
+    assert done == [[12, 2]]
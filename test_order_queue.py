@@ -0,0 +1,50 @@
+"""
+TokenBucket and OrderScheduler: rate limit, lane order and stop
+"""
+import threading
+
+import pytest
+
+from order_queue import (OrderScheduler, PRIORITY_ENTRY, PRIORITY_EXIT, PRIORITY_KILL,
+                         SchedulerStopped, TokenBucket)
+
+
+def test_token_bucket_allows_a_burst_then_the_rate():
+    bucket = TokenBucket(rate=10, burst=3)
+    now = bucket.updated
+    assert [bucket.take(now) for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.take(now) == pytest.approx(0.1)
+    assert bucket.take(now + 0.11) == 0.0                # refilled one token
+    assert bucket.take(now + 10) == 0.0
+    assert bucket.tokens == pytest.approx(2)             # refill capped at the burst
+
+
+def test_kill_and_exit_orders_overtake_queued_entries():
+    scheduler = OrderScheduler(["u"], rate=1000, burst=1)
+    gate = threading.Event()
+    sent = []
+    try:
+        blocker = scheduler.submit("u", PRIORITY_ENTRY, gate.wait)
+        futures = [scheduler.submit("u", lane, sent.append, name) for lane, name in
+                   [(PRIORITY_ENTRY, "entry1"), (PRIORITY_ENTRY, "entry2"),
+                    (PRIORITY_EXIT, "exit"), (PRIORITY_KILL, "kill")]]
+        gate.set()
+        blocker.result(2)
+        for future in futures:
+            future.result(2)
+        assert sent == ["kill", "exit", "entry1", "entry2"]
+    finally:
+        scheduler.stop()
+
+
+def test_stop_fails_queued_orders():
+    scheduler = OrderScheduler(["u"], rate=0.001, burst=1)
+    first = scheduler.submit("u", PRIORITY_ENTRY, lambda: "sent")
+    queued = scheduler.submit("u", PRIORITY_ENTRY, lambda: "sent")
+    assert first.result(2) == "sent"
+
+    scheduler.stop()
+    with pytest.raises(SchedulerStopped):
+        queued.result(2)
+    with pytest.raises(SchedulerStopped):
+        scheduler.submit("u", PRIORITY_KILL, lambda: "sent")
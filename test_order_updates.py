@@ -0,0 +1,60 @@
+"""
+OrderStateTracker: status transitions, listeners and pruning
+"""
+import threading
+
+from order_updates import OrderStateTracker, correlation_id
+
+
+def test_update_before_ack_is_matched_by_tag():
+    tracker = OrderStateTracker()
+    tag = tracker.expect("2_13_ENTRY_1", user_id=2)
+    assert tag == correlation_id("2_13_ENTRY_1") and len(tag) <= 25
+
+    tracker.on_update({"CorrelationId": tag, "OrderNo": "1001", "Status": "Pending", "Quantity": 35})
+    tracker.acknowledged("2_13_ENTRY_1", {"status": "success", "data": {"orderId": "1001"}})
+    tracker.on_update({"OrderNo": "1001", "Status": "Traded", "TradedQty": 35, "AvgTradedPrice": 101.5})
+
+    state = tracker.get("2_13_ENTRY_1")
+    assert (state["status"], state["order_no"], state["filled_qty"], state["avg_price"]) == \
+        ("TRADED", "1001", 35, 101.5)
+    assert tracker.wait("2_13_ENTRY_1", timeout=0)["status"] == "TRADED"
+
+
+def test_failed_ack_rejects_and_unknown_updates_are_counted():
+    tracker = OrderStateTracker()
+    tracker.expect("11_13_EXIT_1", user_id=11)
+    tracker.acknowledged("11_13_EXIT_1", {"status": "failure", "remarks": "RMS: margin"})
+    assert tracker.get("11_13_EXIT_1")["status"] == "REJECTED"
+
+    tracker.on_update({"OrderNo": "999", "Status": "Traded"})
+    assert tracker.unmatched == 1
+
+
+def test_listener_runs_without_the_lock_held():
+    tracker = OrderStateTracker()
+    seen = []
+
+    # A listener that reads the tracker would deadlock if called under its lock
+    def listener(custom_order_id, state):
+        seen.append(tracker.get(custom_order_id)["status"])
+    tracker.subscribe(listener)
+
+    tag = tracker.expect("12_13_ENTRY_1", user_id=12)
+    worker = threading.Thread(target=tracker.on_update, args=({"CorrelationId": tag, "Status": "Traded"},))
+    worker.start()
+    worker.join(2)
+    assert not worker.is_alive()
+    assert seen == ["TRADED"]
+
+
+def test_terminal_orders_are_pruned_after_retention():
+    tracker = OrderStateTracker(retention=0)
+    tag = tracker.expect("13_13_ENTRY_1", user_id=13)
+    tracker.on_update({"CorrelationId": tag, "OrderNo": "1", "Status": "Cancelled"})
+    tracker.expect("13_13_ENTRY_2", user_id=13)     # prunes on the next registration
+
+    assert tracker.get("13_13_ENTRY_1") is None
+    assert len(tracker) == 1 and tracker.pruned == 1
+    tracker.on_update({"OrderNo": "1", "Status": "Cancelled"})
+    assert tracker.unmatched == 1
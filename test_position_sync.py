@@ -0,0 +1,108 @@
+"""
+StopLossTargetSync: TTL cache, conditional revalidation and skipped writes
+"""
+import pytest
+
+import position_sync
+from position_sync import StopLossTargetSync
+
+
+class FakeApi:
+    """SL/TP endpoint with an ETag that changes on every write."""
+
+    def __init__(self):
+        self.values = {}
+        self.version = 0
+        self.gets = []
+        self.puts = 0
+
+    def etag(self):
+        return f'"v{self.version}"'
+
+    def fetch_stop_loss_target(self, unique_id, etag=None):
+        self.gets.append(etag)
+        if etag == self.etag():
+            return None, etag
+        return self.values[unique_id], self.etag()
+
+    def update_stop_loss_target(self, unique_id, stop_loss=None, target=None):
+        self.puts += 1
+        self.values[unique_id] = (stop_loss, target)
+        self.version += 1
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(position_sync, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def api():
+    api = FakeApi()
+    api.values["u1"] = (90.0, 120.0)
+    return api
+
+
+def test_values_are_served_from_the_cache_within_the_ttl(api, clock):
+    sync = StopLossTargetSync(api, ttl=3.0)
+    sync.track("u1", 90.0, 120.0)
+
+    clock.now += 2.9
+    assert sync.get("u1") == (90.0, 120.0)
+    assert api.gets == []
+
+    clock.now += 0.2
+    assert sync.get("u1") == (90.0, 120.0)
+    assert api.gets == [None]
+
+
+def test_not_modified_restarts_the_ttl(api, clock):
+    sync = StopLossTargetSync(api, ttl=3.0)
+    sync.get("u1")                                  # first load stores the ETag
+
+    clock.now += 3.0
+    assert sync.get("u1") == (90.0, 120.0)
+    assert api.gets == [None, '"v0"']
+    assert sync.not_modified == 1
+
+    clock.now += 2.0
+    sync.get("u1")
+    assert len(api.gets) == 2
+
+
+def test_identical_write_is_skipped(api, clock):
+    sync = StopLossTargetSync(api)
+    sync.track("u1", 90.0, 120.0)
+
+    assert sync.set("u1", 90.0, 120.0) is False
+    assert api.puts == 0 and sync.skipped_writes == 1
+
+    assert sync.set("u1", 95.0, 120.0) is True
+    assert api.puts == 1 and api.values["u1"] == (95.0, 120.0)
+
+
+def test_own_write_is_not_reported_as_a_server_change(api, clock):
+    sync = StopLossTargetSync(api, ttl=3.0)
+    sync.get("u1")
+
+    sync.set("u1", 95.0, 125.0)
+    clock.now += 3.0
+    assert sync.get("u1") == (95.0, 125.0)
+    assert sync.external_changes == 0
+
+    # An admin-side edit is picked up on the next revalidation
+    api.update_stop_loss_target("u1", 80.0, 130.0)
+    clock.now += 3.0
+    assert sync.get("u1") == (80.0, 130.0)
+    assert sync.external_changes == 1
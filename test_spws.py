@@ -0,0 +1,66 @@
+"""
+HighPerformanceStreamer: strike LTPs are conflated per token
+"""
+import asyncio
+
+import spws
+from spws import HighPerformanceStreamer
+
+
+class FakeApi:
+
+    def __init__(self):
+        self.posts = []
+
+    async def post_strike_ltp(self, token, ltp, symbol):
+        self.posts.append((token, ltp))
+        return 200, "ok"
+
+
+def tick(token, ltp):
+    return {"security_id": token, "LTP": ltp}
+
+
+def test_only_the_latest_ltp_is_sent(monkeypatch):
+    monkeypatch.setattr(spws, "RATE_LIMIT_SECONDS", 0.05)
+    api = FakeApi()
+
+    async def scenario():
+        streamer = HighPerformanceStreamer(api, token_symbol={"101": "CE", "102": "PE"})
+        worker = asyncio.create_task(streamer.api_worker())
+
+        for ltp in (10.0, 10.5, 11.0):
+            await streamer.process_tick(tick("101", ltp))
+        await streamer.process_tick(tick("102", 20.0))
+        await asyncio.sleep(0.01)
+        assert api.posts == [("101", 11.0), ("102", 20.0)]
+        assert streamer.ticks_conflated == 2
+
+        # Inside the rate-limit window: held, then sent once with the latest LTP
+        await streamer.process_tick(tick("101", 11.5))
+        await streamer.process_tick(tick("101", 12.0))
+        await asyncio.sleep(0.01)
+        assert len(api.posts) == 2
+        await asyncio.sleep(0.1)
+        assert api.posts[2:] == [("101", 12.0)]
+
+        worker.cancel()
+
+    asyncio.run(scenario())
+
+
+def test_unchanged_ltp_is_not_resent(monkeypatch):
+    monkeypatch.setattr(spws, "RATE_LIMIT_SECONDS", 0.01)
+    api = FakeApi()
+
+    async def scenario():
+        streamer = HighPerformanceStreamer(api, token_symbol={"101": "CE"})
+        worker = asyncio.create_task(streamer.api_worker())
+        await streamer.process_tick(tick("101", 10.0))
+        await asyncio.sleep(0.05)
+        await streamer.process_tick(tick("101", 10.0))
+        await asyncio.sleep(0.05)
+        assert api.posts == [("101", 10.0)]
+        worker.cancel()
+
+    asyncio.run(scenario())
@@ -0,0 +1,59 @@
+"""
+StrikeIndex: dict lookup of option contracts, rebuilt only on content change
+"""
+import os
+
+import pandas as pd
+
+from strike_index import StrikeIndex
+
+
+def write_strikes(path, rows):
+    pd.DataFrame(rows, columns=["token", "index_name", "DOE", "strike_price", "position", "symbol"]) \
+        .to_excel(path, index=False)
+
+
+ROWS = [
+    (54001, "BANKNIFTY", "2026-10-28", 52000, "CE", "BANKNIFTY 52000 CE"),
+    (54002, "BANKNIFTY", "2026-10-28", 52000, "PE", "BANKNIFTY 52000 PE"),
+    (54003, "BANKNIFTY", "2026-10-28", 52000, "CE", "duplicate"),
+]
+
+
+def test_lookup(tmp_path):
+    path = str(tmp_path / "Bank-Nifty.xlsx")
+    write_strikes(path, ROWS)
+    index = StrikeIndex(path, lot_qty=35, exchange="NSE_FNO")
+
+    assert len(index) == 2
+    assert index.lookup(52000.0, "CE") == {
+        "token": "54001", "exchange": "NSE_FNO", "index_name": "BANKNIFTY", "DOE": "2026-10-28",
+        "strike_price": 52000, "position": "CE", "symbol": "BANKNIFTY 52000 CE", "lot_qty": 35,
+    }
+    assert index.lookup(52100, "CE") is None
+
+
+def test_rebuilt_only_when_the_content_changes(tmp_path):
+    path = str(tmp_path / "Bank-Nifty.xlsx")
+    write_strikes(path, ROWS)
+    index = StrikeIndex(path, lot_qty=35, exchange="NSE_FNO")
+
+    # Same bytes rewritten: new mtime, same digest
+    with open(path, "rb") as f:
+        data = f.read()
+    with open(path, "wb") as f:
+        f.write(data)
+    os.utime(path, ns=(0, 1))
+    assert index.refresh() is False
+
+    write_strikes(path, ROWS + [(54004, "BANKNIFTY", "2026-10-28", 52100, "CE", "BANKNIFTY 52100 CE")])
+    assert index.lookup(52100, "CE")["token"] == "54004"
+
+
+def test_missing_file_is_served_once_it_appears(tmp_path):
+    path = str(tmp_path / "Bank-Nifty.xlsx")
+    index = StrikeIndex(path, lot_qty=35, exchange="NSE_FNO")
+    assert len(index) == 0 and index.lookup(52000, "CE") is None
+
+    write_strikes(path, ROWS)
+    assert index.lookup(52000, "PE")["token"] == "54002"
@@ -0,0 +1,65 @@
+"""
+TickCandleBuilder: ticks bucketed into session-aligned bars
+"""
+from datetime import datetime
+
+from tick_candles import IST, TickCandleBuilder, tick_time
+
+
+def at(clock):
+    return IST.localize(datetime.strptime(f"2026-10-16 {clock}", "%Y-%m-%d %H:%M:%S"))
+
+
+def test_buckets_are_aligned_to_the_session_open():
+    builder = TickCandleBuilder("3min")
+    assert builder.bucket_start(at("09:15:00")) == at("09:15:00")
+    assert builder.bucket_start(at("09:17:59")) == at("09:15:00")
+    assert builder.bucket_start(at("09:18:00")) == at("09:18:00")
+    assert builder.bucket_start(at("15:29:59")) == at("15:27:00")
+    assert builder.bucket_start(at("09:14:59")) is None
+    assert builder.bucket_start(at("15:30:00")) is None
+
+    assert TickCandleBuilder("15min").bucket_start(at("09:44:00")) == at("09:30:00")
+
+
+def test_bar_closes_on_the_first_tick_of_a_later_bucket():
+    builder = TickCandleBuilder("3min")
+    assert builder.update(at("09:15:01"), 100.0) is None
+    assert builder.update(at("09:16:00"), 103.0) is None
+    assert builder.update(at("09:17:59"), 99.0) is None
+    assert builder.update(at("09:17:30"), 101.0) is None
+
+    closed = builder.update(at("09:21:05"), 102.0)      # 09:18 bucket had no tick
+    assert closed == {"start_time": at("09:15:00").isoformat(), "open": 100.0, "high": 103.0,
+                      "low": 99.0, "close": 101.0, "volume": 0}
+    assert builder.bar["start_time"] == at("09:21:00").isoformat()
+
+
+def test_late_and_out_of_session_ticks_are_ignored():
+    builder = TickCandleBuilder("3min")
+    builder.update(at("09:18:10"), 100.0)
+    assert builder.update(at("09:17:50"), 50.0) is None
+    assert builder.update(at("15:30:01"), 50.0) is None
+    assert builder.bar["low"] == 100.0
+
+
+def test_volume_is_the_change_in_day_volume():
+    builder = TickCandleBuilder("3min")
+    builder.update(at("09:15:01"), 100.0, cumulative_volume=1000)
+    builder.update(at("09:16:00"), 100.0, cumulative_volume=1040)
+    closed = builder.update(at("09:18:00"), 100.0, cumulative_volume=1100)
+    assert closed["volume"] == 40
+    assert builder.bar["volume"] == 60
+
+
+def test_flush_closes_the_bar_once_its_end_has_passed():
+    builder = TickCandleBuilder("3min")
+    builder.update(at("09:15:01"), 100.0)
+    assert builder.flush(at("09:17:59")) is None
+    assert builder.flush(at("09:18:00"))["start_time"] == at("09:15:00").isoformat()
+    assert builder.bar is None
+
+
+def test_tick_time_uses_the_last_trade_time():
+    assert tick_time({"LTT": "09:16:30"}, now=at("09:16:31")) == at("09:16:30")
+    assert tick_time({}, now=at("09:16:31")) == at("09:16:31")
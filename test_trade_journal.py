@@ -0,0 +1,48 @@
+"""
+TradeJournal: batched writes, size rotation and offline scanning
+"""
+import json
+import os
+
+from trade_journal import TradeJournal, journal_files, scan_journal
+
+
+def test_close_writes_every_queued_record(tmp_path):
+    path = str(tmp_path / "dhan_response.txt")
+    journal = TradeJournal(path, flush_interval=0.01, fsync="off")
+    for i in range(500):
+        journal.write({"user_id": i % 3, "status": "success" if i % 2 else "failed", "n": i})
+    journal.close()
+
+    with open(path) as f:
+        records = [json.loads(line) for line in f]
+    assert [r["n"] for r in records] == list(range(500))
+    assert all("journal_ts" in r for r in records)
+    assert journal.written == 500 and journal.dropped == 0
+
+
+def test_rotated_files_scan_in_write_order(tmp_path):
+    path = str(tmp_path / "dhan_response.txt")
+    journal = TradeJournal(path, batch_size=1, flush_interval=0.01, fsync="off", max_bytes=200)
+    for i in range(20):
+        journal.write({"user_id": 2, "status": "success", "n": i})
+    journal.close()
+
+    files = journal_files([str(tmp_path / "dhan_response*.txt")])
+    assert len(files) > 1 and files[-1] == path
+    assert all(os.path.getsize(f) <= 200 for f in files)
+    assert [r["n"] for r in scan_journal(files)] == list(range(20))
+
+
+def test_scan_filters(tmp_path):
+    path = str(tmp_path / "dhan_response.txt")
+    journal = TradeJournal(path, flush_interval=0.01, fsync="off")
+    journal.write({"user_id": 2, "status": "failed", "order": "54033"})
+    journal.write({"user_id": 12, "status": "failed", "order": "54034"})
+    journal.write({"user_id": 2, "status": "success", "order": "54035"})
+    journal.close()
+
+    assert [r["order"] for r in scan_journal([path], user_id=2)] == ["54033", "54035"]
+    assert [r["order"] for r in scan_journal([path], status="failed", user_id=2)] == ["54033"]
+    assert [r["order"] for r in scan_journal([path], contains="54034")] == ["54034"]
+    assert list(scan_journal([path], until="2000-01-01")) == []
@@ -0,0 +1,59 @@
+"""
+walk_forward: the default warm-up lets the restarted recursions converge
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("pandas_ta")
+
+from backtest import candle_arrays, compute_indicators
+from walk_forward import WARMUP_TOLERANCE, run_walk_forward, warmup_days_for, window_slices
+
+
+def candles(days=12, seed=3):
+    rng = np.random.default_rng(seed)
+    rows, price = [], 24000.0
+    for day in pd.bdate_range("2026-09-01", periods=days):
+        for ts in pd.date_range(f"{day.date()} 09:15", f"{day.date()} 15:27", freq="3min", tz="Asia/Kolkata"):
+            close = round(price + rng.normal(0, 8), 2)
+            high = max(price, close) + abs(rng.normal(0, 4))
+            low = min(price, close) - abs(rng.normal(0, 4))
+            rows.append((ts, price, high, low, close))
+            price = close
+    return pd.DataFrame(rows, columns=["timestamp", "open", "high", "low", "close"])
+
+
+def test_warmup_days_grow_with_the_length():
+    columns = candle_arrays(candles(days=2))
+    dates = columns["timestamp"].dt.date.to_numpy()
+
+    # 25 buckets of 15min per session
+    assert warmup_days_for(columns["wall_ns"], dates, 14, "15min") == 5
+    assert warmup_days_for(columns["wall_ns"], dates, 21, "15min") == 7
+    assert warmup_days_for(columns["wall_ns"], dates, 14, "3min") == 1
+
+
+def test_window_indicators_match_the_full_history():
+    columns = candle_arrays(candles())
+    dates = columns.pop("timestamp").dt.date.to_numpy()
+    full = compute_indicators(columns)
+
+    warmup_days = warmup_days_for(columns["wall_ns"], dates, 14, "15min")
+    window = window_slices(dates, 4, 1, warmup_days=warmup_days)[-1]
+    warm_lo, lo, hi = window["test"]
+    assert warm_lo > 0
+
+    sliced = compute_indicators({name: values[warm_lo:hi] for name, values in columns.items()})
+    for name in ("ha_close", "atr", "rsi_ltf", "rsi_htf"):
+        expected = full[name][lo:hi]
+        actual = sliced[name][lo - warm_lo:]
+        assert np.all(np.abs(actual - expected) <= WARMUP_TOLERANCE * np.abs(expected)), name
+
+
+def test_grid_without_lengths_uses_the_strategy_defaults():
+    windows, _ = run_walk_forward(candles(days=8), {"atr_mult": [2.0, 2.5]},
+                                  train_days=4, test_days=2, workers=1)
+
+    assert len(windows) == 2
+    assert set(windows["atr_len"]) == {14} and set(windows["rsi_len"]) == {14}
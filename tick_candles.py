@@ -0,0 +1,249 @@
+"""
+Tick-to-candle builder
+
+Rolls index ticks from dhanhq.MarketFeed into OHLCV bars aligned to the IST
+session (09:15 + k * timeframe), so the trader gets each 3-min candle from
+its own websocket the moment it closes instead of a DB round trip.
+
+- TickCandleBuilder aggregates one instrument for one timeframe ("3min",
+  "15min", ...). A bar closes on the first tick of a later bucket or, when
+  ticks stop, once the clock passes its end (`flush`).
+- Volume is the change in the cumulative day volume of Quote packets (or the
+  sum of traded quantities). Index ticks carry no traded volume, so index
+  bars report 0 unless the exchange sends it.
+- TickCandleFeed runs the websocket on its own thread and exposes the same
+  consumer side as candle_feed.ClosedCandleFeed (`live`, `get`, `mark_seen`).
+  After a reconnect the history gap is backfilled, and the bar that was
+  already forming at connect time is taken from the API when it closes.
+"""
+
+import asyncio
+import logging
+import os
+from datetime import datetime, time as time_c, timedelta
+
+import pandas as pd
+import pytz
+from dhanhq import DhanContext, MarketFeed
+
+from candle_feed import ClosedCandleFeed
+
+
+logger = logging.getLogger(__name__)
+
+IST = pytz.timezone("Asia/Kolkata")
+
+SESSION_OPEN = time_c(9, 15)
+SESSION_CLOSE = time_c(15, 30)
+
+
+def tick_time(response, now=None):
+    """Exchange time of a MarketFeed packet (its "HH:MM:SS" LTT on today's IST date)."""
+    now = now or datetime.now(IST)
+    ltt = response.get("LTT")
+    if not ltt:
+        return now
+    try:
+        clock = datetime.strptime(ltt, "%H:%M:%S").time()
+    except ValueError:
+        return now
+    return IST.localize(datetime.combine(now.date(), clock))
+
+
+class TickCandleBuilder:
+    """OHLCV bars of one instrument and timeframe, built tick by tick."""
+
+    def __init__(self, timeframe="3min", session_open=SESSION_OPEN, session_close=SESSION_CLOSE):
+        self.timeframe = pd.Timedelta(timeframe).to_pytimedelta()
+        self.session_open = session_open
+        self.session_close = session_close
+        self.reset()
+
+    def reset(self):
+        """Drops the open bar (after a feed gap its ticks are incomplete)."""
+        self.bar = None
+        self.start = None
+        self._volume_base = None
+
+    def bucket_start(self, ts):
+        """Start of the session bucket containing `ts`, or None outside the session."""
+        ts = ts.astimezone(IST)
+        session_open = IST.localize(datetime.combine(ts.date(), self.session_open))
+        session_close = IST.localize(datetime.combine(ts.date(), self.session_close))
+        if not session_open <= ts < session_close:
+            return None
+        return session_open + ((ts - session_open) // self.timeframe) * self.timeframe
+
+    def _close(self):
+        bar = self.bar
+        self.bar = None
+        self.start = None
+        return bar
+
+    def update(self, ts, price, cumulative_volume=None, quantity=None):
+        """Adds one tick; returns the bar it closed, if any.
+
+        Ticks older than the open bar (out-of-order packets) are ignored.
+        """
+        start = self.bucket_start(ts)
+        if start is None or (self.start is not None and start < self.start):
+            return None
+
+        closed = self._close() if self.start is not None and start > self.start else None
+
+        if cumulative_volume is not None:
+            if self._volume_base is None or cumulative_volume < self._volume_base:
+                self._volume_base = cumulative_volume  # first tick of the day / feed reset
+            traded = cumulative_volume - self._volume_base
+            self._volume_base = cumulative_volume
+        else:
+            traded = quantity or 0
+
+        if self.bar is None:
+            self.start = start
+            self.bar = {
+                "start_time": start.isoformat(), "open": price, "high": price,
+                "low": price, "close": price, "volume": traded,
+            }
+        else:
+            bar = self.bar
+            bar["high"] = max(bar["high"], price)
+            bar["low"] = min(bar["low"], price)
+            bar["close"] = price
+            bar["volume"] += traded
+        return closed
+
+    def flush(self, now):
+        """Closes the open bar if `now` is past its end (no tick opened the next one)."""
+        if self.start is not None and now >= self.start + self.timeframe:
+            return self._close()
+        return None
+
+
+class TickCandleFeed(ClosedCandleFeed):
+    """Closed index candles built from the Dhan MarketFeed websocket."""
+
+    def __init__(self, tokens, dhan_context, backfill=None, timeframe="3min",
+                 exchange_segment=MarketFeed.IDX, request_code=MarketFeed.Quote, version="v2",
+                 close_grace=1.0, reconnect_delay=1.0, max_reconnect_delay=30.0):
+        super().__init__(MarketFeed.market_feed_wss, tokens, backfill=backfill, timeframe=timeframe,
+                         reconnect_delay=reconnect_delay, max_reconnect_delay=max_reconnect_delay)
+        self.dhan_context = dhan_context
+        self.instruments = [(exchange_segment, token, request_code) for token in self.tokens]
+        self.version = version
+        self.close_grace = timedelta(seconds=close_grace)
+
+        self.builders = {token: TickCandleBuilder(timeframe) for token in self.tokens}
+        self.partial = {}                   # token -> start of the bar forming at connect time
+
+        # Metrics
+        self.ticks = 0
+        self.built = 0
+
+    # -------------------------------------------------------
+    # Bars
+    # -------------------------------------------------------
+
+    def _emit(self, token, bar):
+        if self.partial.get(token) == bar["start_time"]:
+            # Missed the start of this bar: prefer the API's copy (fetched off the tick loop)
+            del self.partial[token]
+            asyncio.get_running_loop().run_in_executor(None, self._replace_partial, token, bar)
+            return
+        if self._deliver(token, bar):
+            self.built += 1
+
+    def _replace_partial(self, token, bar):
+        self._backfill_token(token)
+        last = self.last_seen.get(token)
+        if last is None or last < pd.Timestamp(bar["start_time"]):
+            logger.warning(f"Using partial tick candle {bar['start_time']} for token {token}")
+            if self._deliver(token, bar):
+                self.built += 1
+
+    def _on_tick(self, response):
+        if not response or "LTP" not in response:
+            return
+        token = str(response.get("security_id"))
+        builder = self.builders.get(token)
+        if builder is None:
+            return
+        price = float(response["LTP"])
+        if price <= 0:
+            return
+
+        self.ticks += 1
+        closed = builder.update(
+            tick_time(response),
+            price,
+            cumulative_volume=response.get("volume"),
+            quantity=response.get("LTQ")
+        )
+        if closed is not None:
+            self._emit(token, closed)
+
+    def _flush(self):
+        now = datetime.now(IST) - self.close_grace
+        for token, builder in self.builders.items():
+            closed = builder.flush(now)
+            if closed is not None:
+                self._emit(token, closed)
+
+    # -------------------------------------------------------
+    # Websocket
+    # -------------------------------------------------------
+
+    async def _subscribe(self):
+        feed = MarketFeed(self.dhan_context, self.instruments, self.version)
+        await feed.connect()
+        try:
+            loop = asyncio.get_running_loop()
+            for builder in self.builders.values():
+                builder.reset()
+            now = datetime.now(IST)
+            self.partial = {
+                token: start.isoformat()
+                for token, start in ((t, b.bucket_start(now)) for t, b in self.builders.items())
+                if start is not None
+            }
+
+            await loop.run_in_executor(None, self._backfill)
+            self.connected.set()
+            logger.info(f"Tick candle feed connected ({len(self.tokens)} tokens)")
+
+            while not self._stop.is_set():
+                try:
+                    response = await asyncio.wait_for(feed.get_instrument_data(), timeout=1)
+                except asyncio.TimeoutError:
+                    response = None
+                if response is not None:
+                    self._on_tick(response)
+                self._flush()
+        finally:
+            await feed.disconnect()
+
+    async def _run(self):
+        delay = self.reconnect_delay
+        while not self._stop.is_set():
+            try:
+                await self._subscribe()
+                delay = self.reconnect_delay
+            except Exception as e:
+                logger.error(f"Tick candle feed disconnected ({type(e).__name__}: {e}), polling fallback active")
+            finally:
+                self.connected.clear()
+
+            if self._stop.is_set():
+                return
+            self.reconnects += 1
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+
+def dhan_context_from_env():
+    """DhanContext from DHAN_CLIENT_ID / DHAN_ACCESS_TOKEN, defaulting to the spws credentials."""
+    import spws
+    return DhanContext(
+        os.getenv("DHAN_CLIENT_ID", spws.CLIENT_ID),
+        os.getenv("DHAN_ACCESS_TOKEN", spws.ACCESS_TOKEN)
+    )
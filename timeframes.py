@@ -0,0 +1,117 @@
+"""
+Timeframe bucketing shared by the strategies
+
+Maps a candle timestamp straight to its resample() bucket with integer
+arithmetic and keeps only the currently open higher-timeframe bar, instead of
+running `set_index("timestamp").resample(freq)` over the whole history.
+
+Buckets follow pandas resample(freq) defaults (origin="start_day",
+label/closed="left"): they are aligned to local midnight of the first
+candle seen, so "3min", "5min", "15min" and "60min" all line up with the
+09:15 IST session start exactly like the DataFrame path.
+"""
+
+import pandas as pd
+
+
+NAN = float("nan")
+DAY_NS = 86_400 * 1_000_000_000
+
+
+def wall_clock_ns(timestamp):
+    """Nanoseconds since epoch of the local wall-clock time of `timestamp`."""
+    ts = pd.Timestamp(timestamp)
+    if ts.tzinfo is not None:
+        ts = ts.tz_localize(None)
+    return ts.value
+
+
+def timeframe_ns(freq):
+    """Length of a fixed timeframe string ("3min", "15min", "60min", ...) in ns."""
+    try:
+        length = pd.Timedelta(freq).value
+    except ValueError as e:
+        raise ValueError(f"Unsupported timeframe {freq!r}: {e}") from None
+    if length <= 0:
+        raise ValueError(f"Timeframe must be positive, got {freq!r}")
+    return length
+
+
+class ClosedBar:
+    """A finished higher-timeframe bar and the empty buckets that followed it."""
+
+    __slots__ = ("bucket", "open", "high", "low", "last", "empty_after")
+
+    def __init__(self, bucket, open_, high, low, last, empty_after):
+        self.bucket = bucket
+        self.open = open_
+        self.high = high
+        self.low = low
+        self.last = last
+        self.empty_after = empty_after
+
+
+class TimeframeBucketAggregator:
+    """Tracks the open bar of one timeframe over a stream of (timestamp, value)."""
+
+    def __init__(self, freq):
+        self.freq = freq
+        self.freq_ns = timeframe_ns(freq)
+
+        self.origin = None
+        self.first_bucket = None
+        self.bucket = None
+
+        self.open = NAN
+        self.high = NAN
+        self.low = NAN
+        self.last = NAN
+
+    @property
+    def bucket_count(self):
+        """Buckets resample() would emit so far, empty ones included."""
+        if self.bucket is None:
+            return 0
+        return self.bucket - self.first_bucket + 1
+
+    def bucket_of(self, timestamp):
+        wall_ns = wall_clock_ns(timestamp)
+        if self.origin is None:
+            self.origin = wall_ns - wall_ns % DAY_NS
+        return (wall_ns - self.origin) // self.freq_ns
+
+    def bucket_start(self, bucket=None):
+        """Wall-clock start of `bucket` (default: the open bucket) as a naive Timestamp."""
+        if bucket is None:
+            bucket = self.bucket
+        return pd.Timestamp(self.origin + bucket * self.freq_ns)
+
+    def update(self, timestamp, value):
+        """Adds one value; returns the ClosedBar if this value opened a new bucket.
+
+        A value that maps to an older bucket than the open one (late candle)
+        is folded into the open bar rather than rewriting history.
+        """
+        bucket = self.bucket_of(timestamp)
+        closed = None
+
+        if self.bucket is None:
+            self.first_bucket = bucket
+        elif bucket > self.bucket:
+            closed = ClosedBar(
+                self.bucket, self.open, self.high, self.low, self.last,
+                empty_after=bucket - self.bucket - 1
+            )
+        else:
+            bucket = self.bucket
+
+        if closed is not None or self.bucket is None:
+            self.open = self.high = self.low = value
+        else:
+            self.high = max(self.high, value)
+            self.low = min(self.low, value)
+
+        self.bucket = bucket
+        self.last = value
+
+        return closed
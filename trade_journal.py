@@ -0,0 +1,247 @@
+"""
+Batched trade journal
+
+`TradeJournal.write(record)` only stamps the record and puts it on a queue;
+a background thread serializes queued records to JSON lines and appends
+them in batches, so the order path never waits on disk. If the queue is
+full the record is dropped and counted instead of blocking.
+
+    journal = TradeJournal("dhan_response.txt", fsync="interval", max_bytes=50_000_000)
+    journal.write({"user_id": 2, "status": "success", ...})
+    journal.close()             # drains the queue (also registered atexit)
+
+fsync policy: "batch" (after every batch), "interval" (at most every
+`fsync_interval` seconds) or "off" (leave it to the OS). The file rotates to
+dhan_response.YYYY-MM-DD[.N].txt when the day changes (`rotate_daily`) or it
+grows past `max_bytes`.
+
+Scanning (reads rotated files too, filters on raw bytes before parsing):
+
+    python trade_journal.py dhan_response*.txt --status failed --user 2 --since 2026-10-17T09:15
+    python trade_journal.py dhan_response*.txt --contains 54033 --fields user_id,custom_order_id,status
+    python trade_journal.py dhan_response*.txt --status success --count
+"""
+
+import argparse
+import atexit
+import glob
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import date, datetime
+
+
+logger = logging.getLogger(__name__)
+
+FSYNC_POLICIES = ("batch", "interval", "off")
+
+
+class TradeJournal:
+
+    def __init__(self, path="dhan_response.txt", batch_size=256, flush_interval=0.2,
+                 fsync="interval", fsync_interval=1.0, max_bytes=None, rotate_daily=True,
+                 queue_size=100_000):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {FSYNC_POLICIES}, got {fsync!r}")
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.max_bytes = max_bytes
+        self.rotate_daily = rotate_daily
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._file = None
+        self._day = None
+        self._last_fsync = 0.0
+
+        # Metrics
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+
+        self._thread = threading.Thread(target=self._run, name="trade-journal", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def write(self, record):
+        """Queues one record (a dict); never blocks."""
+        record = dict(record, journal_ts=datetime.now().isoformat(timespec="milliseconds"))
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    # -------------------------------------------------------
+    # Writer thread
+    # -------------------------------------------------------
+
+    def _open(self):
+        self._file = open(self.path, "ab")
+        if os.path.getsize(self.path):
+            self._day = date.fromtimestamp(os.path.getmtime(self.path))
+        else:
+            self._day = date.today()
+
+    def _rotated_path(self, day):
+        base, ext = os.path.splitext(self.path)
+        candidate = f"{base}.{day.isoformat()}{ext}"
+        n = 1
+        while os.path.exists(candidate):
+            candidate = f"{base}.{day.isoformat()}.{n}{ext}"
+            n += 1
+        return candidate
+
+    def _rotate_if_needed(self, incoming):
+        today = date.today()
+        size = self._file.tell()
+        if not size:
+            self._day = today
+            return
+        if (self.rotate_daily and today != self._day) or \
+                (self.max_bytes and size + incoming > self.max_bytes):
+            self._file.close()
+            os.replace(self.path, self._rotated_path(self._day))
+            self._open()
+            self._day = today
+
+    def _write_batch(self, records):
+        data = b"".join(json.dumps(r, default=str).encode() + b"\n" for r in records)
+        if self._file is None:
+            self._open()
+        self._rotate_if_needed(len(data))
+        self._file.write(data)
+        self._file.flush()
+
+        now = time.monotonic()
+        if self.fsync == "batch" or (self.fsync == "interval" and now - self._last_fsync >= self.fsync_interval):
+            os.fsync(self._file.fileno())
+            self._last_fsync = now
+        self.written += len(records)
+        self.batches += 1
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:           # close() sentinel
+                stopping = True
+                batch = [r for r in batch if r is not None]
+            if batch:
+                try:
+                    self._write_batch(batch)
+                except Exception as e:
+                    self.dropped += len(batch)
+                    logger.error(f"Trade journal write failed ({len(batch)} records lost): {e}")
+
+        if self._file is not None:
+            if self.fsync != "off":
+                os.fsync(self._file.fileno())
+            self._file.close()
+            self._file = None
+
+    def close(self, timeout=5.0):
+        """Writes everything queued so far and stops the writer."""
+        if not self._thread.is_alive():
+            return
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+
+# ---------------------------------------------------------------------------
+# Offline scanning
+# ---------------------------------------------------------------------------
+
+def _needle(key, value):
+    """Raw-bytes form of `"key": value` as json.dumps writes it (cheap prefilter)."""
+    return f'"{key}": {json.dumps(value)}'.encode()
+
+
+def scan_journal(paths, since=None, until=None, user_id=None, status=None, contains=None):
+    """Yields the records of the JSONL journal files matching every given filter.
+
+    `since` / `until` compare against `journal_ts` (ISO strings, any prefix
+    such as "2026-10-17T09:15"); records written before the journal had
+    timestamps never match a time filter.
+    """
+    needles = []
+    if user_id is not None:
+        needles.append(_needle("user_id", int(user_id)))
+    if status is not None:
+        needles.append(_needle("status", status))
+    if contains is not None:
+        needles.append(contains.encode())
+
+    for path in paths:
+        with open(path, "rb", buffering=1 << 20) as f:
+            for line in f:
+                if not all(n in line for n in needles):
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if user_id is not None and record.get("user_id") != int(user_id):
+                    continue
+                if status is not None and record.get("status") != status:
+                    continue
+                ts = record.get("journal_ts")
+                if since is not None and (ts is None or ts < since):
+                    continue
+                if until is not None and (ts is None or ts >= until):
+                    continue
+                yield record
+
+
+def _rotation_order(path):
+    # name.txt (active) last; name.YYYY-MM-DD.txt before name.YYYY-MM-DD.1.txt
+    parts = os.path.basename(path).split(".")[1:-1]
+    if not parts:
+        return (1, "", 0)
+    n = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else 0
+    return (0, parts[0], n)
+
+
+def journal_files(patterns):
+    """Expands globs in write order (rotated files by day and sequence, the active file last)."""
+    paths = {p for pattern in patterns for p in glob.glob(pattern)}
+    return sorted(paths, key=lambda p: (os.path.dirname(p), _rotation_order(p)))
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Scan and filter the JSONL trade journal")
+    parser.add_argument("files", nargs="+", help="journal files or globs (rotated files included)")
+    parser.add_argument("--since", help="journal_ts >= this ISO prefix")
+    parser.add_argument("--until", help="journal_ts < this ISO prefix")
+    parser.add_argument("--user", type=int)
+    parser.add_argument("--status")
+    parser.add_argument("--contains", help="raw substring, e.g. a token or order id")
+    parser.add_argument("--fields", help="comma-separated fields to print")
+    parser.add_argument("--count", action="store_true", help="print only the number of matches")
+    args = parser.parse_args()
+
+    matches = scan_journal(journal_files(args.files), since=args.since, until=args.until,
+                           user_id=args.user, status=args.status, contains=args.contains)
+    if args.count:
+        print(sum(1 for _ in matches))
+    else:
+        fields = args.fields.split(",") if args.fields else None
+        out = sys.stdout
+        for record in matches:
+            if fields:
+                record = {k: record.get(k) for k in fields}
+            out.write(json.dumps(record, default=str) + "\n")
@@ -0,0 +1,284 @@
+"""
+Walk-forward optimization for algo.HeikinAshiATRStrategy
+
+Rolls a train / test window over the trading days of one candle history
+(day partitioning from split_.py):
+
+- train: grid search on `train_days` days (sweep.evaluate_group), best
+  combination by P&L, lower drawdown breaking ties
+- test:  that combination runs untouched on the following `test_days` days
+
+Both slices get `warmup_days` of earlier candles so ATR / RSI / HTF RSI are
+warmed up; no trade opens in the warm-up. Each window restarts the Heikin
+Ashi and Wilder recursions, so by default the warm-up is sized from the
+longest atr_len / rsi_len in the grid: enough HTF buckets for the weight of
+the restarted state to fall below WARMUP_TOLERANCE (see warmup_days_for).
+The out-of-sample trades of all windows are stitched into one equity curve.
+
+Windows run in parallel on the shared-memory candles from sweep.py.
+
+Usage:
+    python walk_forward.py nifty50.csv --token 13 --train-days 10 --test-days 2 \\
+        --atr-len 10 14 21 --atr-mult 2 2.5 3 --rsi-len 9 14 --workers 4
+"""
+
+import argparse
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import sweep
+from backtest import candle_arrays
+from split_ import rolling_day_windows, trading_days
+from timeframes import timeframe_ns
+
+
+WINDOW_COLUMNS = (
+    ["window", "train_start", "train_end", "test_start", "test_end"]
+    + list(sweep.PARAMETERS)
+    + ["train_pnl", "train_max_drawdown", "train_trades",
+       "test_pnl", "test_hit_rate", "test_max_drawdown", "test_trades"]
+)
+
+# Weight the state a window starts from may keep in its first traded row
+WARMUP_TOLERANCE = 1e-3
+
+
+# -----------------------------------------------------------
+# Windows
+# -----------------------------------------------------------
+
+def warmup_days_for(wall_ns, trade_dates, length, htf, tolerance=WARMUP_TOLERANCE):
+    """Warm-up days after which a restarted Wilder RMA of `length` has converged.
+
+    After n updates the seed keeps (1 - 1/length) ** n of its weight; the
+    ATR adds `length` rows of SMA seed first. HTF RSI is the slowest column
+    (one update per `htf` bucket), so n is counted in buckets per trading
+    day. Overnight gaps only speed the decay up, so this is an upper bound.
+    """
+    if len(wall_ns) == 0:
+        return 1
+    updates = length + math.ceil(math.log(tolerance) / math.log(1 - 1 / length))
+    buckets = pd.Series(np.asarray(wall_ns) // timeframe_ns(htf))
+    buckets_per_day = buckets.groupby(np.asarray(trade_dates)).nunique().median()
+    return max(1, math.ceil(updates / buckets_per_day))
+
+
+def window_slices(trade_dates, train_days, test_days, step_days=None, warmup_days=None):
+    """Row ranges for every walk-forward window.
+
+    `trade_dates` holds the trade date of each candle (sorted). Returns
+    [{"train": (warm_lo, lo, hi), "test": (warm_lo, lo, hi), ...}] where
+    rows warm_lo..lo are warm-up only and lo..hi are traded. warmup_days=None
+    warms up on all earlier candles.
+    """
+    trade_dates = np.asarray(trade_dates)
+    dates = trading_days(pd.DataFrame({"trade_date": trade_dates}))
+
+    def first_row(date):
+        return int(np.searchsorted(trade_dates, date, side="left"))
+
+    def last_row(date):
+        return int(np.searchsorted(trade_dates, date, side="right"))
+
+    def rows(days):
+        warm = 0 if warmup_days is None else dates.index(days[0]) - warmup_days
+        warm_lo = first_row(dates[max(warm, 0)])
+        return warm_lo, first_row(days[0]), last_row(days[-1])
+
+    windows = []
+    for train, test in rolling_day_windows(dates, train_days, test_days, step_days):
+        windows.append({
+            "train_dates": (train[0], train[-1]),
+            "test_dates": (test[0], test[-1]),
+            "train": rows(train),
+            "test": rows(test),
+        })
+    return windows
+
+
+def _slice(columns, warm_lo, hi):
+    return {name: values[warm_lo:hi] for name, values in columns.items()}
+
+
+# -----------------------------------------------------------
+# Evaluation
+# -----------------------------------------------------------
+
+def optimize(columns, rows, grid, settings):
+    """Ranked sweep results of `grid` on the traded rows `rows`."""
+    warm_lo, lo, hi = rows
+    candles = _slice(columns, warm_lo, hi)
+    settings = dict(settings, start=lo - warm_lo)
+
+    cache = {}  # indicator columns of this slice only
+    results = []
+    for atr_len, rsi_len, combos in sweep.grid_groups(grid):
+        results.extend(sweep.evaluate_group(candles, atr_len, rsi_len, combos, settings, cache))
+    return sweep.rank_results(results)
+
+
+def out_of_sample(columns, rows, params, settings):
+    """Trades of `params` on the traded rows `rows`, with real timestamps."""
+    warm_lo, lo, hi = rows
+    candles = _slice(columns, warm_lo, hi)
+    settings = dict(settings, start=lo - warm_lo)
+
+    candles = sweep.indicator_columns(candles, params["atr_len"], params["rsi_len"], settings["htf"], {})
+    candles["timestamp"] = pd.Series(pd.to_datetime(candles["wall_ns"]))
+    return sweep.backtest_trades(candles, params, settings)
+
+
+def evaluate_window(columns, window, grid, settings):
+    """(window summary, out-of-sample trades) for one walk-forward window."""
+    ranked = optimize(columns, window["train"], grid, settings)
+    best = ranked.iloc[0]
+    params = {name: best[name] for name in sweep.PARAMETERS}
+    for name in ("atr_len", "rsi_len"):
+        params[name] = int(params[name])
+
+    trades = out_of_sample(columns, window["test"], params, settings)
+    test = sweep.trade_metrics(trades["points"].dropna())
+
+    summary = {
+        "train_start": window["train_dates"][0],
+        "train_end": window["train_dates"][1],
+        "test_start": window["test_dates"][0],
+        "test_end": window["test_dates"][1],
+        **params,
+        "train_pnl": best["pnl"],
+        "train_max_drawdown": best["max_drawdown"],
+        "train_trades": int(best["trades"]),
+        **{f"test_{name}": value for name, value in test.items()},
+    }
+    return summary, trades
+
+
+def _evaluate_window(task):
+    window, grid, settings = task
+    return evaluate_window(sweep._columns, window, grid, settings)
+
+
+def equity_curve(trades):
+    """Closed out-of-sample trades with the cumulative P&L in points."""
+    closed = trades.dropna(subset=["points"]).reset_index(drop=True)
+    closed["equity"] = closed["points"].cumsum()
+    closed["drawdown"] = closed["equity"].cummax().clip(lower=0) - closed["equity"]
+    return closed
+
+
+def run_walk_forward(
+    candles,
+    grid,
+    train_days,
+    test_days,
+    step_days=None,
+    warmup_days=None,
+    htf="15min",
+    strike_roundup_value=100,
+    bracket_exits=False,
+    workers=None
+):
+    """Walk-forward optimization of `grid` ({parameter: [values]}).
+
+    Returns (windows, equity): one row per window with the chosen parameters
+    and their train / test metrics, and the stitched out-of-sample trades.
+    warmup_days=None sizes the warm-up with warmup_days_for.
+    """
+    grid = sweep.full_grid(grid)
+    columns = candle_arrays(candles)
+    trade_dates = columns.pop("timestamp").dt.date.to_numpy()
+
+    if warmup_days is None:
+        length = max(max(grid["atr_len"]), max(grid["rsi_len"]))
+        warmup_days = warmup_days_for(columns["wall_ns"], trade_dates, length, htf)
+
+    windows = window_slices(trade_dates, train_days, test_days, step_days, warmup_days)
+    if not windows:
+        raise ValueError(
+            f"Need at least {train_days + test_days} trading days, "
+            f"got {len(set(trade_dates))}"
+        )
+
+    settings = {
+        "htf": htf,
+        "strike_roundup_value": strike_roundup_value,
+        "bracket_exits": bracket_exits,
+    }
+    tasks = [(window, grid, settings) for window in windows]
+
+    shared = sweep.SharedCandles(columns)
+    try:
+        with ProcessPoolExecutor(
+            max_workers=workers or os.cpu_count(),
+            initializer=sweep._attach,
+            initargs=shared.spec
+        ) as pool:
+            results = list(pool.map(_evaluate_window, tasks))
+    finally:
+        shared.close()
+
+    summaries = [dict(summary, window=i) for i, (summary, _) in enumerate(results, start=1)]
+    trades = [trades.assign(window=i) for i, (_, trades) in enumerate(results, start=1)]
+
+    table = pd.DataFrame(summaries, columns=WINDOW_COLUMNS)
+    equity = equity_curve(pd.concat(trades, ignore_index=True))
+    return table, equity
+
+
+# -----------------------------------------------------------
+# CLI
+# -----------------------------------------------------------
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Walk-forward optimization for algo.HeikinAshiATRStrategy")
+    parser.add_argument("csv", help="OHLC CSV with timestamp/start_time, open, high, low, close")
+    parser.add_argument("--token", help="index token from Main.tokens_utils (sets strike_roundup_value)")
+    parser.add_argument("--train-days", type=int, default=10)
+    parser.add_argument("--test-days", type=int, default=2)
+    parser.add_argument("--step-days", type=int, default=None, help="default: --test-days")
+    parser.add_argument("--warmup-days", type=int, default=None,
+                        help="default: enough for the longest atr/rsi length to converge")
+    parser.add_argument("--htf", default="15min")
+    parser.add_argument("--atr-len", type=int, nargs="+", default=[14])
+    parser.add_argument("--atr-mult", type=float, nargs="+", default=[2.5])
+    parser.add_argument("--rsi-len", type=int, nargs="+", default=[14])
+    parser.add_argument("--risk-reward", type=float, nargs="+", default=[2.0])
+    parser.add_argument("--body-expansion-factor", type=float, nargs="+", default=[0.68])
+    parser.add_argument("--round-off-diff", type=float, nargs="+", default=[100])
+    parser.add_argument("--bracket-exits", action="store_true",
+                        help="also exit when a candle touches stop_loss / take_profit")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--windows", default="walk_forward_windows.csv")
+    parser.add_argument("--equity", default="walk_forward_equity.csv")
+    args = parser.parse_args()
+
+    strike_roundup_value = 100
+    if args.token:
+        from Main import tokens_utils
+        strike_roundup_value = tokens_utils[str(args.token)]["strike_roundup_value"]
+
+    windows, equity = run_walk_forward(
+        args.csv,
+        grid={name: getattr(args, name) for name in sweep.PARAMETERS},
+        train_days=args.train_days,
+        test_days=args.test_days,
+        step_days=args.step_days,
+        warmup_days=args.warmup_days,
+        htf=args.htf,
+        strike_roundup_value=strike_roundup_value,
+        bracket_exits=args.bracket_exits,
+        workers=args.workers
+    )
+    windows.to_csv(args.windows, index=False)
+    equity.to_csv(args.equity, index=False)
+
+    print(f"{len(windows)} windows -> {args.windows}")
+    print(windows.to_string(index=False))
+    if len(equity):
+        print(f"Out-of-sample P&L: {equity['equity'].iloc[-1]:.2f} points over {len(equity)} trades "
+              f"(max drawdown {equity['drawdown'].max():.2f})")